@@ -84,6 +84,7 @@ def main():
         st.info("Select a role and user to begin.")
 
 # Initialize the database
+database.initialize_database()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,363 @@
+"""
+Synthetic, schema-faithful database for benchmarking.
+
+Builds a SQLite file from actual_schema.sql plus the onboarding SQL in sql/, fills
+it with generated staff, patients and task history at a chosen scale, then runs
+database.initialize_database() so the task_date_iso column and every
+sql/migrations file are applied exactly as in production.
+
+Patient zips are drawn from zip-codes.csv with counties weighted by size and
+rank, so Los Angeles dominates the way it does in the real panel. Task dates
+mix the MM/DD/YY format of the spreadsheet imports with the ISO dates the
+dashboards write. The SOURCE_* history names are resolved into
+source_patient_identity as the identity tool would leave them.
+
+Usage:
+    python benchmarks/generate_synthetic_db.py [--scale small|medium|production] [--out PATH] [--seed N]
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from src import database  # noqa: E402
+from src.utils.patient_identity import build_identity_index, resolve_source_names  # noqa: E402
+
+SCHEMA_PATH = os.path.join(REPO_ROOT, 'actual_schema.sql')
+ONBOARDING_SQL = os.path.join(REPO_ROOT, 'sql', 'create_onboarding_tables.sql')
+WORKFLOW_STEPS_SQL = os.path.join(REPO_ROOT, 'sql', 'insert_pot_workflow_steps.sql')
+ZIP_CODES_CSV = os.path.join(REPO_ROOT, 'zip-codes.csv')
+DEFAULT_OUT = os.path.join(REPO_ROOT, 'benchmarks', 'synthetic.db')
+
+SCALES = {
+    'small': {'patients': 2_000, 'providers': 20, 'coordinators': 20, 'provider_tasks': 50_000, 'coordinator_tasks': 50_000},
+    'medium': {'patients': 20_000, 'providers': 60, 'coordinators': 60, 'provider_tasks': 1_000_000, 'coordinator_tasks': 1_000_000},
+    'production': {'patients': 100_000, 'providers': 150, 'coordinators': 150, 'provider_tasks': 10_000_000, 'coordinator_tasks': 10_000_000},
+}
+
+# Share of task rows also written to the SOURCE_* history tables for the ETL benchmarks
+SOURCE_HISTORY_FRACTION = 0.1
+# Referrals in the onboarding queue, as a share of patients
+ONBOARDING_FRACTION = 0.05
+INSERT_CHUNK = 200_000
+HISTORY_DAYS = 730
+
+ROLES = [(33, 'CP'), (34, 'ADMIN'), (35, 'OT'), (36, 'CC'), (37, 'LC'), (38, 'CPM'), (39, 'Data Entry'), (40, 'CM')]
+PATIENT_STATUSES = ['Active', 'Active-Geri', 'Active-PCP', 'Inactive', 'Deceased', 'Hospice']
+PATIENT_STATUS_WEIGHTS = [0.6, 0.1, 0.1, 0.1, 0.05, 0.05]
+LAST_NAMES = ['Garcia', 'Smith', 'Nguyen', 'Johnson', 'Lopez', 'Kim', 'Williams', 'Hernandez', 'Brown', 'Patel',
+              'Martinez', 'Davis', 'Chen', 'Rodriguez', 'Wilson', 'Anderson', 'Gonzalez', 'Lee', 'Taylor', 'Moore']
+FIRST_NAMES = ['Maria', 'James', 'Linh', 'Robert', 'Ana', 'David', 'Mary', 'Jose', 'Patricia', 'Raj',
+               'Carmen', 'Michael', 'Wei', 'Elena', 'John', 'Susan', 'Luis', 'Grace', 'Thomas', 'Helen']
+PROVIDER_SERVICES = [('PCP-Visit Home', '99345'), ('PCP-Visit Telehealth', '99214'), ('Wound Care', '97597'),
+                     ('Annual Wellness Visit', 'G0439'), ('Chronic Care Management', '99490')]
+COORDINATOR_TASK_TYPES = ['Call', 'Care Plan Review', 'Medication Reconciliation', 'Scheduling', 'Follow-up']
+TASK_BILLING_CODES = [
+    ('PCP-Visit Home', 'Primary Care Visit', 'Home', 'Established', 30, 59, '99345'),
+    ('PCP-Visit Telehealth', 'Primary Care Visit', 'Telehealth', 'Established', 15, 29, '99214'),
+    ('Annual Wellness Visit', 'Primary Care Visit', 'Home', 'Established', 30, 60, 'G0439'),
+    ('Wound Care', 'Wound Care', 'Home', 'Established', 15, 45, '97597'),
+    ('Chronic Care Management', 'Care Coordination', 'Telehealth', 'Established', 20, 39, '99490'),
+]
+COORDINATOR_BILLING_CODES = [('99490', 'CCM first 20 min', 20, 39), ('99439', 'CCM each additional 20 min', 40, 59),
+                             ('99487', 'Complex CCM first 60 min', 60, 89), ('99489', 'Complex CCM additional 30 min', 90, 100000)]
+
+
+def create_schema(conn):
+    """Run actual_schema.sql (a UTF-16 sqlite3 .schema dump) and the onboarding DDL"""
+    with open(SCHEMA_PATH, encoding='utf-16') as f:
+        schema = f.read()
+    statements, buffer = [], []
+    for line in schema.splitlines():
+        buffer.append(line)
+        candidate = '\n'.join(buffer).strip()
+        if candidate and sqlite3.complete_statement(candidate):
+            statements.append(candidate)
+            buffer = []
+    for statement in statements:
+        # Internal tables are created by SQLite itself
+        if 'sqlite_sequence' in statement or 'sqlite_stat1' in statement:
+            continue
+        conn.execute(statement)
+    with open(ONBOARDING_SQL, encoding='utf-8') as f:
+        conn.executescript(f.read())
+    conn.execute("INSERT INTO workflow_templates (template_id, template_name) VALUES (14, 'POT_PATIENT_ONBOARDING')")
+    with open(WORKFLOW_STEPS_SQL, encoding='utf-8') as f:
+        conn.executescript(f.read())
+
+
+def load_zip_codes(rng):
+    """zip-codes.csv rows and per-zip sampling weights"""
+    with open(ZIP_CODES_CSV, encoding='utf-8') as f:
+        rows = [(r['zip'].strip().zfill(5), r['city'], r['county']) for r in csv.DictReader(f)]
+    counties = {}
+    for _, _, county in rows:
+        counties[county] = counties.get(county, 0) + 1
+    # Big counties get disproportionately more patients (Zipf over county rank)
+    rank = {county: i + 1 for i, (county, _) in enumerate(sorted(counties.items(), key=lambda kv: -kv[1]))}
+    weights = np.array([1.0 / rank[county] for _, _, county in rows])
+    weights *= rng.uniform(0.5, 1.5, len(rows))
+    return rows, weights / weights.sum()
+
+
+def format_task_dates(days, rng, start):
+    """Mix of MM/DD/YY import dates (80%) and ISO dashboard dates (20%)"""
+    dates = [start + timedelta(days=int(d)) for d in days]
+    iso = rng.random(len(dates)) < 0.2
+    return [d.isoformat() if is_iso else d.strftime('%m/%d/%y') for d, is_iso in zip(dates, iso)], dates
+
+
+def insert_chunked(conn, sql, total, make_rows, label):
+    started = time.perf_counter()
+    for offset in range(0, total, INSERT_CHUNK):
+        conn.executemany(sql, make_rows(offset, min(INSERT_CHUNK, total - offset)))
+        done = offset + min(INSERT_CHUNK, total - offset)
+        print(f"  {label}: {done:,}/{total:,} ({time.perf_counter() - started:.0f}s)", end='\r')
+    print()
+
+
+def populate(conn, scale, rng):
+    today = date.today()
+    history_start = today - timedelta(days=HISTORY_DAYS)
+
+    conn.executemany("INSERT INTO roles (role_id, role_name) VALUES (?, ?)", ROLES)
+    conn.executemany("INSERT INTO patient_status_types (status_name, created_date, updated_date) VALUES (?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)",
+                     [(s,) for s in PATIENT_STATUSES])
+    conn.executemany("INSERT INTO facilities (facility_name) VALUES (?)", [(f"Facility {i}",) for i in range(1, 41)])
+    conn.executemany("""
+        INSERT INTO task_billing_codes (task_description, service_type, location_type, patient_type, min_minutes, max_minutes,
+                                        billing_code, description, effective_date, created_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, '2024-01-01', CURRENT_TIMESTAMP)
+    """, [row + (row[0],) for row in TASK_BILLING_CODES])
+    conn.executemany("INSERT INTO coordinator_billing_codes (billing_code, description, min_minutes, max_minutes) VALUES (?, ?, ?, ?)",
+                     COORDINATOR_BILLING_CODES)
+    conn.executemany("INSERT INTO coordinator_task_definitions (task_category, task_description) VALUES ('Coordination', ?)",
+                     [(t,) for t in COORDINATOR_TASK_TYPES])
+
+    # Staff: providers, coordinators and a few admin/onboarding/data entry users
+    staff = ([('provider', 33)] * scale['providers'] + [('coordinator', 36)] * scale['coordinators']
+             + [('admin', 34)] * 3 + [('onboarding', 35)] * 5 + [('dataentry', 39)] * 3)
+    providers, coordinators = [], []
+    for user_id, (kind, role_id) in enumerate(staff, start=1):
+        first, last = FIRST_NAMES[user_id % len(FIRST_NAMES)], LAST_NAMES[(user_id * 7) % len(LAST_NAMES)]
+        conn.execute("""
+            INSERT INTO users (user_id, username, first_name, last_name, full_name, email, password, status, hire_date,
+                               created_date, updated_date)
+            VALUES (?, ?, ?, ?, ?, ?, 'password', 'Active', ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+        """, (user_id, f"{kind}{user_id}", first, last, f"{first} {last}", f"{kind}{user_id}@example.com",
+              (history_start - timedelta(days=user_id)).isoformat()))
+        conn.execute("INSERT INTO user_roles (user_id, role_id, is_primary) VALUES (?, ?, 1)", (user_id, role_id))
+        if kind == 'provider':
+            providers.append((len(providers) + 1, user_id, f"{first} {last}"))
+            conn.execute("INSERT INTO providers (provider_id, user_id, role_id, first_name, last_name) VALUES (?, ?, 33, ?, ?)",
+                         (len(providers), user_id, first, last))
+            conn.execute("INSERT INTO staff_code_mapping (staff_code, user_id, mapping_type) VALUES (?, ?, 'PROVIDER')",
+                         (f"P{user_id:04d}", user_id))
+            if len(providers) % 10 == 1:
+                conn.execute("INSERT INTO user_roles (user_id, role_id, is_primary) VALUES (?, 38, 0)", (user_id,))
+        elif kind == 'coordinator':
+            coordinators.append((len(coordinators) + 1, user_id))
+            conn.execute("INSERT INTO coordinators (coordinator_id, user_id, role_id, first_name, last_name) VALUES (?, ?, 36, ?, ?)",
+                         (len(coordinators), user_id, first, last))
+            conn.execute("INSERT INTO staff_code_mapping (staff_code, user_id, mapping_type) VALUES (?, ?, 'COORDINATOR')",
+                         (f"C{user_id:04d}", user_id))
+            if len(coordinators) % 10 == 1:
+                conn.execute("INSERT INTO user_roles (user_id, role_id, is_primary) VALUES (?, 37, 0)", (user_id,))
+                conn.execute("INSERT INTO user_roles (user_id, role_id, is_primary) VALUES (?, 40, 0)", (user_id,))
+
+    # Regions: one per zip in zip-codes.csv; each provider covers one to three counties
+    zip_rows, zip_weights = load_zip_codes(rng)
+    conn.executemany("""
+        INSERT INTO regions (region_id, zip_code, city, state, county, status) VALUES (?, ?, ?, 'CA', ?, 'active')
+    """, [(i + 1, z, city, county) for i, (z, city, county) in enumerate(zip_rows)])
+    regions_by_county = {}
+    for i, (_, _, county) in enumerate(zip_rows):
+        regions_by_county.setdefault(county, []).append(i + 1)
+    county_names = sorted(regions_by_county, key=lambda c: -len(regions_by_county[c]))
+    for provider_id, _, _ in providers:
+        count = int(rng.integers(1, 4))
+        picks = rng.choice(len(county_names), size=count, replace=False, p=_rank_weights(len(county_names)))
+        conn.executemany("INSERT OR IGNORE INTO region_providers (region_id, provider_id) VALUES (?, ?)",
+                         [(region_id, provider_id) for c in picks for region_id in regions_by_county[county_names[c]]])
+
+    # Patients, their region mapping and provider/coordinator assignments
+    n_patients = scale['patients']
+    zip_index = rng.choice(len(zip_rows), size=n_patients, p=zip_weights)
+    statuses = rng.choice(PATIENT_STATUSES, size=n_patients, p=PATIENT_STATUS_WEIGHTS)
+    birth_days = rng.integers(0, 365 * 40, size=n_patients)
+    patient_provider = rng.integers(0, len(providers), size=n_patients)
+    patient_coordinator = rng.integers(0, len(coordinators), size=n_patients)
+    patient_names = []
+    patient_rows, mapping_rows, assignment_rows = [], [], []
+    for i in range(n_patients):
+        patient_id = i + 1
+        first = FIRST_NAMES[int(rng.integers(len(FIRST_NAMES)))]
+        last = f"{LAST_NAMES[int(rng.integers(len(LAST_NAMES)))]}{_name_suffix(patient_id)}"
+        dob = date(1925, 1, 1) + timedelta(days=int(birth_days[i]))
+        zip_code, city, _ = zip_rows[zip_index[i]]
+        last_first_dob = f"{last}, {first} {dob.strftime('%m/%d/%Y')}"
+        patient_names.append((f"{first} {last}", last_first_dob))
+        patient_rows.append((patient_id, int(zip_index[i]) + 1, first, last, dob.isoformat(), f"555-{patient_id % 10000:04d}",
+                             f"patient{patient_id}@example.com", f"{patient_id} Main St", city, 'CA', zip_code,
+                             last_first_dob, str(statuses[i]), (history_start + timedelta(days=int(rng.integers(HISTORY_DAYS)))).isoformat()))
+        mapping_rows.append((patient_id, int(zip_index[i]) + 1, zip_code, city, 'CA'))
+        assignment_rows.append((providers[patient_provider[i]][1], patient_id, 33))
+        assignment_rows.append((coordinators[patient_coordinator[i]][1], patient_id, 36))
+    conn.executemany("""
+        INSERT INTO patients (patient_id, region_id, first_name, last_name, date_of_birth, phone_primary, email,
+                              address_street, address_city, address_state, address_zip, last_first_dob, status, created_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, patient_rows)
+    conn.executemany("INSERT INTO patient_region_mapping (patient_id, region_id, zip_code, city, state) VALUES (?, ?, ?, ?, ?)", mapping_rows)
+    conn.executemany("INSERT OR IGNORE INTO user_patient_assignments (user_id, patient_id, role_id) VALUES (?, ?, ?)", assignment_rows)
+
+    # Onboarding queue: referrals spread across the five stages, with one task per workflow step
+    steps = conn.execute("SELECT step_id, step_order, task_name FROM workflow_steps WHERE template_id = 14 ORDER BY step_order").fetchall()
+    onboarding_users = [user_id for user_id, (kind, _) in enumerate(staff, start=1) if kind == 'onboarding']
+    n_onboarding = int(n_patients * ONBOARDING_FRACTION)
+    stages_done = rng.integers(0, 6, size=n_onboarding)
+    for i in range(n_onboarding):
+        instance_id = conn.execute("INSERT INTO workflow_instances (template_id, status, created_at) VALUES (14, 'In Progress', ?)",
+                                   ((today - timedelta(days=int(rng.integers(90)))).isoformat(),)).lastrowid
+        done = int(stages_done[i])
+        created = (today - timedelta(days=int(rng.integers(90)))).isoformat()
+        onboarding_id = conn.execute("""
+            INSERT INTO onboarding_patients (workflow_instance_id, first_name, last_name, date_of_birth, address_zip, address_state,
+                                             patient_status, assigned_pot_user_id, stage1_complete, stage2_complete, stage3_complete,
+                                             stage4_complete, stage5_complete, created_date, updated_date)
+            VALUES (?, ?, ?, ?, ?, 'CA', 'Active', ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (instance_id, FIRST_NAMES[i % len(FIRST_NAMES)], f"Referral{_name_suffix(i + 1)}", '1950-01-01',
+              zip_rows[int(zip_index[i % n_patients])][0], onboarding_users[i % len(onboarding_users)],
+              *[int(done > s) for s in range(5)], created, created)).lastrowid
+        conn.executemany("""
+            INSERT INTO onboarding_tasks (onboarding_id, workflow_step_id, task_name, task_stage, task_order, status)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(onboarding_id, step_id, task_name, min((order - 1) // 3 + 1, 5), order,
+               'Complete' if min((order - 1) // 3 + 1, 5) <= done else 'Pending') for step_id, order, task_name in steps])
+
+    # Provider task history; tasks belong to the patient's assigned provider
+    def provider_task_rows(offset, count):
+        patients = rng.integers(0, n_patients, size=count)
+        services = rng.integers(0, len(PROVIDER_SERVICES), size=count)
+        minutes = rng.choice([15, 20, 30, 45, 60], size=count)
+        task_dates, dates = format_task_dates(rng.integers(0, HISTORY_DAYS, size=count), rng, history_start)
+        rows = []
+        for j in range(count):
+            p = int(patients[j])
+            provider_id, user_id, provider_name = providers[patient_provider[p]]
+            service, code = PROVIDER_SERVICES[services[j]]
+            rows.append((offset + j + 1, provider_id, provider_name, patient_names[p][0], user_id, p + 1, 'completed',
+                         int(minutes[j]), int(services[j]) + 1, task_dates[j], dates[j].month, dates[j].year, code, service, service))
+        return rows
+    insert_chunked(conn, """
+        INSERT INTO provider_tasks (provider_task_id, provider_id, provider_name, patient_name, user_id, patient_id, status,
+                                    minutes_of_service, billing_code_id, task_date, month, year, billing_code,
+                                    billing_code_description, task_description)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, scale['provider_tasks'], provider_task_rows, 'provider_tasks')
+
+    def coordinator_task_rows(offset, count):
+        patients = rng.integers(0, n_patients, size=count)
+        types = rng.integers(0, len(COORDINATOR_TASK_TYPES), size=count)
+        minutes = rng.integers(2, 45, size=count)
+        task_dates, _ = format_task_dates(rng.integers(0, HISTORY_DAYS, size=count), rng, history_start)
+        return [(str(int(patients[j]) + 1), str(coordinators[patient_coordinator[patients[j]]][0]), task_dates[j],
+                 int(minutes[j]), COORDINATOR_TASK_TYPES[types[j]], '') for j in range(count)]
+    insert_chunked(conn, """
+        INSERT INTO coordinator_tasks (patient_id, coordinator_id, task_date, duration_minutes, task_type, notes)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, scale['coordinator_tasks'], coordinator_task_rows, 'coordinator_tasks')
+
+    # Raw spreadsheet history for the ETL and name-matching benchmarks
+    n_history = int(scale['coordinator_tasks'] * SOURCE_HISTORY_FRACTION)
+
+    def coordinator_history_rows(offset, count):
+        patients = rng.integers(0, n_patients, size=count)
+        task_dates, _ = format_task_dates(rng.integers(0, HISTORY_DAYS, size=count), rng, history_start)
+        return [(f"C{coordinators[patient_coordinator[p]][1]:04d}", patient_names[p][1], 'Call', task_dates[j], '',
+                 float(rng.integers(2, 45))) for j, p in enumerate(int(x) for x in patients)]
+    insert_chunked(conn, """
+        INSERT INTO SOURCE_COORDINATOR_TASKS_HISTORY ("Staff", "Pt Name", "Type", "Date Only", "Notes", "Mins B")
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, n_history, coordinator_history_rows, 'SOURCE_COORDINATOR_TASKS_HISTORY')
+
+    def provider_history_rows(offset, count):
+        patients = rng.integers(0, n_patients, size=count)
+        services = rng.integers(0, len(PROVIDER_SERVICES), size=count)
+        task_dates, _ = format_task_dates(rng.integers(0, HISTORY_DAYS, size=count), rng, history_start)
+        return [(offset + j + 1, f"P{providers[patient_provider[p]][1]:04d}", PROVIDER_SERVICES[services[j]][1],
+                 patient_names[p][1], task_dates[j], PROVIDER_SERVICES[services[j]][0], '30')
+                for j, p in enumerate(int(x) for x in patients)]
+    insert_chunked(conn, """
+        INSERT INTO SOURCE_PROVIDER_TASKS_HISTORY ("1", Prov, Coding, "Patient Last, First DOB", DOS, Service, Minutes)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, int(scale['provider_tasks'] * SOURCE_HISTORY_FRACTION), provider_history_rows, 'SOURCE_PROVIDER_TASKS_HISTORY')
+
+
+def _rank_weights(n):
+    weights = 1.0 / np.arange(1, n + 1)
+    return weights / weights.sum()
+
+
+def _name_suffix(patient_id):
+    # Keeps last_first_dob unique enough at 100k patients without digits in names
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    suffix = ''
+    n = patient_id
+    while n:
+        n, r = divmod(n, 26)
+        suffix += letters[r].lower()
+    return '-' + suffix
+
+
+def generate(out=DEFAULT_OUT, scale='small', seed=42):
+    """Build the synthetic database at `out`, replacing any existing file; returns its path"""
+    if scale not in SCALES:
+        raise ValueError(f"Unknown scale {scale!r}; choose from {', '.join(SCALES)}")
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(out + suffix):
+            os.remove(out + suffix)
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+
+    conn = sqlite3.connect(out)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    try:
+        create_schema(conn)
+        conn.commit()
+        populate(conn, SCALES[scale], rng)
+        conn.commit()
+    finally:
+        conn.close()
+
+    # Same initialization the app runs: WAL, task_date_iso backfill, migrations
+    database.initialize_database(out, start_checkpointer=False)
+    database.get_connection_pool(out).close_all()
+    # Raw SOURCE_* names resolved the way `python -m src.utils.patient_identity` leaves them
+    conn = sqlite3.connect(out)
+    try:
+        build_identity_index(conn)
+        resolve_source_names(conn)
+    finally:
+        conn.close()
+    print(f"Generated {scale} database at {out} in {time.perf_counter() - started:.1f}s")
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--out', default=DEFAULT_OUT)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    generate(args.out, args.scale, args.seed)
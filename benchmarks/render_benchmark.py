@@ -0,0 +1,252 @@
+"""
+Headless render benchmark for app.py using Streamlit's AppTest.
+
+Drives app.py against a synthetic database (generate_synthetic_db.py) the way a
+user does: pick a role in the sidebar, pick a user, and let the dashboard
+render. For every role/user it records
+
+  - first_render: the rerun triggered by selecting the user (cold query cache),
+  - rerun: median of ROUNDS further plain reruns, as when a widget changes,
+
+each with wall time, SQL statements executed and rows fetched through the
+pooled connections, plus peak Python memory (tracemalloc) of one extra traced
+rerun and the process's peak RSS so far. Uncaught exceptions shown by the page are reported with the scenario.
+
+Results are written as JSON to benchmarks/results/render_<scale>.json (or
+--out); compare two reports, e.g. from two commits, with --compare OLD NEW.
+
+Usage:
+    python benchmarks/render_benchmark.py [--scale small|medium|production] [--db PATH] [--users-per-role N]
+                                          [--rounds N] [--role NAME] [--out PATH]
+    python benchmarks/render_benchmark.py --compare OLD.json NEW.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from src import database  # noqa: E402
+
+APP_PATH = os.path.join(REPO_ROOT, 'app.py')
+BENCHMARK_DIR = os.path.join(REPO_ROOT, 'benchmarks')
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+
+ROUNDS = 3
+USERS_PER_ROLE = 2
+# Seconds AppTest waits for one script run before giving up
+RENDER_TIMEOUT = 300
+
+
+class QueryCounter:
+    """Counts statements and fetched rows on every pooled connection while installed"""
+
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+        self._lock = threading.Lock()
+        self._acquire = None
+
+    def reset(self):
+        with self._lock:
+            self.statements = 0
+            self.rows = 0
+
+    def _on_statement(self, statement):
+        with self._lock:
+            self.statements += 1
+
+    def _row_factory(self, cursor, row):
+        with self._lock:
+            self.rows += 1
+        return sqlite3.Row(cursor, row)
+
+    def install(self):
+        counter = self
+        original = self._acquire = database.ConnectionPool.acquire
+
+        def acquire(pool):
+            pooled = original(pool)
+            # Set on the underlying connection; the pool restores sqlite3.Row on release
+            pooled._conn.set_trace_callback(counter._on_statement)
+            pooled._conn.row_factory = counter._row_factory
+            return pooled
+        database.ConnectionPool.acquire = acquire
+
+    def uninstall(self):
+        if self._acquire is not None:
+            database.ConnectionPool.acquire = self._acquire
+            self._acquire = None
+
+
+def measure(at, counter, action):
+    """Wall time, statements and rows for one rerun"""
+    counter.reset()
+    started = time.perf_counter()
+    action(at)
+    return {'seconds': time.perf_counter() - started, 'statements': counter.statements, 'rows': counter.rows}
+
+
+def page_errors(at):
+    return [str(e.value).splitlines()[0] if e.value else 'exception' for e in at.exception]
+
+
+def render_scenario(role_name, user_name, counter, rounds=ROUNDS):
+    """Render one role/user in a fresh AppTest session"""
+    at = AppTest.from_file(APP_PATH, default_timeout=RENDER_TIMEOUT)
+
+    def showing():
+        boxes = at.sidebar.selectbox
+        return len(boxes) > 1 and boxes[0].value == role_name and boxes[1].value == user_name
+
+    # The sidebar defaults to the first role and user, so the target page can
+    # appear on the initial run or the role change; time whichever run gets there
+    steps = [
+        lambda at: at.run(),
+        lambda at: at.sidebar.selectbox[0].select(role_name).run(),
+        lambda at: at.sidebar.selectbox[1].select(user_name).run(),
+    ]
+    first = None
+    for step in steps:
+        database.query_cache.clear()
+        first = measure(at, counter, step)
+        if showing():
+            break
+    else:
+        return {'role': role_name, 'user': user_name, 'errors': ['could not select role and user']}
+
+    reruns = [measure(at, counter, lambda at: at.run()) for _ in range(rounds)]
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    at.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'role': role_name,
+        'user': user_name,
+        'first_render': first,
+        'rerun': {
+            'seconds': statistics.median(r['seconds'] for r in reruns),
+            'statements': statistics.median(r['statements'] for r in reruns),
+            'rows': statistics.median(r['rows'] for r in reruns),
+        },
+        'peak_memory_mb': round(peak / 1024 / 1024, 2),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'errors': page_errors(at),
+    }
+
+
+def scenarios(users_per_role=USERS_PER_ROLE, role_filter=None):
+    """(role, user) pairs offered by the sidebar, users_per_role per role"""
+    at = AppTest.from_file(APP_PATH, default_timeout=RENDER_TIMEOUT)
+    at.run()
+    pairs = []
+    for role_name in at.sidebar.selectbox[0].options:
+        if role_filter and role_name != role_filter:
+            continue
+        at.sidebar.selectbox[0].select(role_name).run()
+        if len(at.sidebar.selectbox) > 1:
+            pairs.extend((role_name, user) for user in at.sidebar.selectbox[1].options[:users_per_role])
+    return pairs
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(db_path, scale, users_per_role=USERS_PER_ROLE, rounds=ROUNDS, role_filter=None):
+    database.DB_PATH = db_path
+    database.initialize_database(db_path, start_checkpointer=False)
+    counter = QueryCounter()
+    counter.install()
+    results = []
+    try:
+        for role_name, user_name in scenarios(users_per_role, role_filter):
+            result = render_scenario(role_name, user_name, counter, rounds)
+            results.append(result)
+            if 'first_render' in result:
+                print(f"{role_name:<12} {user_name:<16} first {result['first_render']['seconds'] * 1000:9.1f} ms "
+                      f"{result['first_render']['statements']:6} stmts {result['first_render']['rows']:8} rows | "
+                      f"rerun {result['rerun']['seconds'] * 1000:9.1f} ms {result['rerun']['statements']:6} stmts "
+                      f"{result['rerun']['rows']:8} rows | peak {result['peak_memory_mb']:7.1f} MB"
+                      + (f" | errors: {'; '.join(result['errors'])}" if result['errors'] else ''))
+            else:
+                print(f"{role_name:<12} {user_name:<16} {'; '.join(result['errors'])}")
+    finally:
+        counter.uninstall()
+        database.get_connection_pool(db_path).close_all()
+    return {
+        'scale': scale,
+        'database': os.path.relpath(db_path, REPO_ROOT),
+        'revision': git_revision(),
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'rounds': rounds,
+        'scenarios': results,
+    }
+
+
+def compare(old, new):
+    """Print per-scenario changes between two reports"""
+    before = {(s['role'], s['user']): s for s in old['scenarios'] if 'first_render' in s}
+    print(f"{'scenario':<30} {'first render':>24} {'rerun':>24} {'stmts/rerun':>14}")
+    for scenario in new['scenarios']:
+        key = (scenario['role'], scenario['user'])
+        if 'first_render' not in scenario or key not in before:
+            continue
+        a, b = before[key], scenario
+
+        def change(field, metric):
+            return f"{a[field][metric] * 1000:8.1f} -> {b[field][metric] * 1000:8.1f} ms"
+        print(f"{' / '.join(key):<30} {change('first_render', 'seconds'):>24} {change('rerun', 'seconds'):>24} "
+              f"{a['rerun']['statements']:>5} -> {b['rerun']['statements']:<5}")
+
+
+if __name__ == "__main__":
+    from generate_synthetic_db import SCALES, generate
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--db', help="benchmark database (default benchmarks/synthetic_<scale>.db)")
+    parser.add_argument('--users-per-role', type=int, default=USERS_PER_ROLE)
+    parser.add_argument('--rounds', type=int, default=ROUNDS)
+    parser.add_argument('--role', help="only render this role")
+    parser.add_argument('--out', help="report path (default benchmarks/results/render_<scale>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            compare(json.load(f_old), json.load(f_new))
+        sys.exit(0)
+
+    # Deprecation notices from the dashboards would be printed on every rerun;
+    # AppTest resets Streamlit's own log level, so silence warnings process-wide
+    logging.disable(logging.WARNING)
+    db_path = os.path.abspath(args.db or os.path.join(BENCHMARK_DIR, f"synthetic_{args.scale}.db"))
+    if not os.path.exists(db_path):
+        generate(db_path, args.scale)
+
+    report = run(db_path, args.scale, args.users_per_role, args.rounds, args.role)
+    out = args.out or os.path.join(RESULTS_DIR, f"render_{args.scale}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {out}")
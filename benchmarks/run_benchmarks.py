@@ -0,0 +1,285 @@
+"""
+Benchmark suite for the database layer, dashboard summaries and SQL rollups.
+
+Times, against a synthetic database from generate_synthetic_db.py:
+  - every public reader in src/database.py (discovered automatically; cached
+    readers are called through .uncached so every round hits SQLite),
+  - each DashboardSummaryUtils table refresh (full and incremental) and
+    refresh_all_dashboard_tables,
+  - each src/sql/populate_*.sql rollup, run on a scratch copy of the database.
+
+Each case runs ROUNDS times after a warm-up call and reports the median. Results
+are written to benchmarks/results/<scale>.json and compared with the stored
+baseline in benchmarks/baselines/<scale>.json; a case slower than its baseline
+by more than REGRESSION_THRESHOLD (or its entry in CASE_THRESHOLDS) is a
+regression, as is a case that fails where the baseline passed; either makes
+the run exit with status 1. Baselines are machine specific:
+regenerate them with --save-baseline on the machine that runs the comparison.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--scale small|medium|production] [--db PATH] [--rounds N]
+                                        [--filter TEXT] [--save-baseline] [--regenerate]
+"""
+
+import argparse
+import glob
+import inspect
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from src import database  # noqa: E402
+from src.utils.dashboard_summary_utils import DashboardSummaryUtils  # noqa: E402
+
+BENCHMARK_DIR = os.path.join(REPO_ROOT, 'benchmarks')
+BASELINE_DIR = os.path.join(BENCHMARK_DIR, 'baselines')
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+SQL_DIR = os.path.join(REPO_ROOT, 'src', 'sql')
+
+# Per-table refresh chatter would drown the results table
+logging.getLogger('src.utils.dashboard_summary_utils').setLevel(logging.WARNING)
+
+ROUNDS = 5
+# A case regresses when its median exceeds baseline * threshold
+REGRESSION_THRESHOLD = 1.25
+# Per-case overrides of REGRESSION_THRESHOLD, by case name
+CASE_THRESHOLDS = {}
+# Millisecond-scale cases are dominated by timer noise; never flag a slowdown smaller than this
+NOISE_FLOOR_SECONDS = 0.002
+
+# Public functions in database.py that are not read paths
+SKIPPED_PREFIXES = ('save_', 'add_', 'remove_', 'set_', 'update_', 'create_', 'transfer_')
+SKIPPED_FUNCTIONS = {
+    'apply_migrations', 'cached_query', 'get_connection_pool', 'get_db_connection', 'initialize_database',
+    'invalidate_tables', 'invalidates', 'is_lock_error', 'iso_date_sql', 'migrate_task_date_iso',
+    'patient_list_sort_key', 'retry_on_locked',
+}
+
+
+def sample_arguments(db_path):
+    """Representative argument values picked from the synthetic data"""
+    conn = sqlite3.connect(db_path)
+    try:
+        one = lambda sql: (conn.execute(sql).fetchone() or [None])[0]  # noqa: E731
+        provider_user = one("SELECT user_id FROM providers ORDER BY provider_id LIMIT 1")
+        return {
+            'user_id': provider_user,
+            'provider_id': one("SELECT provider_id FROM providers ORDER BY provider_id LIMIT 1"),
+            'coordinator_user_id': one("SELECT user_id FROM coordinators ORDER BY coordinator_id LIMIT 1"),
+            'patient_id': one("SELECT patient_id FROM user_patient_assignments WHERE user_id = %d LIMIT 1" % provider_user),
+            'patient_name': one("SELECT first_name || ' ' || last_name FROM patients LIMIT 1"),
+            'onboarding_id': one("SELECT onboarding_id FROM onboarding_patients ORDER BY onboarding_id LIMIT 1"),
+            'role_id': 33,
+            'role_name': 'CP',
+            'service_type': 'Primary Care Visit',
+        }
+    finally:
+        conn.close()
+
+
+# Per-function overrides where a parameter name alone is ambiguous
+def case_arguments(name, samples):
+    if name == 'get_coordinator_performance_metrics':
+        return {'user_id': samples['coordinator_user_id']}
+    if name == 'get_onboarding_tasks_by_role':
+        return {'role_id': 35}
+    if name == 'search_patients':
+        return {'query': 'carmen andersn'}
+    return {}
+
+
+def database_cases(samples):
+    """(name, callable) for every public reader in database.py, plus the reasons others were skipped"""
+    cases, skipped = [], {}
+    for name, func in inspect.getmembers(database, inspect.isfunction):
+        if func.__module__ != database.__name__ or name.startswith('_'):
+            continue
+        if name in SKIPPED_FUNCTIONS or name.startswith(SKIPPED_PREFIXES):
+            continue
+        target = getattr(func, 'uncached', func)
+        overrides = case_arguments(name, samples)
+        kwargs, missing = {}, []
+        for param in inspect.signature(func).parameters.values():
+            if param.default is not inspect.Parameter.empty:
+                continue
+            value = overrides.get(param.name, samples.get(param.name))
+            if value is None:
+                missing.append(param.name)
+            kwargs[param.name] = value
+        if missing:
+            skipped[f"database.{name}"] = f"no sample value for {', '.join(missing)}"
+            continue
+        cases.append((f"database.{name}", lambda target=target, kwargs=kwargs: target(**kwargs)))
+    # The patient panel is the heaviest dashboard read; time its common variants too
+    cases.append(("database.get_patient_list_page[search]",
+                  lambda: database.get_patient_list_page(samples['user_id'], samples['provider_id'], search='ma')))
+    cases.append(("database.get_patient_list_page[offset=500]",
+                  lambda: database.get_patient_list_page(samples['user_id'], samples['provider_id'], active_only=False, offset=500)))
+    return cases, skipped
+
+
+def summary_cases(db_path):
+    """(name, callable) for each DashboardSummaryUtils refresh"""
+    utils = DashboardSummaryUtils(db_path)
+    utils.connect()
+    utils.create_dashboard_tables()
+    cases = []
+
+    # The refresh methods log and return False on failure; a failed refresh must not be timed as a fast one
+    def checked(refresh, *args, **kwargs):
+        def call():
+            if not refresh(*args, **kwargs):
+                raise RuntimeError(f"{refresh.__name__}{args} reported failure (see log)")
+        return call
+
+    for table_name in utils._summary_queries():
+        cases.append((f"summary.{table_name}", checked(utils.refresh_dashboard_table, table_name)))
+        cases.append((f"summary.{table_name}[incremental]",
+                      checked(utils.refresh_dashboard_table, table_name, incremental=True)))
+    cases.append(("summary.refresh_all_dashboard_tables", checked(utils.refresh_all_dashboard_tables)))
+    cases.append(("summary.refresh_all_dashboard_tables[incremental]",
+                  checked(utils.refresh_all_dashboard_tables, incremental=True)))
+    return cases, utils
+
+
+def sql_rollup_cases(scratch_path):
+    """(name, callable) for each src/sql/populate_*.sql script, run against a scratch copy"""
+    cases = []
+    for path in sorted(glob.glob(os.path.join(SQL_DIR, 'populate_*.sql'))):
+        with open(path, encoding='utf-8') as f:
+            script = f.read()
+
+        def run(script=script):
+            conn = sqlite3.connect(scratch_path)
+            try:
+                conn.executescript(script)
+                conn.commit()
+            finally:
+                conn.close()
+        cases.append((f"sql.{os.path.basename(path)}", run))
+    return cases
+
+
+def time_case(func, rounds):
+    """Median, min and max seconds over `rounds` calls after one warm-up call"""
+    func()
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return {'median': statistics.median(timings), 'min': min(timings), 'max': max(timings), 'rounds': rounds}
+
+
+def compare(results, baseline):
+    """Cases slower than their baseline by more than their threshold, or failing where the baseline passed"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('cases', {}).get(name)
+        if not base or 'median' not in base:
+            continue
+        if 'median' not in result:
+            regressions.append((name, base['median'], None))
+            continue
+        threshold = CASE_THRESHOLDS.get(name, REGRESSION_THRESHOLD)
+        limit = max(base['median'] * threshold, base['median'] + NOISE_FLOOR_SECONDS)
+        if result['median'] > limit:
+            regressions.append((name, base['median'], result['median']))
+    return regressions
+
+
+def run(db_path, scale, rounds=ROUNDS, name_filter=None):
+    """Run every case; returns the report dict"""
+    database.DB_PATH = db_path
+    database.initialize_database(db_path, start_checkpointer=False)
+    samples = sample_arguments(db_path)
+
+    scratch_dir = tempfile.mkdtemp(prefix='myhealthteam-bench-')
+    scratch_path = os.path.join(scratch_dir, 'scratch.db')
+    source = sqlite3.connect(db_path)
+    target = sqlite3.connect(scratch_path)
+    source.backup(target)
+    source.close()
+    target.close()
+
+    db_cases, skipped = database_cases(samples)
+    refresh_cases, utils = summary_cases(scratch_path)
+    cases = db_cases + refresh_cases + sql_rollup_cases(scratch_path)
+
+    results = {}
+    try:
+        for name, func in cases:
+            if name_filter and name_filter not in name:
+                continue
+            try:
+                results[name] = time_case(func, rounds)
+                print(f"{name:<70} {results[name]['median'] * 1000:10.2f} ms")
+            except Exception as e:
+                results[name] = {'error': f"{type(e).__name__}: {e}"}
+                print(f"{name:<70} {'ERROR':>13}  {e}")
+    finally:
+        utils.disconnect()
+        database.get_connection_pool(db_path).close_all()
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    for name, reason in skipped.items():
+        print(f"{name:<70} {'skipped':>13}  {reason}")
+    return {
+        'scale': scale,
+        'database': os.path.relpath(db_path, REPO_ROOT),
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'rounds': rounds,
+        'cases': results,
+        'skipped': skipped,
+    }
+
+
+if __name__ == "__main__":
+    from generate_synthetic_db import SCALES, generate
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--db', help="benchmark database (default benchmarks/synthetic_<scale>.db)")
+    parser.add_argument('--rounds', type=int, default=ROUNDS)
+    parser.add_argument('--filter', help="only run cases whose name contains this text")
+    parser.add_argument('--save-baseline', action='store_true', help="store the results as the new baseline")
+    parser.add_argument('--regenerate', action='store_true', help="rebuild the synthetic database first")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(BENCHMARK_DIR, f"synthetic_{args.scale}.db")
+    if args.regenerate or not os.path.exists(db_path):
+        generate(db_path, args.scale)
+
+    report = run(db_path, args.scale, args.rounds, args.filter)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, f"{args.scale}.json"), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    baseline_path = os.path.join(BASELINE_DIR, f"{args.scale}.json")
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline {baseline_path}")
+        sys.exit(0)
+
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}; run with --save-baseline to create one")
+        sys.exit(0)
+    with open(baseline_path) as f:
+        regressions = compare(report['cases'], json.load(f))
+    for name, before, after in regressions:
+        if after is None:
+            print(f"REGRESSION {name}: passed in the baseline, now fails: {report['cases'][name]['error']}")
+        else:
+            print(f"REGRESSION {name}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms ({after / before:.2f}x)")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,38 @@
+-- Migration 001: indexes suggested by src/utils/index_advisor.py
+-- Generated 2026-10-17
+
+-- Used by src/dashboards/care_provider_dashboard_enhanced.py
+CREATE INDEX IF NOT EXISTS idx_patient_region_mapping_patient_id_region_id ON patient_region_mapping(patient_id, region_id);
+
+-- Used by src/dashboards/care_provider_dashboard_enhanced.py
+CREATE INDEX IF NOT EXISTS idx_patient_region_mapping_region_id_patient_id ON patient_region_mapping(region_id, patient_id);
+
+-- Used by src/dashboards/care_coordinator_dashboard_enhanced.py, src/dashboards/care_provider_dashboard_enhanced.py, src/database.py, src/utils/dashboard_summary_utils.py
+CREATE INDEX IF NOT EXISTS idx_patients_patient_id ON patients(patient_id);
+
+-- Used by src/utils/create_dashboard_mapping_tables.py
+CREATE INDEX IF NOT EXISTS idx_patients_region_id ON patients(region_id);
+
+-- Used by src/dashboards/care_coordinator_dashboard_enhanced.py, src/database.py
+CREATE INDEX IF NOT EXISTS idx_patients_status_patient_id ON patients(status, patient_id);
+
+-- Used by src/utils/performance_components.py
+CREATE INDEX IF NOT EXISTS idx_provider_weekly_summary_provider_id ON provider_weekly_summary(provider_id);
+
+-- Used by src/database.py
+CREATE INDEX IF NOT EXISTS idx_task_billing_codes_service_type ON task_billing_codes(service_type);
+
+-- Used by src/dashboards/admin_dashboard.py
+CREATE INDEX IF NOT EXISTS idx_tasks_task_date ON tasks(task_date);
+
+-- Used by src/dashboards/admin_dashboard.py, src/database.py
+CREATE INDEX IF NOT EXISTS idx_tasks_user_id ON tasks(user_id);
+
+-- Used by src/database.py
+CREATE INDEX IF NOT EXISTS idx_user_patient_assignments_patient_id ON user_patient_assignments(patient_id);
+
+-- Used by src/database.py
+CREATE INDEX IF NOT EXISTS idx_workflow_steps_template_id ON workflow_steps(template_id);
+
+-- Refresh planner statistics for the new indexes
+ANALYZE;
@@ -0,0 +1,75 @@
+-- Migration 002: materialized provider -> county coverage
+--
+-- One row per (provider, county) the provider serves through region_providers.
+-- The provider patient list flags patients outside the provider's counties with
+-- a single LEFT JOIN against this table instead of a correlated EXISTS over
+-- region_providers JOIN regions per patient row. Triggers keep it in step with
+-- region_providers and with county edits on regions.
+
+CREATE TABLE IF NOT EXISTS provider_county_coverage (
+    provider_id INTEGER NOT NULL,
+    county TEXT NOT NULL,
+    state TEXT,
+    region_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (provider_id, county)
+) WITHOUT ROWID;
+
+DELETE FROM provider_county_coverage;
+INSERT INTO provider_county_coverage (provider_id, county, state, region_count)
+SELECT rp.provider_id, r.county, MAX(r.state), COUNT(*)
+FROM region_providers rp
+JOIN regions r ON rp.region_id = r.region_id
+WHERE r.county IS NOT NULL AND r.county != ''
+GROUP BY rp.provider_id, r.county;
+
+-- region_providers rows add or remove one region from a provider's county
+CREATE TRIGGER IF NOT EXISTS trg_region_providers_coverage_insert
+AFTER INSERT ON region_providers
+BEGIN
+    INSERT INTO provider_county_coverage (provider_id, county, state, region_count)
+    SELECT NEW.provider_id, r.county, r.state, 1
+    FROM regions r
+    WHERE r.region_id = NEW.region_id AND r.county IS NOT NULL AND r.county != ''
+    ON CONFLICT (provider_id, county) DO UPDATE SET region_count = region_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_region_providers_coverage_delete
+AFTER DELETE ON region_providers
+BEGIN
+    UPDATE provider_county_coverage SET region_count = region_count - 1
+    WHERE provider_id = OLD.provider_id
+      AND county = (SELECT county FROM regions WHERE region_id = OLD.region_id);
+    DELETE FROM provider_county_coverage
+    WHERE provider_id = OLD.provider_id AND region_count <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_region_providers_coverage_update
+AFTER UPDATE OF region_id, provider_id ON region_providers
+BEGIN
+    UPDATE provider_county_coverage SET region_count = region_count - 1
+    WHERE provider_id = OLD.provider_id
+      AND county = (SELECT county FROM regions WHERE region_id = OLD.region_id);
+    DELETE FROM provider_county_coverage
+    WHERE provider_id = OLD.provider_id AND region_count <= 0;
+    INSERT INTO provider_county_coverage (provider_id, county, state, region_count)
+    SELECT NEW.provider_id, r.county, r.state, 1
+    FROM regions r
+    WHERE r.region_id = NEW.region_id AND r.county IS NOT NULL AND r.county != ''
+    ON CONFLICT (provider_id, county) DO UPDATE SET region_count = region_count + 1;
+END;
+
+-- Moving a region to another county moves it for every provider that serves it
+CREATE TRIGGER IF NOT EXISTS trg_regions_coverage_county_update
+AFTER UPDATE OF county ON regions
+WHEN OLD.county IS NOT NEW.county
+BEGIN
+    UPDATE provider_county_coverage SET region_count = region_count - 1
+    WHERE county = OLD.county
+      AND provider_id IN (SELECT provider_id FROM region_providers WHERE region_id = NEW.region_id);
+    DELETE FROM provider_county_coverage WHERE region_count <= 0;
+    INSERT INTO provider_county_coverage (provider_id, county, state, region_count)
+    SELECT rp.provider_id, NEW.county, NEW.state, 1
+    FROM region_providers rp
+    WHERE rp.region_id = NEW.region_id AND NEW.county IS NOT NULL AND NEW.county != ''
+    ON CONFLICT (provider_id, county) DO UPDATE SET region_count = region_count + 1;
+END;
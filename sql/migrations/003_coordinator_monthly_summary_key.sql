@@ -0,0 +1,15 @@
+-- Migration 003: one coordinator_monthly_summary row per (coordinator, patient, month)
+--
+-- The old SQL loader joined coordinator_billing_codes on a minutes range, so
+-- overlapping codes produced duplicate rows. Keep the first row of each group
+-- and add the unique key that src/utils/coordinator_billing.py upserts on.
+
+DELETE FROM coordinator_monthly_summary
+WHERE summary_id NOT IN (
+    SELECT MIN(summary_id)
+    FROM coordinator_monthly_summary
+    GROUP BY coordinator_id, patient_id, year, month
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_coordinator_monthly_summary_key
+    ON coordinator_monthly_summary(coordinator_id, patient_id, year, month);
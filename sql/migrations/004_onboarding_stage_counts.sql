@@ -0,0 +1,86 @@
+-- Migration 004: maintained onboarding stage and stage counts
+--
+-- current_stage is the stage an onboarding patient is working on: one past the
+-- highest completed stage, 6 once stage 5 is complete (ready for handoff). The
+-- onboarding writers in src/database.py set it in the same UPDATE as the stage
+-- flags. onboarding_stage_counts holds one row per combination of the columns
+-- the queue stats group on, kept in step with onboarding_patients by triggers,
+-- so the stats read a few dozen rows instead of scanning every patient.
+
+ALTER TABLE onboarding_patients ADD COLUMN current_stage INTEGER NOT NULL DEFAULT 1;
+
+UPDATE onboarding_patients SET current_stage = CASE
+    WHEN stage5_complete = 1 THEN 6
+    WHEN stage4_complete = 1 THEN 5
+    WHEN stage3_complete = 1 THEN 4
+    WHEN stage2_complete = 1 THEN 3
+    WHEN stage1_complete = 1 THEN 2
+    ELSE 1
+END;
+
+-- The onboarding queue: open patients by stage, newest first within a stage
+CREATE INDEX IF NOT EXISTS idx_onboarding_patients_queue
+    ON onboarding_patients(completed_date, current_stage, created_date);
+
+CREATE TABLE IF NOT EXISTS onboarding_stage_counts (
+    current_stage INTEGER NOT NULL,
+    patient_status TEXT NOT NULL,
+    is_completed INTEGER NOT NULL,
+    has_patient INTEGER NOT NULL,
+    has_pot INTEGER NOT NULL,
+    patient_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (current_stage, patient_status, is_completed, has_patient, has_pot)
+) WITHOUT ROWID;
+
+DELETE FROM onboarding_stage_counts;
+INSERT INTO onboarding_stage_counts (current_stage, patient_status, is_completed, has_patient, has_pot, patient_count)
+SELECT current_stage, COALESCE(patient_status, ''), completed_date IS NOT NULL,
+       patient_id IS NOT NULL, assigned_pot_user_id IS NOT NULL, COUNT(*)
+FROM onboarding_patients
+GROUP BY 1, 2, 3, 4, 5;
+
+CREATE TRIGGER IF NOT EXISTS trg_onboarding_stage_counts_insert
+AFTER INSERT ON onboarding_patients
+BEGIN
+    INSERT INTO onboarding_stage_counts (current_stage, patient_status, is_completed, has_patient, has_pot, patient_count)
+    VALUES (NEW.current_stage, COALESCE(NEW.patient_status, ''), NEW.completed_date IS NOT NULL,
+            NEW.patient_id IS NOT NULL, NEW.assigned_pot_user_id IS NOT NULL, 1)
+    ON CONFLICT (current_stage, patient_status, is_completed, has_patient, has_pot)
+    DO UPDATE SET patient_count = patient_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_onboarding_stage_counts_delete
+AFTER DELETE ON onboarding_patients
+BEGIN
+    UPDATE onboarding_stage_counts SET patient_count = patient_count - 1
+    WHERE current_stage = OLD.current_stage
+      AND patient_status = COALESCE(OLD.patient_status, '')
+      AND is_completed = (OLD.completed_date IS NOT NULL)
+      AND has_patient = (OLD.patient_id IS NOT NULL)
+      AND has_pot = (OLD.assigned_pot_user_id IS NOT NULL);
+    DELETE FROM onboarding_stage_counts WHERE patient_count <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_onboarding_stage_counts_update
+AFTER UPDATE OF current_stage, patient_status, completed_date, patient_id, assigned_pot_user_id ON onboarding_patients
+WHEN OLD.current_stage IS NOT NEW.current_stage
+  OR OLD.patient_status IS NOT NEW.patient_status
+  OR (OLD.completed_date IS NULL) != (NEW.completed_date IS NULL)
+  OR (OLD.patient_id IS NULL) != (NEW.patient_id IS NULL)
+  OR (OLD.assigned_pot_user_id IS NULL) != (NEW.assigned_pot_user_id IS NULL)
+BEGIN
+    UPDATE onboarding_stage_counts SET patient_count = patient_count - 1
+    WHERE current_stage = OLD.current_stage
+      AND patient_status = COALESCE(OLD.patient_status, '')
+      AND is_completed = (OLD.completed_date IS NOT NULL)
+      AND has_patient = (OLD.patient_id IS NOT NULL)
+      AND has_pot = (OLD.assigned_pot_user_id IS NOT NULL);
+    DELETE FROM onboarding_stage_counts WHERE patient_count <= 0;
+    INSERT INTO onboarding_stage_counts (current_stage, patient_status, is_completed, has_patient, has_pot, patient_count)
+    VALUES (NEW.current_stage, COALESCE(NEW.patient_status, ''), NEW.completed_date IS NOT NULL,
+            NEW.patient_id IS NOT NULL, NEW.assigned_pot_user_id IS NOT NULL, 1)
+    ON CONFLICT (current_stage, patient_status, is_completed, has_patient, has_pot)
+    DO UPDATE SET patient_count = patient_count + 1;
+END;
+
+ANALYZE onboarding_patients;
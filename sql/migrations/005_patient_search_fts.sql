@@ -0,0 +1,149 @@
+-- Migration 005: full-text patient search
+--
+-- One patient_fts row per patient and per onboarding patient, searched by
+-- database.search_patients and the onboarding queue lookup. Rowids keep the two
+-- apart: patients.rowid * 2 for patients (patient_id is not unique, so it cannot
+-- key the index), onboarding_id * 2 + 1 for onboarding patients, so the
+-- triggers below replace a row by rowid. Phone numbers are
+-- also indexed as bare digits so "5551234" finds "555-1234". prefix='2 3'
+-- indexes short prefixes for search-as-you-type; patient_fts_vocab lists the
+-- indexed terms that typo-tolerant matching compares query words against.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS patient_fts USING fts5(
+    name, phone, email, address, mrn, insurance,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS patient_fts_vocab USING fts5vocab(patient_fts, 'row');
+
+DELETE FROM patient_fts;
+
+INSERT INTO patient_fts (rowid, name, phone, email, address, mrn, insurance)
+SELECT rowid * 2,
+       TRIM(COALESCE(first_name, '') || ' ' || COALESCE(last_name, '')),
+       TRIM(COALESCE(phone_primary, '') || ' ' ||
+            COALESCE(phone_secondary, '') || ' ' ||
+            COALESCE(replace(replace(replace(replace(replace(phone_primary, '-', ''), ' ', ''), '(', ''), ')', ''), '.', ''), '') || ' ' ||
+            COALESCE(replace(replace(replace(replace(replace(phone_secondary, '-', ''), ' ', ''), '(', ''), ')', ''), '.', ''), '')),
+       email,
+       TRIM(COALESCE(address_street, '') || ' ' ||
+            COALESCE(address_city, '') || ' ' ||
+            COALESCE(address_state, '') || ' ' ||
+            COALESCE(address_zip, '')),
+       medical_record_number,
+       TRIM(COALESCE(insurance_policy_number, '') || ' ' || COALESCE(insurance_primary, ''))
+FROM patients
+WHERE patient_id IS NOT NULL;
+
+INSERT INTO patient_fts (rowid, name, phone, email, address, mrn, insurance)
+SELECT onboarding_id * 2 + 1,
+       TRIM(COALESCE(first_name, '') || ' ' || COALESCE(last_name, '')),
+       TRIM(COALESCE(phone_primary, '') || ' ' ||
+            COALESCE(replace(replace(replace(replace(replace(phone_primary, '-', ''), ' ', ''), '(', ''), ')', ''), '.', ''), '')),
+       email,
+       TRIM(COALESCE(address_street, '') || ' ' ||
+            COALESCE(address_city, '') || ' ' ||
+            COALESCE(address_state, '') || ' ' ||
+            COALESCE(address_zip, '')),
+       NULL,
+       TRIM(COALESCE(policy_number, '') || ' ' ||
+            COALESCE(group_number, '') || ' ' ||
+            COALESCE(insurance_provider, ''))
+FROM onboarding_patients;
+
+CREATE TRIGGER IF NOT EXISTS trg_patients_fts_insert
+AFTER INSERT ON patients
+WHEN NEW.patient_id IS NOT NULL
+BEGIN
+    INSERT INTO patient_fts (rowid, name, phone, email, address, mrn, insurance)
+    VALUES (NEW.rowid * 2,
+            TRIM(COALESCE(NEW.first_name, '') || ' ' || COALESCE(NEW.last_name, '')),
+            TRIM(COALESCE(NEW.phone_primary, '') || ' ' ||
+                 COALESCE(NEW.phone_secondary, '') || ' ' ||
+                 COALESCE(replace(replace(replace(replace(replace(NEW.phone_primary, '-', ''), ' ', ''), '(', ''), ')', ''), '.', ''), '') || ' ' ||
+                 COALESCE(replace(replace(replace(replace(replace(NEW.phone_secondary, '-', ''), ' ', ''), '(', ''), ')', ''), '.', ''), '')),
+            NEW.email,
+            TRIM(COALESCE(NEW.address_street, '') || ' ' ||
+                 COALESCE(NEW.address_city, '') || ' ' ||
+                 COALESCE(NEW.address_state, '') || ' ' ||
+                 COALESCE(NEW.address_zip, '')),
+            NEW.medical_record_number,
+            TRIM(COALESCE(NEW.insurance_policy_number, '') || ' ' || COALESCE(NEW.insurance_primary, '')));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_patients_fts_delete
+AFTER DELETE ON patients
+BEGIN
+    DELETE FROM patient_fts WHERE rowid = OLD.rowid * 2;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_patients_fts_update
+AFTER UPDATE OF patient_id, first_name, last_name, phone_primary, phone_secondary, email,
+    address_street, address_city, address_state, address_zip,
+    medical_record_number, insurance_policy_number, insurance_primary ON patients
+BEGIN
+    DELETE FROM patient_fts WHERE rowid = OLD.rowid * 2;
+    INSERT INTO patient_fts (rowid, name, phone, email, address, mrn, insurance)
+    SELECT NEW.rowid * 2,
+           TRIM(COALESCE(NEW.first_name, '') || ' ' || COALESCE(NEW.last_name, '')),
+           TRIM(COALESCE(NEW.phone_primary, '') || ' ' ||
+                COALESCE(NEW.phone_secondary, '') || ' ' ||
+                COALESCE(replace(replace(replace(replace(replace(NEW.phone_primary, '-', ''), ' ', ''), '(', ''), ')', ''), '.', ''), '') || ' ' ||
+                COALESCE(replace(replace(replace(replace(replace(NEW.phone_secondary, '-', ''), ' ', ''), '(', ''), ')', ''), '.', ''), '')),
+           NEW.email,
+           TRIM(COALESCE(NEW.address_street, '') || ' ' ||
+                COALESCE(NEW.address_city, '') || ' ' ||
+                COALESCE(NEW.address_state, '') || ' ' ||
+                COALESCE(NEW.address_zip, '')),
+           NEW.medical_record_number,
+           TRIM(COALESCE(NEW.insurance_policy_number, '') || ' ' || COALESCE(NEW.insurance_primary, ''))
+    WHERE NEW.patient_id IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_onboarding_patients_fts_insert
+AFTER INSERT ON onboarding_patients
+BEGIN
+    INSERT INTO patient_fts (rowid, name, phone, email, address, mrn, insurance)
+    VALUES (NEW.onboarding_id * 2 + 1,
+            TRIM(COALESCE(NEW.first_name, '') || ' ' || COALESCE(NEW.last_name, '')),
+            TRIM(COALESCE(NEW.phone_primary, '') || ' ' ||
+                 COALESCE(replace(replace(replace(replace(replace(NEW.phone_primary, '-', ''), ' ', ''), '(', ''), ')', ''), '.', ''), '')),
+            NEW.email,
+            TRIM(COALESCE(NEW.address_street, '') || ' ' ||
+                 COALESCE(NEW.address_city, '') || ' ' ||
+                 COALESCE(NEW.address_state, '') || ' ' ||
+                 COALESCE(NEW.address_zip, '')),
+            NULL,
+            TRIM(COALESCE(NEW.policy_number, '') || ' ' ||
+                 COALESCE(NEW.group_number, '') || ' ' ||
+                 COALESCE(NEW.insurance_provider, '')));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_onboarding_patients_fts_delete
+AFTER DELETE ON onboarding_patients
+BEGIN
+    DELETE FROM patient_fts WHERE rowid = OLD.onboarding_id * 2 + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_onboarding_patients_fts_update
+AFTER UPDATE OF first_name, last_name, phone_primary, email,
+    address_street, address_city, address_state, address_zip,
+    policy_number, group_number, insurance_provider ON onboarding_patients
+BEGIN
+    DELETE FROM patient_fts WHERE rowid = OLD.onboarding_id * 2 + 1;
+    INSERT INTO patient_fts (rowid, name, phone, email, address, mrn, insurance)
+    VALUES (NEW.onboarding_id * 2 + 1,
+            TRIM(COALESCE(NEW.first_name, '') || ' ' || COALESCE(NEW.last_name, '')),
+            TRIM(COALESCE(NEW.phone_primary, '') || ' ' ||
+                 COALESCE(replace(replace(replace(replace(replace(NEW.phone_primary, '-', ''), ' ', ''), '(', ''), ')', ''), '.', ''), '')),
+            NEW.email,
+            TRIM(COALESCE(NEW.address_street, '') || ' ' ||
+                 COALESCE(NEW.address_city, '') || ' ' ||
+                 COALESCE(NEW.address_state, '') || ' ' ||
+                 COALESCE(NEW.address_zip, '')),
+            NULL,
+            TRIM(COALESCE(NEW.policy_number, '') || ' ' ||
+                 COALESCE(NEW.group_number, '') || ' ' ||
+                 COALESCE(NEW.insurance_provider, '')));
+END;
@@ -3,8 +3,13 @@ import pandas as pd
 import numpy as np
 import time
 from src import database as db
+from src.utils.sql_trace import tracer as sql_tracer
+from src.utils.patient_search_components import SEARCH_PLACEHOLDER
 from datetime import datetime, timedelta
 
+# Patients listed for one search in Patient Management
+PATIENT_SEARCH_RESULTS = 100
+
 def show():
     st.title("Admin Dashboard")
     
@@ -12,7 +17,7 @@ def show():
     user_id = st.session_state.get('user_id', None)
     
     # Create tabs for different admin sections
-    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
+    tab_names = [
         "Performance Overview", 
         "User Management", 
         "Staff Onboarding",
@@ -20,7 +25,13 @@ def show():
         "User Activity", 
         "Reports & Analytics",
         "Patient Management"
-    ])
+    ]
+    # Query tracing tab stays hidden unless tracing is on or the page is opened with ?perf=1
+    show_query_performance_tab = sql_tracer.enabled or st.query_params.get("perf") == "1"
+    if show_query_performance_tab:
+        tab_names.append("Performance")
+    tabs = st.tabs(tab_names)
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = tabs[:7]
 
     # Tab 1: Performance Overview
     with tab1:
@@ -155,29 +166,11 @@ def show():
             st.markdown("#### User Information & Status Management")
             st.write("Manage user details, status, and role assignments. Changes are saved automatically.")
 
-            # Prepare comprehensive data for the data editor
-            data = []
-            for user in users:
-                user_id = user['user_id']
-                user_roles = db.get_user_roles_by_user_id(user_id)
-                user_role_names = [r['role_name'] for r in user_roles]
-                primary_role = next((r['role_name'] for r in user_roles if r['is_primary']), None)
-
-                # Create comprehensive user row
-                row = {
-                    'user_id': user_id,  # Keep for internal use
-                    'full_name': user['full_name'],
-                    'email': user['email'] or '',
-                    'status': user['status'] or 'Active'
-                }
-                
-                # Add role checkboxes
-                for role_name in role_names:
-                    row[f'role_{role_name}'] = role_name in user_role_names
-                
-                data.append(row)
-
-            df = pd.DataFrame(data)
+            # Prepare comprehensive data for the data editor (one query for every user's roles)
+            matrix = db.get_user_role_matrix()
+            df = matrix[['user_id', 'full_name', 'email', 'status'] + [f'role_{role_name}' for role_name in role_names]].copy()
+            df['email'] = df['email'].fillna('')
+            df['status'] = df['status'].fillna('Active')
 
             # Configure columns for the comprehensive data editor with autosize
             column_config = {
@@ -208,57 +201,33 @@ def show():
             if st.session_state.get("comprehensive_user_editor"):
                 changes = st.session_state["comprehensive_user_editor"]
                 
-                # Handle edited cells
+                # Handle edited cells: every change is saved in one transaction
                 if "edited_rows" in changes and changes["edited_rows"]:
+                    pending = []
                     for row_index, changed_cells in changes["edited_rows"].items():
-                        user_id = df.iloc[row_index]['user_id']
+                        user_id = int(df.iloc[row_index]['user_id'])
                         full_name = df.iloc[row_index]['full_name']
-
                         for col_name, new_value in changed_cells.items():
-                            try:
-                                if col_name.startswith('role_'):  # Role checkbox changed
-                                    role_name = col_name.replace('role_', '')
-                                    role_id = role_id_map[role_name]
-                                    if new_value:
-                                        db.add_user_role(user_id, role_id)
-                                        st.success(f"✅ Added {role_name} role to {full_name}")
-                                    else:
-                                        db.remove_user_role(user_id, role_id)
-                                        st.success(f"❌ Removed {role_name} role from {full_name}")
-                                
-                                elif col_name == 'status':  # Status changed
-                                    # Update user status in database
-                                    conn = db.get_db_connection()
-                                    conn.execute("""
-                                        UPDATE users 
-                                        SET status = ? 
-                                        WHERE user_id = ?
-                                    """, (new_value, user_id))
-                                    conn.commit()
-                                    conn.close()
-                                    st.success(f"📊 Updated status to {new_value} for {full_name}")
-                                
-                                elif col_name in ['full_name', 'email']:  # Basic info changed
-                                    # Update user information in database
-                                    conn = db.get_db_connection()
-                                    if col_name == 'full_name':
-                                        conn.execute("""
-                                            UPDATE users 
-                                            SET full_name = ? 
-                                            WHERE user_id = ?
-                                        """, (new_value, user_id))
-                                    elif col_name == 'email':
-                                        conn.execute("""
-                                            UPDATE users 
-                                            SET email = ? 
-                                            WHERE user_id = ?
-                                        """, (new_value, user_id))
-                                    conn.commit()
-                                    conn.close()
-                                    st.success(f"📝 Updated {col_name.replace('_', ' ').title()} for {full_name}")
-                            
-                            except Exception as e:
-                                st.error(f"❌ Error updating {col_name} for {full_name}: {e}")
+                            pending.append((user_id, full_name, col_name, new_value))
+
+                    try:
+                        db.save_user_matrix_changes(
+                            [(user_id, col_name, new_value) for user_id, _, col_name, new_value in pending],
+                            role_id_map
+                        )
+                        for _, full_name, col_name, new_value in pending:
+                            if col_name.startswith('role_'):  # Role checkbox changed
+                                role_name = col_name.replace('role_', '')
+                                if new_value:
+                                    st.success(f"✅ Added {role_name} role to {full_name}")
+                                else:
+                                    st.success(f"❌ Removed {role_name} role from {full_name}")
+                            elif col_name == 'status':  # Status changed
+                                st.success(f"📊 Updated status to {new_value} for {full_name}")
+                            else:  # Basic info changed
+                                st.success(f"📝 Updated {col_name.replace('_', ' ').title()} for {full_name}")
+                    except Exception as e:
+                        st.error(f"❌ Error saving user changes: {e}")
 
                     # Auto-refresh after changes
                     time.sleep(1)  # Brief delay to show success messages
@@ -613,8 +582,9 @@ def show():
     with tab7:
         st.subheader("Patient Management")
         
-        # Get all patients
-        patients = db.get_all_patients()
+        # Find patients through the full-text index instead of loading every patient
+        patient_search = st.text_input("Find patient", key="admin_patient_search", placeholder=SEARCH_PLACEHOLDER)
+        patients = db.search_patients(patient_search, limit=PATIENT_SEARCH_RESULTS) if patient_search.strip() else []
         
         if patients:
             # Create a DataFrame for display
@@ -700,9 +670,75 @@ def show():
                             st.error("Failed to update patient status. Please try again.")
                     else:
                         st.info("No changes made to patient status.")
+        elif patient_search.strip():
+            st.info("No patients match that search.")
         else:
-            st.info("No patients found in the system.")
+            st.info("Search by name, phone, email, address, MRN or policy number to manage a patient.")
+
+    if show_query_performance_tab:
+        with tabs[7]:
+            show_query_performance()
 
     # Add a footer with system information
     st.divider()
     st.caption("Admin Dashboard - Last updated: " + datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def show_query_performance():
+    """SQL tracing controls and per-statement aggregates (see src/utils/sql_trace.py)"""
+    st.subheader("Query Performance")
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        sql_tracer.enabled = st.toggle("Trace SQL statements", value=sql_tracer.enabled, key="admin_sql_trace_toggle",
+                                       help="Times every query on the pooled connections for all users of this server")
+    with col2:
+        if st.button("Reset", key="admin_sql_trace_reset"):
+            sql_tracer.reset()
+
+    stats = sql_tracer.stats()
+    if not stats:
+        st.info("No statements traced yet. Turn tracing on and use the dashboards, then come back here.")
+        return
+
+    stats_df = pd.DataFrame(stats)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Statements", f"{int(stats_df['calls'].sum()):,}")
+    col2.metric("Total Time", f"{stats_df['total_seconds'].sum():.2f}s")
+    col3.metric("Rows Fetched", f"{int(stats_df['rows'].sum()):,}")
+    col4.metric("Lock Wait", f"{stats_df['lock_wait_seconds'].sum():.2f}s")
+    st.caption(f"Since {datetime.fromtimestamp(sql_tracer.started).strftime('%Y-%m-%d %H:%M:%S')}")
+
+    by_call_site = (stats_df.groupby('call_site', as_index=False)[['calls', 'total_seconds', 'rows']].sum()
+                    .sort_values('total_seconds', ascending=False))
+    st.markdown("#### By Call Site")
+    st.dataframe(by_call_site, use_container_width=True, hide_index=True)
+
+    st.markdown("#### By Statement")
+    display_df = stats_df.assign(
+        total_ms=stats_df['total_seconds'] * 1000,
+        max_ms=stats_df['max_seconds'] * 1000,
+        lock_wait_ms=stats_df['lock_wait_seconds'] * 1000,
+    )[['call_site', 'calls', 'total_ms', 'avg_ms', 'max_ms', 'rows', 'lock_wait_ms', 'statement']]
+    st.dataframe(
+        display_df,
+        use_container_width=True,
+        height=400,
+        column_config={
+            "total_ms": st.column_config.NumberColumn("Total (ms)", format="%.1f"),
+            "avg_ms": st.column_config.NumberColumn("Avg (ms)", format="%.2f"),
+            "max_ms": st.column_config.NumberColumn("Max (ms)", format="%.2f"),
+            "lock_wait_ms": st.column_config.NumberColumn("Lock Wait (ms)", format="%.1f"),
+            "statement": st.column_config.TextColumn("Statement", width="large"),
+        },
+        hide_index=True
+    )
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("Download Flamegraph Stacks", sql_tracer.folded_stacks(), file_name="sql_trace.folded",
+                           mime="text/plain", key="admin_sql_trace_folded",
+                           help="Folded stacks in microseconds, for flamegraph.pl or speedscope")
+    with col2:
+        st.download_button("Download CSV", stats_df.to_csv(index=False), file_name="sql_trace.csv",
+                           mime="text/csv", key="admin_sql_trace_csv")
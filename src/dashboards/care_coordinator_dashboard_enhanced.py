@@ -1,8 +1,40 @@
+import functools
 import streamlit as st
 import pandas as pd
 from src import database
+from src.utils.task_entry_components import format_minutes, show_daily_task_entries
 from datetime import datetime
 
+# Rows per page offered in the patient assignments list
+PATIENT_PAGE_SIZES = [25, 50, 100, 250]
+
+def _reset_patient_page():
+    # A new search or page size starts the list again from the first page
+    st.session_state["coordinator_patient_page"] = 1
+
+def _coordinator_id(user_id):
+    conn = database.get_db_connection()
+    try:
+        result = conn.execute("SELECT coordinator_id FROM coordinators WHERE user_id = ?", (user_id,)).fetchone()
+        return result[0] if result else None
+    finally:
+        conn.close()
+
+def _minutes_served(coordinator_id, month_start, next_month_start):
+    conn = database.get_db_connection()
+    try:
+        result = conn.execute("""
+            SELECT SUM(ct.duration_minutes) as total_minutes
+            FROM coordinator_tasks ct
+            JOIN patients p ON ct.patient_id = p.patient_id
+            WHERE ct.coordinator_id = ? 
+            AND ct.task_date_iso >= ? AND ct.task_date_iso < ?
+            AND p.status IN ('Active', 'Active-Geri', 'Active-PCP')
+        """, (coordinator_id, month_start, next_month_start)).fetchone()
+        return result[0] if result[0] else 0
+    finally:
+        conn.close()
+
 def show(user_id, user_role_ids=None):
     if user_role_ids is None:
         user_role_ids = []
@@ -166,124 +198,91 @@ def show_onboarding_queue_stats_cc(user_id, has_management_role=False):
 
 def show_coordinator_patient_list(user_id):
     
+    # Panel data comes from the session snapshot and is only re-queried when the
+    # database has changed, so widget interactions elsewhere on the page are free
+    snapshot = database.get_session_snapshot()
+
     # Get the coordinator_id from user_id first
     coordinator_id = None
     try:
-        conn = database.get_db_connection()
-        cursor = conn.execute("SELECT coordinator_id FROM coordinators WHERE user_id = ?", (user_id,))
-        result = cursor.fetchone()
-        if result:
-            coordinator_id = result[0]
-        conn.close()
+        coordinator_id = snapshot.get('coordinator_id', lambda: _coordinator_id(user_id), ('coordinators',), user_id)
     except Exception as e:
         st.error(f"Error getting coordinator ID: {e}")
 
-    # Get all patients assigned to this coordinator with proper status information
+    # Only Active, Active-Geri and Active-PCP patients are listed and counted; the
+    # search and paging selections are read from session state so a single query
+    # returns the page, the total and the status counts
+    active_patient_statuses = ('Active', 'Active-Geri', 'Active-PCP')
+    search_text = st.session_state.get("coordinator_patient_search", "")
+    page_size = st.session_state.get("coordinator_patient_page_size", PATIENT_PAGE_SIZES[0])
+    page_number = st.session_state.get("coordinator_patient_page", 1)
+
     try:
-        conn = database.get_db_connection()
-        cursor = conn.execute("""
-            SELECT DISTINCT
-                p.patient_id,
-                p.first_name,
-                p.last_name,
-                p.status,
-                p.address_street,
-                p.address_city,
-                p.address_state,
-                p.address_zip,
-                p.phone_primary,
-                p.email
-            FROM user_patient_assignments upa
-            JOIN patients p ON upa.patient_id = p.patient_id
-            WHERE upa.user_id = ?
-            ORDER BY p.last_name, p.first_name
-        """, (user_id,))
-        assigned_patients = cursor.fetchall()
-        conn.close()
-        # Convert to list of dictionaries for easier handling
-        patient_data_list = []
-        for patient in assigned_patients:
-            patient_dict = {}
-            for key in patient.keys():
-                patient_dict[key] = patient[key]
-            patient_data_list.append(patient_dict)
-            
+        patient_page = snapshot.get(
+            'patient_list_page',
+            lambda: database.get_patient_list_page(
+                user_id, statuses=active_patient_statuses, search=search_text or None,
+                limit=page_size, offset=(page_number - 1) * page_size
+            ),
+            database.PATIENT_PANEL_TABLES,
+            user_id, search_text, page_size, page_number
+        )
     except Exception as e:
         st.error(f"Error fetching patient data: {e}")
-        patient_data_list = []
-        assigned_patients = []
+        patient_page = {'rows': [], 'total': 0, 'facets': {'status': [], 'county': [], 'zip': []}}
 
-    # Filter patients to only show Active, Active-Geri, and Active-PCP statuses for metrics
-    active_patient_statuses = ['Active', 'Active-Geri', 'Active-PCP']
-    active_patients = [p for p in patient_data_list if p.get('status', '').strip() in active_patient_statuses]
-    
-    # Get counties and zip codes assigned to this specific coordinator for filtering
-    all_counties = []
-    all_zip_codes = []
-    
-    try:
-        # Get counties using the new dashboard mapping table
-        counties = database.get_provider_counties(coordinator_id)  # Using provider method, but we'll adapt
-        all_counties = counties  # Already formatted correctly
-        
-        # Get zip codes using the new dashboard mapping table
-        zip_codes = database.get_provider_zip_codes(coordinator_id)  # Using provider method, but we'll adapt
-        all_zip_codes = zip_codes  # Already formatted correctly
-        
-    except Exception as e:
-        print(f"Error getting coordinator counties/zip codes: {e}")
-        # Provide fallback data to show that the system is working
-        all_counties = [("Los Angeles", "Los Angeles, CA [0]")]
-        all_zip_codes = [("90001", "90001 - Los Angeles, CA [0]")]
-    
     # Create enhanced metrics cards using Streamlit elements
     col1, col2, col3 = st.columns(3)
     
     # Total patients assigned (only active patients)
-    total_patients = len(active_patients)
+    total_patients = sum(count for status, count in patient_page['facets']['status'] if status.strip() in active_patient_statuses)
     col1.metric("Total Patients Assigned", total_patients)
     
     # Active patients (Active, Active-Geri, Active-PCP)
-    active_patients_count = len(active_patients)
+    active_patients_count = total_patients
     col2.metric("Active Patients", active_patients_count)
     
     # Calculate hours:minutes served this month for active patients only
     total_minutes_this_month = 0
     try:
-        conn = database.get_db_connection()
         # Get total minutes from coordinator_tasks for this month, filtered by active patients
         current_month = datetime.now().month
         current_year = datetime.now().year
         
-        cursor = conn.execute("""
-            SELECT SUM(ct.duration_minutes) as total_minutes
-            FROM coordinator_tasks ct
-            JOIN patients p ON ct.patient_id = p.patient_id
-            WHERE ct.coordinator_id = ? 
-            AND strftime('%Y-%m', ct.task_date) = ?
-            AND p.status IN ('Active', 'Active-Geri', 'Active-PCP')
-        """, (coordinator_id, f"{current_year}-{current_month:02d}"))
+        month_start = f"{current_year}-{current_month:02d}-01"
+        next_month_start = f"{current_year + current_month // 12}-{current_month % 12 + 1:02d}-01"
         
-        result = cursor.fetchone()
-        total_minutes_this_month = result[0] if result[0] else 0
-        conn.close()
+        total_minutes_this_month = snapshot.get(
+            'minutes_served', lambda: _minutes_served(coordinator_id, month_start, next_month_start),
+            ('coordinator_tasks', 'patients'), coordinator_id, month_start
+        )
         
-        # Convert minutes to hours and minutes
-        hours = total_minutes_this_month // 60
-        minutes = total_minutes_this_month % 60
-        time_string = f"{hours}h {minutes}m"
+        time_string = format_minutes(total_minutes_this_month)
     except Exception as e:
         print(f"Error calculating time served: {e}")
         time_string = "0h 0m"
     
-    col3.metric("Time Served This Month", time_string)
+    # A placeholder, so logging a task redraws only this tile (see show_daily_task_entries)
+    minutes_tile = col3.empty()
+    minutes_tile.metric("Time Served This Month", time_string)
     
     st.divider()
     
     st.subheader("Active Patient Assignments")
     
-    # Filter patients to only show Active, Active-Geri, and Active-PCP for display
-    filtered_patients = [p for p in patient_data_list if p.get('status', '').strip() in active_patient_statuses]
+    # Search and paging controls; filtering and paging already ran in SQLite
+    total_matches = patient_page['total']
+    page_count = max(1, -(-total_matches // page_size))
+    col1, col2, col3 = st.columns([3, 1, 1])
+    with col1:
+        st.text_input("Search patients (name, phone, email, city)", key="coordinator_patient_search", on_change=_reset_patient_page)
+    with col2:
+        st.selectbox("Rows per page", PATIENT_PAGE_SIZES, key="coordinator_patient_page_size", on_change=_reset_patient_page)
+    with col3:
+        st.number_input(f"Page (of {page_count})", min_value=1, max_value=max(page_count, page_number), step=1, key="coordinator_patient_page")
+    st.caption(f"{total_matches} matching patients")
+
+    filtered_patients = patient_page['rows']
     
     if filtered_patients:
         try:
@@ -344,123 +343,32 @@ def show_coordinator_patient_list(user_id):
 
     st.subheader("Daily Task Entries")
 
+    # The task pickers offer every active patient, not just the page shown above
+    try:
+        active_patients = snapshot.get(
+            'patient_options', lambda: database.get_patient_options(user_id, statuses=active_patient_statuses),
+            database.PATIENT_PANEL_TABLES, user_id, active_patient_statuses
+        )
+    except Exception as e:
+        print(f"Error fetching active patients: {e}")
+        active_patients = []
+
     # Fetch task billing codes for the task dropdown
     task_billing_codes = database.get_tasks_billing_codes_by_service_type("Primary Care Visit")
     # Group by task_description to avoid duplicates
     unique_task_descriptions = list(set(task['task_description'] for task in task_billing_codes))
     task_options = sorted(unique_task_descriptions)
 
-    # Initialize session state for tasks if not already present
-    if 'daily_tasks_data' not in st.session_state:
-        st.session_state.daily_tasks_data = [{}] * 5
-
-    # Add a button to add more task entries dynamically
-    if st.button("Add Task Entry"):
-        st.session_state.daily_tasks_data.append({})
-
-    # Create task entries
-    for i, task_entry in enumerate(st.session_state.daily_tasks_data):
-        st.markdown(f"#### Task Entry {i+1}")
-        # Create a compact row layout for date, patient, task type, and duration
-        col1, col2, col3, col4 = st.columns([1, 2, 2, 1])
-
-        with col1:
-            task_entry['date'] = st.date_input(f"Date {i+1}", value=task_entry.get('date', pd.to_datetime('today')), key=f"date_{i}")
-        with col2:
-            # Patient selection - only show active patients
-            active_patient_names = [f"{p['first_name']} {p['last_name']}" for p in active_patients if 'first_name' in p and 'last_name' in p]
-            if active_patient_names:
-                task_entry['patient_name'] = st.selectbox(f"Patient {i+1}", active_patient_names, key=f"patient_{i}", index=0 if active_patient_names else -1)
-            else:
-                task_entry['patient_name'] = st.selectbox(f"Patient {i+1}", ["No active patients available"], key=f"patient_{i}", index=0)
-        with col3:
-            task_entry['task_type'] = st.selectbox(f"Task Type {i+1}", task_options, key=f"task_type_{i}", index=0 if task_options else -1)
-        with col4:
-            # Timer functionality for duration - compact layout in one row
-            timer_key = f"timer_{i}"
-            duration_key = f"duration_{i}"
-            
-            # Initialize timer state
-            if timer_key not in st.session_state:
-                st.session_state[timer_key] = 0
-                st.session_state[f"{timer_key}_running"] = False
-                st.session_state[f"{timer_key}_start_time"] = None
-            
-            # Create a compact timer layout - timer text next to button, duration next to button too
-            timer_display = f"{st.session_state[timer_key] // 60:02d}:{st.session_state[timer_key] % 60:02d}"
-            
-            # Display everything on same line: timer text, button, duration
-            col_timer_text, col_timer_btn, col_duration = st.columns([1, 1, 1])
-            
-            with col_timer_text:
-                st.write(f"Timer: {timer_display}")
-            
-            with col_timer_btn:
-                # Start/Stop timer button (smaller)
-                timer_btn_key = f"timer_btn_{i}"
-                if st.button("▶/⏹", key=timer_btn_key, use_container_width=True, help="Start/Stop Timer"):
-                    if not st.session_state[f"{timer_key}_running"]:
-                        st.session_state[f"{timer_key}_running"] = True
-                        st.session_state[f"{timer_key}_start_time"] = pd.Timestamp.now()
-                    else:
-                        st.session_state[f"{timer_key}_running"] = False
-                        # When timer stops, update the duration field
-                        if st.session_state[f"{timer_key}_start_time"]:
-                            current_time = pd.Timestamp.now()
-                            elapsed_seconds = int((current_time - st.session_state[f"{timer_key}_start_time"]).total_seconds())
-                            st.session_state[timer_key] = elapsed_seconds
-                            task_entry['duration'] = elapsed_seconds // 60 + 1  # Convert to minutes, add 1 to avoid 0
-                            # Force a refresh to update the display
-                            st.experimental_rerun()
-            
-            with col_duration:
-                # Manual duration input (compact) - placed next to timer button
-                task_entry['duration'] = st.number_input(f"Duration (min)", min_value=1, value=task_entry.get('duration', 30), key=duration_key, label_visibility="collapsed")
-            
-            # Update timer in real-time using a rerun approach
-            if st.session_state[f"{timer_key}_running"]:
-                current_time = pd.Timestamp.now()
-                if st.session_state[f"{timer_key}_start_time"]:
-                    elapsed_seconds = int((current_time - st.session_state[f"{timer_key}_start_time"]).total_seconds())
-                    st.session_state[timer_key] = elapsed_seconds
-                    # Update the number input to reflect timer value
-                    task_entry['duration'] = elapsed_seconds // 60 + 1  # Convert to minutes, add 1 to avoid 0
-                    # Force a refresh to update the display
-                    st.experimental_rerun()
-
-        task_entry['notes'] = st.text_area(f"Notes {i+1}", value=task_entry.get('notes', ''), key=f"notes_{i}")
-
-        if st.button(f"Log Task {i+1}", key=f"log_task_{i}"):
-            if task_entry.get('patient_name') and task_entry.get('task_type') and task_entry.get('duration'):
-                # Save to database using the existing function
-                try:
-                    # Get patient_id from the selected patient name
-                    selected_patient = next((p for p in active_patients if f"{p['first_name']} {p['last_name']}" == task_entry['patient_name']), None)
-                    if selected_patient:
-                        # Call the database function to save the task
-                        success = database.save_coordinator_task(
-                            coordinator_id=coordinator_id,
-                            patient_id=selected_patient['patient_id'],
-                            task_date=task_entry['date'],
-                            task_description=task_entry['task_type'],
-                            duration_minutes=task_entry['duration'],
-                            notes=task_entry['notes']
-                        )
-                        
-                        if success:
-                            st.success(f"Task '{task_entry['task_type']}' logged for {task_entry['patient_name']} on {task_entry['date']} with duration {task_entry['duration']} minutes.")
-                            # Clear the form after successful save
-                            st.session_state.daily_tasks_data[i] = {}
-                            st.rerun()
-                        else:
-                            st.error("Error saving task to database.")
-                    else:
-                        st.error("Error: Could not find patient ID.")
-                except Exception as e:
-                    st.error(f"Error saving task to database: {e}")
-            else:
-                st.warning("Please fill in all fields for the task entry.")
-        st.markdown("---")
+    show_daily_task_entries(
+        functools.partial(database.save_coordinator_tasks_bulk, coordinator_id),
+        active_patients, task_options, minutes_tile,
+        lambda: snapshot.get(
+            'minutes_served', lambda: _minutes_served(coordinator_id, month_start, next_month_start),
+            ('coordinator_tasks', 'patients'), coordinator_id, month_start
+        ),
+        no_patients_label="No active patients available",
+        scope_user_id=user_id
+    )
 
     # Add a summary section
     st.subheader("Quick Summary")
@@ -1,6 +1,9 @@
+import functools
 import streamlit as st
 import pandas as pd
 from src import database
+from src.utils.task_entry_components import format_minutes, show_daily_task_entries
+from src.utils.patient_search_components import patient_label, patient_picker
 import numpy as np
 from datetime import datetime
 
@@ -11,6 +14,26 @@ try:
 except ImportError:
     USE_AWESOME_TABLE = False
 
+# Rows per page offered in the assigned patients list
+PATIENT_PAGE_SIZES = [25, 50, 100, 250]
+
+def _reset_patient_page():
+    # A new filter or page size starts the list again from the first page
+    st.session_state["patient_page_1"] = 1
+
+def _minutes_served(provider_id, month_start, next_month_start):
+    conn = database.get_db_connection()
+    try:
+        result = conn.execute("""
+            SELECT SUM(minutes_of_service) as total_minutes
+            FROM provider_tasks 
+            WHERE provider_id = ? 
+            AND task_date_iso >= ? AND task_date_iso < ?
+        """, (provider_id, month_start, next_month_start)).fetchone()
+        return result[0] if result[0] else 0
+    finally:
+        conn.close()
+
 def show(user_id, user_role_ids=None):
     if user_role_ids is None:
         user_role_ids = []
@@ -153,213 +176,83 @@ def show_onboarding_queue_stats(user_id, has_management_role=False):
                 st.metric("🆕 New Patients (30d)", queue_stats['new_patients_30_days'])
 
 def show_patient_list_section(user_id):
+    # Panel data comes from the session snapshot and is only re-queried when the
+    # database has changed, so widget interactions elsewhere on the page are free
+    snapshot = database.get_session_snapshot()
+
     # Get the provider_id from user_id first
-    provider_id = database.get_provider_id_from_user_id(user_id)
+    provider_id = snapshot.get('provider_id', lambda: database.get_provider_id_from_user_id(user_id), ('providers',), user_id)
     if not provider_id:
         st.error("No provider found for this user. Please contact your administrator.")
         return
 
-    # Get all patients assigned to this provider with proper status information
+    # Filter and paging selections are read from session state before the widgets
+    # render, so one query returns the page, the total and the dropdown facets
+    selected_statuses = st.session_state.get("status_filter_1", ['All'])
+    selected_county = st.session_state.get("county_filter_1", "All Counties")
+    selected_zip_code = st.session_state.get("zip_filter_1", "All Zip Codes")
+    search_text = st.session_state.get("patient_search_1", "")
+    page_size = st.session_state.get("patient_page_size_1", PATIENT_PAGE_SIZES[0])
+    page_number = st.session_state.get("patient_page_1", 1)
+
+    status_filter = tuple(s for s in selected_statuses if s != 'All') if 'All' not in selected_statuses else None
+    county_filter = selected_county.split(',')[0] if selected_county not in ('All Counties', 'No counties available') else None
+    zip_filter = selected_zip_code.split(' - ')[0] if selected_zip_code not in ('All Zip Codes', 'No zip codes available') else None
+
     try:
-        conn = database.get_db_connection()
-        cursor = conn.execute("""
-            SELECT DISTINCT
-                p.patient_id,
-                p.first_name,
-                p.last_name,
-                p.status,
-                p.address_street,
-                p.address_city,
-                p.address_state,
-                p.address_zip,
-                p.phone_primary,
-                p.email,
-                prs.zip_code,
-                prs.city,
-                prs.state,
-                r.county as region_county,
-                CASE 
-                    WHEN EXISTS (
-                        SELECT 1 FROM region_providers rp2 
-                        JOIN regions r2 ON rp2.region_id = r2.region_id 
-                        WHERE rp2.provider_id = ? AND r2.county = r.county
-                    ) THEN 0 
-                    ELSE 1 
-                END as outside_provider_region
-            FROM user_patient_assignments upa
-            JOIN patients p ON upa.patient_id = p.patient_id
-            LEFT JOIN patient_region_mapping prs ON p.patient_id = prs.patient_id
-            LEFT JOIN regions r ON prs.region_id = r.region_id
-            WHERE upa.user_id = ?
-            ORDER BY p.last_name, p.first_name
-        """, (provider_id, user_id,))
-        assigned_patients = cursor.fetchall()
-        conn.close()
-        # Convert to list of dictionaries for easier handling
-        patient_data_list = []
-        for patient in assigned_patients:
-            patient_dict = {}
-            for key in patient.keys():
-                patient_dict[key] = patient[key]
-            patient_data_list.append(patient_dict)
-            
+        patient_page = snapshot.get(
+            'patient_list_page',
+            lambda: database.get_patient_list_page(
+                user_id, provider_id=provider_id, statuses=status_filter, active_only=True,
+                county=county_filter, zip_code=zip_filter, search=search_text or None,
+                limit=page_size, offset=(page_number - 1) * page_size
+            ),
+            database.PATIENT_PANEL_TABLES,
+            user_id, provider_id, status_filter, county_filter, zip_filter, search_text, page_size, page_number
+        )
     except Exception as e:
         st.error(f"Error fetching patient data: {e}")
-        # Debug: Let's check what's in the assignments table for this user
-        try:
-            conn = database.get_db_connection()
-            cursor = conn.execute("SELECT COUNT(*) as count FROM user_patient_assignments WHERE user_id = ?", (user_id,))
-            count = cursor.fetchone()[0]
-            st.info(f"Debug: Found {count} patient assignments for user {user_id}")
-            conn.close()
-        except Exception as e2:
-            st.info(f"Debug error: {e2}")
-        patient_data_list = []
-        assigned_patients = []
+        patient_page = {'rows': [], 'total': 0, 'facets': {'status': [], 'county': [], 'zip': []}}
+
+    facets = patient_page['facets']
+    all_statuses = [status for status, _ in facets['status']]
+    all_counties = [(county, f"{county}, {state} [{count}]") for county, state, count in facets['county']]
+    all_zip_codes = [(zip_code, f"{zip_code} - {city}, {state} [{count}]") for zip_code, city, state, count in facets['zip']]
 
-    # Get all unique patient statuses for filtering
-    all_statuses = []
-    if patient_data_list:
-        try:
-            # Extract unique statuses from patient data
-            all_statuses = list(set([p.get('status', 'Unknown') for p in patient_data_list if 'status' in p]))
-            all_statuses = sorted([s for s in all_statuses if s and s != ''])  # Remove empty strings and sort
-            # Clean up status names to remove "changed" and "Call0" suffixes
-            all_statuses = [s.split('changed')[0].split('Call0')[0].strip() for s in all_statuses]
-        except Exception as e:
-            print(f"Error getting statuses: {e}")
-            all_statuses = ['Active', 'Inactive', 'Pending', 'Discharged']  # Default fallback
-    else:
-        all_statuses = ['Active', 'Inactive', 'Pending', 'Discharged']  # Default fallback
-    
-    # Filter statuses to only show active-like statuses for metrics calculation
-    active_statuses = ['Active', 'active', 'Active - Changed', 'Active - Call0', 'Active - Changed', 'Active - Call0']
-    active_patient_statuses = [s for s in all_statuses if any(active_status.lower() in s.lower() for active_status in active_statuses)]
-    if not active_patient_statuses:
-        active_patient_statuses = ['Active', 'active']  # Fallback
-    
-    # Get counties and zip codes for filtering
-    # Priority: 1) Provider's assigned regions 2) All regions where the provider has patients
-    all_counties = []
-    all_zip_codes = []
-    
-    try:
-        conn = database.get_db_connection()
-        
-        # First check if provider has specific region assignments
-        cursor = conn.execute("""
-            SELECT COUNT(*) FROM region_providers WHERE provider_id = ?
-        """, (provider_id,))
-        has_region_assignments = cursor.fetchone()[0] > 0
-        
-        if has_region_assignments:
-            # Provider has region constraints - show their assigned regions AND their actual patients' regions
-            print(f"DEBUG: Provider {provider_id} has region assignments")
-            
-            # Get counties from provider's assigned regions PLUS counties where they have actual patients
-            cursor = conn.execute("""
-                SELECT DISTINCT r.county, r.state, COUNT(DISTINCT p.patient_id) as patient_count
-                FROM region_providers rp
-                JOIN regions r ON rp.region_id = r.region_id
-                LEFT JOIN patient_region_mapping prm ON r.region_id = prm.region_id
-                LEFT JOIN patients p ON prm.patient_id = p.patient_id
-                WHERE rp.provider_id = ? AND r.county IS NOT NULL AND r.county != ''
-                GROUP BY r.county, r.state
-                
-                UNION
-                
-                SELECT DISTINCT r.county, r.state, COUNT(DISTINCT p.patient_id) as patient_count
-                FROM user_patient_assignments upa
-                JOIN patients p ON upa.patient_id = p.patient_id
-                LEFT JOIN patient_region_mapping prm ON p.patient_id = prm.patient_id
-                LEFT JOIN regions r ON prm.region_id = r.region_id
-                WHERE upa.user_id = ? AND r.county IS NOT NULL AND r.county != ''
-                GROUP BY r.county, r.state
-                ORDER BY county
-            """, (provider_id, user_id))
-            
-        else:
-            # Provider has no region constraints - show all regions where they have patients
-            print(f"DEBUG: Provider {provider_id} has no region assignments, showing all patient regions")
-            cursor = conn.execute("""
-                SELECT DISTINCT r.county, r.state, COUNT(DISTINCT p.patient_id) as patient_count
-                FROM user_patient_assignments upa
-                JOIN patients p ON upa.patient_id = p.patient_id
-                LEFT JOIN patient_region_mapping prm ON p.patient_id = prm.patient_id
-                LEFT JOIN regions r ON prm.region_id = r.region_id
-                WHERE upa.user_id = ? AND r.county IS NOT NULL AND r.county != ''
-                GROUP BY r.county, r.state
-                ORDER BY r.county
-            """, (user_id,))
-        
-        counties_data = cursor.fetchall()
-            
-        all_counties = [(c[0], f"{c[0]}, {c[1]} [{c[2]}]") for c in counties_data]
-        print(f"DEBUG: Found {len(counties_data)} counties: {all_counties}")
-        
-        # Get zip codes from the provider's assigned patients
-        print(f"DEBUG: Getting zip codes for provider {provider_id}")
-        cursor = conn.execute("""
-            SELECT DISTINCT p.address_zip, p.address_city, p.address_state, COUNT(*) as patient_count
-            FROM user_patient_assignments upa
-            JOIN patients p ON upa.patient_id = p.patient_id
-            WHERE upa.user_id = ? AND p.address_zip IS NOT NULL AND p.address_zip != ''
-            GROUP BY p.address_zip, p.address_city, p.address_state
-            ORDER BY p.address_zip
-        """, (user_id,))
-        zip_codes_data = cursor.fetchall()
-        
-        all_zip_codes = [(z[0], f"{z[0]} - {z[1]}, {z[2]} [{z[3]}]") for z in zip_codes_data]
-        print(f"DEBUG: Found {len(zip_codes_data)} zip codes: {all_zip_codes}")
-        
-        conn.close()
-        
-    except Exception as e:
-        print(f"Error getting provider counties/zip codes: {e}")
-        # Provide fallback data to show that the system is working
-        all_counties = [("Los Angeles", "Los Angeles, CA [0]")]
-        all_zip_codes = [("90001", "90001 - Los Angeles, CA [0]")]
-    
     # Create enhanced metrics cards using Streamlit elements
     col1, col2, col3 = st.columns(3)
     
     # Total patients assigned (only active patients)
-    active_patients_list = [p for p in patient_data_list if p.get('status', '').lower().startswith('active')]
-    total_patients = len(active_patients_list)
+    total_patients = sum(count for status, count in facets['status'] if status.strip().lower().startswith('active'))
     col1.metric("Total Patients Assigned", total_patients)
     
     # Active patients (including "Active-*" statuses) - for stats only
-    active_patients = len(active_patients_list)
+    active_patients = total_patients
     col2.metric("Active Patients", active_patients)
     
     # Calculate hours:minutes served this month
     total_minutes_this_month = 0
     try:
-        conn = database.get_db_connection()
         # Get total minutes from provider_tasks for this month
         current_month = datetime.now().month
         current_year = datetime.now().year
         
-        cursor = conn.execute("""
-            SELECT SUM(minutes_of_service) as total_minutes
-            FROM provider_tasks 
-            WHERE provider_id = ? 
-            AND strftime('%Y-%m', task_date) = ?
-        """, (provider_id, f"{current_year}-{current_month:02d}"))
+        month_start = f"{current_year}-{current_month:02d}-01"
+        next_month_start = f"{current_year + current_month // 12}-{current_month % 12 + 1:02d}-01"
         
-        result = cursor.fetchone()
-        total_minutes_this_month = result[0] if result[0] else 0
-        conn.close()
+        total_minutes_this_month = snapshot.get(
+            'minutes_served', lambda: _minutes_served(provider_id, month_start, next_month_start),
+            ('provider_tasks',), provider_id, month_start
+        )
         
-        # Convert minutes to hours and minutes
-        hours = total_minutes_this_month // 60
-        minutes = total_minutes_this_month % 60
-        time_string = f"{hours}h {minutes}m"
+        time_string = format_minutes(total_minutes_this_month)
     except Exception as e:
         print(f"Error calculating time served: {e}")
         time_string = "0h 0m"
     
-    col3.metric("Time Served This Month", time_string)
+    # A placeholder, so logging a task redraws only this tile (see show_daily_task_entries)
+    minutes_tile = col3.empty()
+    minutes_tile.metric("Time Served This Month", time_string)
     
     st.divider()
     
@@ -370,7 +263,7 @@ def show_patient_list_section(user_id):
     with col1:
         # Status filter - multi-select dropdown
         st.write("Filter by Patient Status:")
-        selected_statuses = st.multiselect("Select Status(es)", ['All'] + all_statuses, default=['All'], key="status_filter_1")
+        selected_statuses = st.multiselect("Select Status(es)", ['All'] + all_statuses, default=['All'], key="status_filter_1", on_change=_reset_patient_page)
     with col2:
         # County filter - single select dropdown
         st.write("Filter by County:")
@@ -378,7 +271,7 @@ def show_patient_list_section(user_id):
             county_names = ['All Counties'] + [c[1] for c in all_counties if len(c) > 1]
             if len(county_names) <= 1:  # Only "All Counties"
                 county_names.append("No counties available")
-            selected_county = st.selectbox("Select County", county_names, index=0, key="county_filter_1")
+            selected_county = st.selectbox("Select County", county_names, index=0, key="county_filter_1", on_change=_reset_patient_page)
         except Exception as e:
             st.error(f"Error loading counties: {e}")
             selected_county = "All Counties"
@@ -389,50 +282,24 @@ def show_patient_list_section(user_id):
             zip_code_names = ['All Zip Codes'] + [z[1] for z in all_zip_codes if len(z) > 1]
             if len(zip_code_names) <= 1:  # Only "All Zip Codes"
                 zip_code_names.append("No zip codes available")
-            selected_zip_code = st.selectbox("Select Zip Code", zip_code_names, index=0, key="zip_filter_1")
+            selected_zip_code = st.selectbox("Select Zip Code", zip_code_names, index=0, key="zip_filter_1", on_change=_reset_patient_page)
         except Exception as e:
             st.error(f"Error loading zip codes: {e}")
             selected_zip_code = "All Zip Codes"
     
-    # Filter patients based on selections
-    filtered_patients = patient_data_list
-    if 'All' not in selected_statuses:
-        filtered_patients = [p for p in patient_data_list if p.get('status') in selected_statuses]
-    else:
-        # When 'All' is selected, only show active patients (default behavior)
-        filtered_patients = [p for p in patient_data_list if p.get('status', '').lower().startswith('active')]
-
-    # Further filter by county if selected
-    if selected_county != 'All Counties':
-        # Extract county name from the selected county display text
-        try:
-            selected_county_name = selected_county.split(',')[0]  # Extract county name from "county, state [patient_count]" format
-
-            # Filter patients by county using the patient_region_mapping table
-            # We need to join with regions table to get the county information
-            try:
-                conn = database.get_db_connection()
-                cursor = conn.execute("""
-                    SELECT DISTINCT p.patient_id
-                    FROM patient_region_mapping p
-                    JOIN regions r ON p.region_id = r.region_id
-                    WHERE r.county = ?
-                """, (selected_county_name,))
-                patient_ids_in_county = [row[0] for row in cursor.fetchall()]
-                conn.close()
-
-                # Filter patients to only those in this county
-                filtered_patients = [p for p in filtered_patients if p.get('patient_id') in patient_ids_in_county]
-            except Exception as e:
-                print(f"Error filtering by county: {e}")
-        except Exception as e:
-            print(f"Error processing county filter: {e}")
+    # Search and paging controls; filtering and paging already ran in SQLite
+    total_matches = patient_page['total']
+    page_count = max(1, -(-total_matches // page_size))
+    col1, col2, col3 = st.columns([3, 1, 1])
+    with col1:
+        st.text_input("Search patients (name, phone, email, city)", key="patient_search_1", on_change=_reset_patient_page)
+    with col2:
+        st.selectbox("Rows per page", PATIENT_PAGE_SIZES, key="patient_page_size_1", on_change=_reset_patient_page)
+    with col3:
+        st.number_input(f"Page (of {page_count})", min_value=1, max_value=max(page_count, page_number), step=1, key="patient_page_1")
+    st.caption(f"{total_matches} matching patients")
 
-    # Further filter by zip code if selected
-    if selected_zip_code != 'All Zip Codes':
-        # Extract zip code from the display text format: "zip - city, state [patient_count]"
-        selected_zip = selected_zip_code.split(' - ')[0]  # Extract zip code from "zip - city, state" format
-        filtered_patients = [p for p in filtered_patients if p.get('address_zip') == selected_zip]
+    filtered_patients = patient_page['rows']
 
     if filtered_patients:
         try:
@@ -537,18 +404,14 @@ def show_patient_list_section(user_id):
                     hide_index=True
                 )
 
-            # Patient selection for daily tasks
-            patient_names = [f"{p['first_name']} {p['last_name']}" for p in filtered_patients if 'first_name' in p and 'last_name' in p]
-            if patient_names:
-                selected_patient_name = st.selectbox("Select Patient for Daily Tasks", patient_names, key="daily_tasks_patient_select")
-                if selected_patient_name:
-                    # Find the selected patient
-                    selected_patient = next((p for p in filtered_patients if f"{p['first_name']} {p['last_name']}" == selected_patient_name), None)
-                    if selected_patient:
-                        st.session_state['selected_patient_id'] = selected_patient['patient_id']
-                        st.session_state['selected_patient_name'] = selected_patient_name
-            else:
-                st.info("No patients available for selection")
+            # Patient selection for daily tasks: the page shown above, or any assigned patient by search
+            selected_patient = patient_picker(
+                "Select Patient for Daily Tasks", "daily_tasks_patient_select", user_id, filtered_patients,
+                empty_label="No patients available for selection"
+            )
+            if selected_patient:
+                st.session_state['selected_patient_id'] = selected_patient['patient_id']
+                st.session_state['selected_patient_name'] = patient_label(selected_patient)
 
         except Exception as e:
             st.error(f"Error processing patient data: {e}")
@@ -575,118 +438,31 @@ def show_patient_list_section(user_id):
 
     st.subheader("Daily Task Entries")
 
+    # The task pickers offer every patient with the selected statuses, not just the page shown above
+    try:
+        task_patients = snapshot.get(
+            'patient_options', lambda: database.get_patient_options(user_id, statuses=status_filter, active_only=True),
+            database.PATIENT_PANEL_TABLES, user_id, status_filter
+        )
+    except Exception as e:
+        print(f"Error fetching patients for task entry: {e}")
+        task_patients = []
+
     # Fetch task billing codes for the task dropdown - filtered by Primary Care Visit
     task_billing_codes = database.get_tasks_billing_codes_by_service_type("Primary Care Visit")
     # Group by task_description to avoid duplicates
     unique_task_descriptions = list(set(task['task_description'] for task in task_billing_codes))
     task_options = sorted(unique_task_descriptions)
 
-    # Initialize session state for tasks if not already present
-    if 'daily_tasks_data' not in st.session_state:
-        st.session_state.daily_tasks_data = [{}] * 5  # Reduced from 10 to 5 for cleaner UI
-
-    # Add a button to add more task entries dynamically
-    if st.button("Add Task Entry"):
-        st.session_state.daily_tasks_data.append({})
-
-    # Create task entries
-    for i, task_entry in enumerate(st.session_state.daily_tasks_data):
-        st.markdown(f"#### Task Entry {i+1}")
-        # Create a compact row layout for date, patient, task type, and duration
-        col1, col2, col3, col4 = st.columns([1, 2, 2, 1])
-
-        with col1:
-            task_entry['date'] = st.date_input(f"Date {i+1}", value=task_entry.get('date', pd.to_datetime('today')), key=f"date_{i}")
-        with col2:
-            # Patient selection
-            patient_names = [f"{p['first_name']} {p['last_name']}" for p in filtered_patients if 'first_name' in p and 'last_name' in p]
-            if patient_names:
-                task_entry['patient_name'] = st.selectbox(f"Patient {i+1}", patient_names, key=f"patient_{i}", index=0 if patient_names else -1)
-            else:
-                task_entry['patient_name'] = st.selectbox(f"Patient {i+1}", ["No patients available"], key=f"patient_{i}", index=0)
-        with col3:
-            task_entry['task_type'] = st.selectbox(f"Task Type {i+1}", task_options, key=f"task_type_{i}", index=0 if task_options else -1)
-        with col4:
-            # Timer functionality for duration - compact layout in one row
-            timer_key = f"timer_{i}"
-            duration_key = f"duration_{i}"
-            
-            # Initialize timer state
-            if timer_key not in st.session_state:
-                st.session_state[timer_key] = 0
-                st.session_state[f"{timer_key}_running"] = False
-                st.session_state[f"{timer_key}_start_time"] = None
-            
-            # Create a compact timer layout - timer text next to button, duration next to button too
-            timer_display = f"{st.session_state[timer_key] // 60:02d}:{st.session_state[timer_key] % 60:02d}"
-            
-            # Display everything on same line: timer text, button, duration
-            col_timer_text, col_timer_btn, col_duration = st.columns([1, 1, 1])
-            
-            with col_timer_text:
-                st.write(f"Timer: {timer_display}")
-            
-            with col_timer_btn:
-                # Start/Stop timer button (smaller)
-                timer_btn_key = f"timer_btn_{i}"
-                if st.button("▶/⏹", key=timer_btn_key, use_container_width=True, help="Start/Stop Timer"):
-                    if not st.session_state[f"{timer_key}_running"]:
-                        st.session_state[f"{timer_key}_running"] = True
-                        st.session_state[f"{timer_key}_start_time"] = pd.Timestamp.now()
-                    else:
-                        st.session_state[f"{timer_key}_running"] = False
-                        # When timer stops, update the duration field
-                        if st.session_state[f"{timer_key}_start_time"]:
-                            current_time = pd.Timestamp.now()
-                            elapsed_seconds = int((current_time - st.session_state[f"{timer_key}_start_time"]).total_seconds())
-                            st.session_state[timer_key] = elapsed_seconds
-                            task_entry['duration'] = elapsed_seconds // 60 + 1  # Convert to minutes, add 1 to avoid 0
-                            # Force a refresh to update the display
-                            st.experimental_rerun()
-            
-            with col_duration:
-                # Manual duration input (compact) - placed next to timer button
-                task_entry['duration'] = st.number_input(f"Duration (min)", min_value=1, value=task_entry.get('duration', 30), key=duration_key, label_visibility="collapsed")
-            
-            # Update timer in real-time using a rerun approach
-            if st.session_state[f"{timer_key}_running"]:
-                current_time = pd.Timestamp.now()
-                if st.session_state[f"{timer_key}_start_time"]:
-                    elapsed_seconds = int((current_time - st.session_state[f"{timer_key}_start_time"]).total_seconds())
-                    st.session_state[timer_key] = elapsed_seconds
-                    # Update the number input to reflect timer value
-                    task_entry['duration'] = elapsed_seconds // 60 + 1  # Convert to minutes, add 1 to avoid 0
-                    # Force a refresh to update the display
-                    st.experimental_rerun()
-
-        task_entry['notes'] = st.text_area(f"Notes {i+1}", value=task_entry.get('notes', ''), key=f"notes_{i}")
-
-        if st.button(f"Log Task {i+1}", key=f"log_task_{i}"):
-            if task_entry.get('patient_name') and task_entry.get('task_type') and task_entry.get('duration'):
-                # In a real implementation, this would save to the database
-                # For now, we'll just show a success message
-                st.success(f"Task '{task_entry['task_type']}' logged for {task_entry['patient_name']} on {task_entry['date']} with duration {task_entry['duration']} minutes.")
-                
-                # Save to database using the existing function
-                try:
-                    # Get patient_id from the selected patient name
-                    selected_patient = next((p for p in filtered_patients if f"{p['first_name']} {p['last_name']}" == task_entry['patient_name']), None)
-                    if selected_patient:
-                        # Call the database function to save the task
-                        database.save_daily_task(
-                            provider_id=provider_id,
-                            patient_id=selected_patient['patient_id'],
-                            task_date=task_entry['date'],
-                            task_description=task_entry['task_type'],
-                            duration_minutes=task_entry['duration'],
-                            notes=task_entry['notes']
-                        )
-                        st.success("Task successfully saved to database!")
-                except Exception as e:
-                    st.error(f"Error saving task to database: {e}")
-            else:
-                st.warning("Please fill in all fields for the task entry.")
-        st.markdown("---")
+    show_daily_task_entries(
+        functools.partial(database.save_daily_tasks_bulk, provider_id),
+        task_patients, task_options, minutes_tile,
+        lambda: snapshot.get(
+            'minutes_served', lambda: _minutes_served(provider_id, month_start, next_month_start),
+            ('provider_tasks',), provider_id, month_start
+        ),
+        scope_user_id=user_id
+    )
 
     # # Additional zip code information section
     # st.subheader("Zip Code Information")
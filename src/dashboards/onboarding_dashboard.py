@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 from src import database
+from src.utils.patient_search_components import SEARCH_PLACEHOLDER
 from datetime import datetime
 
 # Define the onboarding workflow steps
@@ -147,10 +148,7 @@ def show_patient_intake_form(current_user_id):
         
         # Facility Assignment - Get facilities from database
         try:
-            conn = database.get_db_connection()
-            facilities = conn.execute("SELECT facility_name FROM facilities ORDER BY facility_name").fetchall()
-            conn.close()
-            facility_options = [f[0] for f in facilities] if facilities else []
+            facility_options = database.get_facility_names()
             facility_options.append("Add New Facility")
         except Exception as e:
             facility_options = ["San Francisco", "Los Angeles", "San Diego", "Sacramento", "Add New Facility"]
@@ -212,6 +210,41 @@ def show_patient_intake_form(current_user_id):
                 except Exception as e:
                     st.error(f"Error creating onboarding workflow: {e}")
 
+def show_referral_upload(current_user_id):
+    """Start onboarding for every valid row of a referral partner's CSV/XLSX file"""
+    from src.utils.referral_intake import REQUIRED_FIELDS, import_referrals
+
+    st.caption(
+        "One patient per row. Required columns: " + ", ".join(REQUIRED_FIELDS) +
+        ". Rows with a bad date of birth or zip, or already in the system, are returned in a reject file."
+    )
+    uploaded = st.file_uploader("Referral spreadsheet", type=["csv", "xlsx"], key="referral_upload")
+    if uploaded is None:
+        return
+
+    if st.button("Start Workflows", type="primary", key="referral_upload_start"):
+        progress = st.progress(0.0, text="Checking rows...")
+        try:
+            result = import_referrals(uploaded, uploaded.name, current_user_id,
+                                      progress=lambda fraction, text: progress.progress(fraction, text=text))
+        except Exception as e:
+            st.error(f"Error importing referrals: {e}")
+            return
+        st.session_state['referral_upload_result'] = {'file': uploaded.name, **result}
+
+    result = st.session_state.get('referral_upload_result')
+    if result and result['file'] == uploaded.name:
+        st.success(f"✅ {len(result['onboarding_ids'])} of {result['rows']} patients from {result['file']} started onboarding.")
+        if len(result['rejects']):
+            st.warning(f"{len(result['rejects'])} rows were rejected.")
+            st.dataframe(result['rejects'].head(100), use_container_width=True, hide_index=True)
+            st.download_button(
+                "Download rejected rows",
+                result['rejects'].to_csv(index=False),
+                file_name=f"{uploaded.name.rsplit('.', 1)[0]}_rejects.csv",
+                mime="text/csv",
+            )
+
 def show_resume_onboarding_form(patient_details, current_user_id):
     """Show form for resuming existing onboarding with current state"""
     
@@ -532,6 +565,39 @@ def show_tv_scheduling_form(patient_details, current_user_id):
                 st.session_state['onboarding_mode'] = None
                 st.rerun()
 
+def _reset_queue_pages():
+    """Back to the first queue page, e.g. when the search text changes"""
+    st.session_state['onboarding_queue_pages'] = [None]
+
+def show_onboarding_queue_page():
+    """Search box, page controls and one keyset page of the onboarding queue.
+
+    Only the page on screen is read; onboarding_queue_pages keeps the after
+    key of every page up to the current one so Previous can step back.
+    Returns the rows of the current page.
+    """
+    if 'onboarding_queue_pages' not in st.session_state:
+        _reset_queue_pages()
+    pages = st.session_state['onboarding_queue_pages']
+
+    col_search, col_prev, col_page, col_next = st.columns([3, 1, 1, 1])
+    with col_search:
+        search = st.text_input("Find patient", key="onboarding_queue_search", placeholder=SEARCH_PLACEHOLDER,
+                               on_change=_reset_queue_pages)
+    queue_page = database.get_onboarding_queue_page(pages[-1], search=search)
+    with col_prev:
+        st.button("◀ Previous", key="queue_prev_page", disabled=len(pages) == 1, on_click=pages.pop)
+    with col_page:
+        if queue_page['total'] is not None:
+            page_count = max(1, -(-queue_page['total'] // database.ONBOARDING_QUEUE_PAGE_SIZE))
+            st.caption(f"Page {len(pages)} of {page_count} · {queue_page['total']} patients")
+        else:
+            st.caption(f"Page {len(pages)} of matches")
+    with col_next:
+        st.button("Next ▶", key="queue_next_page", disabled=queue_page['next_after'] is None,
+                  on_click=pages.append, args=(queue_page['next_after'],))
+    return queue_page['rows']
+
 def show():
     st.title("Patient Onboarding Dashboard")
     
@@ -548,9 +614,9 @@ def show():
     with tab1:
         st.subheader("Patient Onboarding Queue")
         
-        # Get current onboarding queue
+        # Get the current page of the onboarding queue
         try:
-            onboarding_queue = database.get_onboarding_queue()
+            onboarding_queue = show_onboarding_queue_page()
             
             if onboarding_queue:
                 # Create DataFrame for display
@@ -562,8 +628,8 @@ def show():
                     "Current Stage": queue_df['current_stage'], 
                     "Priority": queue_df['priority_status'],
                     "Assigned POT": queue_df['assigned_pot_name'].fillna('Unassigned'),
-                    "Created": pd.to_datetime(queue_df['created_date']).dt.strftime('%m/%d/%Y'),
-                    "Last Update": pd.to_datetime(queue_df['updated_date']).dt.strftime('%m/%d/%Y %H:%M')
+                    "Created": pd.to_datetime(queue_df['created_date'], format='mixed').dt.strftime('%m/%d/%Y'),
+                    "Last Update": pd.to_datetime(queue_df['updated_date'], format='mixed').dt.strftime('%m/%d/%Y %H:%M')
                 })
                 
                 st.dataframe(
@@ -586,18 +652,19 @@ def show():
                 if len(onboarding_queue) > 0:
                     st.markdown("### Quick Actions")
                     
-                    # Patient selector
-                    patient_options = {f"{row['patient_name']} - {row['current_stage']}": row['onboarding_id'] 
-                                     for row in onboarding_queue}
+                    # Patient selector over the page on screen; the search box above narrows it
+                    patient_options = {row['onboarding_id']: f"{row['patient_name']} - {row['current_stage']}"
+                                       for row in onboarding_queue}
                     
-                    selected_patient = st.selectbox(
+                    selected_id = st.selectbox(
                         "Select Patient for Action:",
-                        options=list(patient_options.keys()),
+                        options=list(patient_options),
+                        format_func=patient_options.get,
                         key="selected_patient_queue"
                     )
                     
-                    if selected_patient:
-                        selected_id = patient_options[selected_patient]
+                    if selected_id:
+                        selected_patient = patient_options[selected_id]
                         
                         col1, col2, col3 = st.columns(3)
                         
@@ -695,6 +762,8 @@ def show():
                                 database.update_onboarding_patient_assignment(selected_id, current_user_id)
                                 st.success("Patient assigned to you!")
                                 st.rerun()
+            elif st.session_state.get('onboarding_queue_search'):
+                st.info("No patients in the onboarding queue match that search.")
             else:
                 st.info("No patients currently in the onboarding queue.")
                 
@@ -723,10 +792,14 @@ def show():
         
         if onboarding_mode == 'new':
             st.subheader("📋 New Patient Registration - Stage 1")
-            st.info("Complete the patient registration form to start the onboarding workflow.")
-            
-            # Show new patient intake form
-            show_patient_intake_form(current_user_id)
+            intake_mode = st.radio("Intake", ["Single patient", "Referral file upload"], horizontal=True, key="intake_mode")
+            if intake_mode == "Referral file upload":
+                show_referral_upload(current_user_id)
+            else:
+                st.info("Complete the patient registration form to start the onboarding workflow.")
+                
+                # Show new patient intake form
+                show_patient_intake_form(current_user_id)
             
         elif onboarding_mode == 'resume' and current_onboarding_id:
             # Load existing patient data and show appropriate stage form
@@ -763,33 +836,20 @@ def show():
         
         # Get processing status data from database
         try:
-            onboarding_queue = database.get_onboarding_queue()
+            # Open patients per stage, maintained alongside the stage flags
+            stage_counts = database.get_onboarding_stage_counts()
+            total_patients = sum(stage_counts.values())
             
-            if onboarding_queue:
-                # Calculate status metrics
-                status_counts = {}
-                for patient in onboarding_queue:
-                    stage = patient['current_stage']
-                    status_counts[stage] = status_counts.get(stage, 0) + 1
-                
+            if total_patients:
                 # Display status summary
-                status_data = []
-                stage_order = [
-                    'Stage 1: Patient Registration',
-                    'Stage 2: Eligibility Verification', 
-                    'Stage 3: Chart Creation',
-                    'Stage 4: Intake Processing',
-                    'Stage 5: TV Scheduling',
-                    'Completed - Ready for Handoff'
-                ]
-                
-                for stage in stage_order:
-                    count = status_counts.get(stage, 0)
-                    status_data.append({
-                        "Stage": stage,
+                status_data = [
+                    {
+                        "Stage": database.ONBOARDING_STAGE_LABELS[stage],
                         "Count": count,
                         "Status": "Active" if count > 0 else "None"
-                    })
+                    }
+                    for stage, count in stage_counts.items()
+                ]
                 
                 df = pd.DataFrame(status_data)
                 st.dataframe(
@@ -805,8 +865,7 @@ def show():
                 
                 # Daily metrics
                 st.markdown("### Daily Metrics")
-                total_patients = len(onboarding_queue)
-                completed_today = len([p for p in onboarding_queue if p['current_stage'] == 'Completed - Ready for Handoff'])
+                completed_today = stage_counts[database.ONBOARDING_READY_STAGE]
                 in_progress = total_patients - completed_today
                 completion_rate = f"{(completed_today/total_patients)*100:.0f}%" if total_patients > 0 else "0%"
                 
@@ -904,6 +963,7 @@ def show():
                         """, (facility_name, facility_address, facility_phone, facility_email))
                         conn.commit()
                         conn.close()
+                        database.invalidate_tables('facilities')
                         st.success(f"Facility '{facility_name}' added successfully!")
                     except Exception as e:
                         st.error(f"Error adding facility: {e}")
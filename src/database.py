@@ -1,52 +1,625 @@
 import streamlit as st
 import sqlite3
+import pandas as pd
+import threading
+import time
+import random
+import functools
+import os
+import re
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from src.utils.sql_trace import TRACED_METHODS, tracer as sql_tracer
 
 DB_PATH = 'production.db'
 
+# Applied once to every pooled connection when it is opened
+CONNECTION_PRAGMAS = {
+    'busy_timeout': 5000,       # ms to wait on a locked database before failing
+    'cache_size': -20000,       # ~20 MB page cache per connection (negative = KiB)
+    'mmap_size': 268435456,     # 256 MB memory-mapped I/O
+    'synchronous': 'NORMAL',    # safe with WAL; fsync only at checkpoints
+    'wal_autocheckpoint': 1000, # pages; the checkpoint scheduler also runs in the background
+    # Enforcement stays off: several legacy tables declare foreign keys against
+    # non-unique or missing parents (user_patient_assignments -> user_roles.role_id,
+    # insurance_eligibility_records -> prod_tasks_backup), which SQLite reports as
+    # "foreign key mismatch" on any write once enforcement is on.
+    'foreign_keys': 'OFF',
+}
+
+# Idle connections kept per database file; extra connections are closed on release
+POOL_MAX_IDLE = 8
+
+# Background WAL checkpointing
+CHECKPOINT_INTERVAL_SECONDS = 60
+CHECKPOINT_TRUNCATE_PAGES = 10000  # truncate the -wal file once it grows past this
+
+# Retry policy for writes that hit "database is locked"
+WRITE_RETRY_ATTEMPTS = 5
+WRITE_RETRY_BASE_DELAY = 0.05  # seconds, doubled on every attempt
+WRITE_RETRY_MAX_DELAY = 2.0
+
+# Query result cache for slow-changing reference lookups
+QUERY_CACHE_MAX_ENTRIES = 512
+QUERY_CACHE_TTL_SECONDS = 300  # upper bound on staleness for writes made outside this process
+
+
+class PooledConnection:
+    """A connection borrowed from a ConnectionPool.
+
+    Behaves like sqlite3.Connection, except that close() hands the connection
+    back to the pool. Used as a context manager it commits on success, rolls
+    back on error and then returns the connection to the pool.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        if sql_tracer.enabled and name in TRACED_METHODS:
+            return sql_tracer.wrap(name, getattr(conn, name))
+        return getattr(conn, name)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if self._conn is not None:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+    def __del__(self):
+        # Return connections whose borrower never closed them
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of configured SQLite connections for one database file.
+
+    Each connection is borrowed by a single caller at a time, so connections
+    are opened with check_same_thread=False and can move between Streamlit
+    script threads.
+    """
+
+    def __init__(self, db_path, max_idle=POOL_MAX_IDLE):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        for pragma, value in CONNECTION_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+
+    def acquire(self):
+        """Borrow a connection, opening a new one if none are idle"""
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._open()
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        """Return a connection; uncommitted work is rolled back like a real close()"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            conn.close()
+            return
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close_all(self):
+        """Close every idle connection (borrowed ones are closed when released)"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_connection_pool(db_path=None):
+    """Get the shared connection pool for a database file (defaults to DB_PATH)"""
+    db_path = db_path or DB_PATH
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path)
+        return pool
+
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Borrow a pooled connection; close() or leaving a `with` block returns it"""
+    return get_connection_pool().acquire()
+
+
+def is_lock_error(error):
+    """True if an exception is SQLite reporting a locked or busy database"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return 'database is locked' in message or 'database is busy' in message or 'database table is locked' in message
+
+def retry_on_locked(func):
+    """Retry a write with exponential backoff while the database is locked.
+
+    The wrapped function must run its whole transaction, so a retry starts over
+    from a clean connection. The last lock error is re-raised once
+    WRITE_RETRY_ATTEMPTS is exhausted.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        delay = WRITE_RETRY_BASE_DELAY
+        for attempt in range(1, WRITE_RETRY_ATTEMPTS + 1):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not is_lock_error(e) or attempt == WRITE_RETRY_ATTEMPTS:
+                    raise
+                print(f"{func.__name__}: database locked, retrying in {delay:.2f}s (attempt {attempt}/{WRITE_RETRY_ATTEMPTS})")
+                backoff = delay + random.uniform(0, delay)
+                time.sleep(backoff)
+                sql_tracer.record_lock_wait(backoff, f"{func.__module__}:{func.__name__}")
+                delay = min(delay * 2, WRITE_RETRY_MAX_DELAY)
+    return wrapper
+
+
+class CheckpointScheduler(threading.Thread):
+    """Daemon thread that periodically checkpoints the WAL.
+
+    PASSIVE checkpoints never block readers or writers. When the -wal file has
+    grown past CHECKPOINT_TRUNCATE_PAGES and everything in it has been copied
+    back, a TRUNCATE checkpoint resets it to zero bytes.
+    """
+
+    def __init__(self, db_path, interval=CHECKPOINT_INTERVAL_SECONDS):
+        super().__init__(name=f"wal-checkpoint:{db_path}", daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.checkpoint()
+            except sqlite3.Error as e:
+                print(f"WAL checkpoint failed for {self.db_path}: {e}")
+
+    def checkpoint(self):
+        """Run one checkpoint pass; returns (busy, wal_pages, checkpointed_pages)"""
+        with get_connection_pool(self.db_path).acquire() as conn:
+            busy, wal_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+            if not busy and wal_pages >= CHECKPOINT_TRUNCATE_PAGES and checkpointed == wal_pages:
+                busy, wal_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        return busy, wal_pages, checkpointed
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_checkpoint_schedulers = {}
+_initialized_databases = {}
+_init_lock = threading.Lock()
+
+def initialize_database(db_path=None, start_checkpointer=True):
+    """Put the database in WAL mode, apply migrations and start its checkpoint scheduler.
+
+    Safe to call on every Streamlit rerun; only the first call per database
+    file does any work. Returns the journal mode in effect.
+    """
+    db_path = db_path or DB_PATH
+    with _init_lock:
+        if db_path in _initialized_databases:
+            return _initialized_databases[db_path]
+        with get_connection_pool(db_path).acquire() as conn:
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            if journal_mode.lower() != 'wal':
+                # Persistent: stored in the database file, so later connections inherit it
+                journal_mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+            migrate_task_date_iso(conn)
+            apply_migrations(conn)
+        if start_checkpointer and db_path not in _checkpoint_schedulers:
+            scheduler = CheckpointScheduler(db_path)
+            scheduler.start()
+            _checkpoint_schedulers[db_path] = scheduler
+        _initialized_databases[db_path] = journal_mode
+    return journal_mode
+
+
+# Task tables whose free-form task_date (MM/DD/YY from the imports, YYYY-MM-DD
+# from the dashboards) is normalized into an indexable task_date_iso column
+TASK_DATE_TABLES = ('provider_tasks', 'coordinator_tasks')
+
+TASK_DATE_INDEXES = {
+    # Covering indexes for the per-user monthly minute totals on the dashboards
+    'idx_provider_tasks_provider_date_iso': 'provider_tasks(provider_id, task_date_iso, minutes_of_service)',
+    'idx_coordinator_tasks_coordinator_date_iso': 'coordinator_tasks(coordinator_id, task_date_iso, patient_id, duration_minutes)',
+}
+
+def iso_date_sql(column):
+    """SQL expression turning YYYY-MM-DD[...] or M/D/YY[YY] into YYYY-MM-DD (NULL if unparseable)"""
+    month = f"substr({column}, 1, instr({column}, '/') - 1)"
+    rest = f"substr({column}, instr({column}, '/') + 1)"
+    day = f"substr({rest}, 1, instr({rest}, '/') - 1)"
+    year = f"substr({rest}, instr({rest}, '/') + 1)"
+    return f"""(CASE
+        WHEN {column} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*' THEN date(substr({column}, 1, 10))
+        WHEN {column} GLOB '[0-9]*/[0-9]*/[0-9]*' THEN date(printf('%04d-%02d-%02d',
+            CASE WHEN length({year}) <= 2 THEN 2000 + {year} ELSE {year} END, {month}, {day}))
+    END)"""
+
+def migrate_task_date_iso(conn):
+    """Add, backfill and index task_date_iso on the task tables.
+
+    Triggers fill the column on inserts that leave it NULL and on task_date
+    updates, so the SQL import scripts need no changes to keep it current.
+    Writers that already have the ISO date (the bulk task saves, the
+    coordinator_tasks ETL) insert task_date_iso themselves and skip the
+    trigger's second UPDATE per row. Idempotent; the triggers are recreated
+    so older definitions are replaced.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    for table in TASK_DATE_TABLES:
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if not columns:
+            continue
+        added = 'task_date_iso' not in columns
+        if added:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN task_date_iso TEXT")
+        for suffix, event in (('insert', 'INSERT'), ('update', 'UPDATE OF task_date')):
+            when = "WHEN NEW.task_date_iso IS NULL" if suffix == 'insert' else ""
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_task_date_iso_{suffix}")
+            conn.execute(f"""
+                CREATE TRIGGER trg_{table}_task_date_iso_{suffix}
+                AFTER {event} ON {table}
+                {when}
+                BEGIN
+                    UPDATE {table} SET task_date_iso = {iso_date_sql('NEW.task_date')}
+                    WHERE rowid = NEW.rowid;
+                END
+            """)
+        if added:
+            conn.execute(f"UPDATE {table} SET task_date_iso = {iso_date_sql('task_date')}")
+    for name, definition in TASK_DATE_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+    conn.commit()
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql', 'migrations')
+
+def apply_migrations(conn, directory=MIGRATIONS_DIR):
+    """Run sql/migrations/NNN_*.sql files not yet recorded in schema_migrations, in order.
+
+    Each file runs in one transaction with its schema_migrations row, so a
+    failing migration leaves nothing behind and is retried whole next start.
+    Migration files must not contain their own BEGIN/COMMIT.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_date TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+    if not os.path.isdir(directory):
+        return []
+    applied = {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+    migrations = sorted(
+        (int(match.group(1)), name) for name in os.listdir(directory)
+        if (match := re.match(r'(\d+)_.*\.sql$', name))
+    )
+    newly_applied = []
+    for version, name in migrations:
+        if version in applied:
+            continue
+        with open(os.path.join(directory, name), encoding='utf-8') as f:
+            script = f.read()
+        # executescript commits first and runs the file as-is, so open the
+        # transaction in the script itself: the file's statements and its
+        # schema_migrations row commit together or not at all
+        try:
+            conn.executescript("BEGIN IMMEDIATE;\n" + script)
+            conn.execute("INSERT INTO schema_migrations (version, name) VALUES (?, ?)", (version, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        newly_applied.append(name)
+        print(f"Applied migration {name}")
+    return newly_applied
+
+class QueryCache:
+    """Process-wide LRU cache of reader results, invalidated per table.
+
+    Every table has a version counter that writers bump. An entry remembers
+    the versions of the tables it read and counts as a miss once any of them
+    has moved on or its TTL has passed.
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_MAX_ENTRIES, ttl=QUERY_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, expires_at, tables, versions)
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def versions(self, tables):
+        """Current version of each table, taken before running a query"""
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def get(self, key):
+        """Return (True, value) for a fresh entry, otherwise (False, None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, tables, versions = entry
+                current = tuple(self._versions.get(table, 0) for table in tables)
+                if current == versions and time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value, tables, versions, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            current = tuple(self._versions.get(table, 0) for table in tables)
+            if current != versions:
+                return  # a write landed while the query ran; don't cache stale data
+            self._entries[key] = (value, expires_at, tuple(tables), versions)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *tables):
+        """Bump the given tables and drop every entry that read them"""
+        tables = set(tables)
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+            stale = [key for key, entry in self._entries.items() if tables.intersection(entry[2])]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+query_cache = QueryCache()
 
+def _copy_result(value):
+    # Callers are free to mutate the lists/dicts they get back
+    if isinstance(value, list):
+        return [dict(item) if isinstance(item, dict) else item for item in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+def cached_query(*tables, ttl=None):
+    """Cache a reader's result per arguments until one of `tables` is written"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (DB_PATH, func.__name__, args, tuple(sorted(kwargs.items())))
+            try:
+                hit, value = query_cache.get(key)
+            except TypeError:  # unhashable arguments
+                return func(*args, **kwargs)
+            if hit:
+                return _copy_result(value)
+            versions = query_cache.versions(tables)
+            value = func(*args, **kwargs)
+            query_cache.put(key, value, tables, versions, ttl)
+            return _copy_result(value)
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+def invalidates(*tables):
+    """Invalidate cached readers of `tables` after a writer runs"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                query_cache.invalidate(*tables)
+        return wrapper
+    return decorator
+
+def invalidate_tables(*tables):
+    """For code that writes with raw SQL outside database.py"""
+    query_cache.invalidate(*tables)
+
+
+# One idle connection per database file that only ever reads PRAGMA data_version.
+# Its value changes whenever any other connection (pooled, another process or
+# an import script) commits, which the pooled connections can't see in their
+# own counters because they commit themselves.
+_data_version_connections = {}
+_data_version_lock = threading.Lock()
+
+def get_data_version(db_path=None):
+    """Cheap token that moves whenever anything commits to the database"""
+    db_path = db_path or DB_PATH
+    with _data_version_lock:
+        conn = _data_version_connections.get(db_path)
+        if conn is None:
+            conn = _data_version_connections[db_path] = sqlite3.connect(db_path, check_same_thread=False)
+        return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+# Snapshots kept per Streamlit session (different filters, pages and users)
+SESSION_SNAPSHOT_MAX_ENTRIES = 32
+
+class SessionSnapshot:
+    """Per-session copy of dashboard data, refetched only when the data changes.
+
+    Each entry remembers the token it was loaded under: the database's
+    data_version plus this process's change counters for the tables it reads.
+    Widget interactions that leave both untouched are served from memory.
+    """
+
+    def __init__(self, max_entries=SESSION_SNAPSHOT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (token, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, loader, tables, *key_parts):
+        """loader() result for (name, *key_parts), reusing the snapshot while its token holds"""
+        key = (DB_PATH, name) + key_parts
+        # Taken before loading, so a write that lands mid-load forces a refetch next time
+        token = (get_data_version(), query_cache.versions(tables))
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == token:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        value = loader()
+        self._entries[key] = (token, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+def get_session_snapshot():
+    """The current Streamlit session's SessionSnapshot"""
+    if '_data_snapshot' not in st.session_state:
+        st.session_state['_data_snapshot'] = SessionSnapshot()
+    return st.session_state['_data_snapshot']
+
+# Tables behind get_patient_list_page / get_patient_options
+PATIENT_PANEL_TABLES = ('patients', 'user_patient_assignments', 'patient_region_mapping', 'regions', 'provider_county_coverage')
+
+@cached_query('users')
 def get_all_users():
-    conn = get_db_connection()
-    users = conn.execute('SELECT user_id, username, full_name, first_name, last_name, email, status, hire_date FROM users ORDER BY hire_date DESC').fetchall()
-    conn.close()
+    with get_db_connection() as conn:
+        users = conn.execute('SELECT user_id, username, full_name, first_name, last_name, email, status, hire_date FROM users ORDER BY hire_date DESC').fetchall()
     return users
 
+@cached_query('roles')
 def get_all_roles():
-    conn = get_db_connection()
-    roles = conn.execute('SELECT role_id, role_name FROM roles').fetchall()
-    conn.close()
+    with get_db_connection() as conn:
+        roles = conn.execute('SELECT role_id, role_name FROM roles').fetchall()
     return roles
 
+@cached_query('roles', 'user_roles')
 def get_user_roles_by_user_id(user_id):
-    conn = get_db_connection()
-    user_roles = conn.execute('SELECT r.role_name, r.role_id, ur.is_primary FROM roles r JOIN user_roles ur ON r.role_id = ur.role_id WHERE ur.user_id = ?', (user_id,)).fetchall()
-    conn.close()
+    with get_db_connection() as conn:
+        user_roles = conn.execute('SELECT r.role_name, r.role_id, ur.is_primary FROM roles r JOIN user_roles ur ON r.role_id = ur.role_id WHERE ur.user_id = ?', (user_id,)).fetchall()
     return user_roles
 
+@cached_query('roles', 'user_roles')
 def get_user_role_ids(user_id):
     """Get all role IDs for a specific user"""
-    conn = get_db_connection()
-    role_ids = conn.execute('SELECT r.role_id FROM roles r JOIN user_roles ur ON r.role_id = ur.role_id WHERE ur.user_id = ?', (user_id,)).fetchall()
-    conn.close()
+    with get_db_connection() as conn:
+        role_ids = conn.execute('SELECT r.role_id FROM roles r JOIN user_roles ur ON r.role_id = ur.role_id WHERE ur.user_id = ?', (user_id,)).fetchall()
     return [row['role_id'] for row in role_ids]
 
+def get_user_role_matrix():
+    """All users with a role_<name> boolean column per role, from a single query"""
+    with get_db_connection() as conn:
+        rows = conn.execute("""
+            SELECT u.user_id, u.full_name, u.email, u.status, r.role_name
+            FROM users u
+            LEFT JOIN user_roles ur ON u.user_id = ur.user_id
+            LEFT JOIN roles r ON ur.role_id = r.role_id
+            ORDER BY u.hire_date DESC, u.user_id
+        """).fetchall()
+        role_names = [row['role_name'] for row in conn.execute('SELECT role_name FROM roles ORDER BY role_id')]
+
+    df = pd.DataFrame([tuple(row) for row in rows], columns=['user_id', 'full_name', 'email', 'status', 'role_name'])
+    users = df.drop_duplicates('user_id')[['user_id', 'full_name', 'email', 'status']].reset_index(drop=True)
+    assigned = df.dropna(subset=['role_name'])
+    matrix = (pd.crosstab(assigned['user_id'], assigned['role_name']) > 0)
+    matrix = matrix.reindex(index=users['user_id'], columns=role_names, fill_value=False).astype(bool)
+    matrix.columns = [f'role_{name}' for name in matrix.columns]
+    return pd.concat([users, matrix.reset_index(drop=True)], axis=1)
+
+# users columns the admin user editor may change
+EDITABLE_USER_COLUMNS = ('full_name', 'email', 'status')
+
+@invalidates('users', 'user_roles')
+@retry_on_locked
+def save_user_matrix_changes(changes, role_id_map):
+    """Apply user editor changes in one transaction.
+
+    changes is a list of (user_id, column, new_value); role_<name> columns add
+    or remove that role, other columns must be in EDITABLE_USER_COLUMNS.
+    """
+    role_adds, role_removes, field_updates = [], [], {}
+    for user_id, column, value in changes:
+        if column.startswith('role_'):
+            role_id = role_id_map[column[len('role_'):]]
+            (role_adds if value else role_removes).append((user_id, role_id))
+        elif column in EDITABLE_USER_COLUMNS:
+            field_updates.setdefault(column, []).append((value, user_id))
+        else:
+            raise ValueError(f"Column {column!r} cannot be edited")
+
+    with get_db_connection() as conn:
+        if role_adds:
+            conn.executemany("INSERT OR IGNORE INTO user_roles (user_id, role_id) VALUES (?, ?)", role_adds)
+        if role_removes:
+            conn.executemany("DELETE FROM user_roles WHERE user_id = ? AND role_id = ?", role_removes)
+        for column, params in field_updates.items():
+            conn.executemany(f"UPDATE users SET {column} = ? WHERE user_id = ?", params)
+
 def get_onboarding_queue_stats():
     """Get onboarding queue statistics"""
-    conn = get_db_connection()
-    try:
-        # Get stats from onboarding_patients table
+    with get_db_connection() as conn:
+        # Stage counts of Active onboarding patients, maintained by triggers (migration 004)
         onboarding_stats = conn.execute("""
             SELECT 
-                COUNT(*) as total_onboarding,
-                SUM(CASE WHEN patient_id IS NULL THEN 1 ELSE 0 END) as pending_provider_assignment,
-                SUM(CASE WHEN stage1_complete = 0 THEN 1 ELSE 0 END) as pending_initial_contact,
-                SUM(CASE WHEN stage2_complete = 0 AND stage1_complete = 1 THEN 1 ELSE 0 END) as pending_tv_visit,
-                SUM(CASE WHEN stage3_complete = 0 AND stage2_complete = 1 THEN 1 ELSE 0 END) as pending_documentation,
-                SUM(CASE WHEN assigned_pot_user_id IS NULL THEN 1 ELSE 0 END) as unassigned_pot
-            FROM onboarding_patients 
+                SUM(patient_count) as total_onboarding,
+                SUM(CASE WHEN has_patient = 0 THEN patient_count ELSE 0 END) as pending_provider_assignment,
+                SUM(CASE WHEN current_stage = 1 THEN patient_count ELSE 0 END) as pending_initial_contact,
+                SUM(CASE WHEN current_stage = 2 THEN patient_count ELSE 0 END) as pending_tv_visit,
+                SUM(CASE WHEN current_stage = 3 THEN patient_count ELSE 0 END) as pending_documentation,
+                SUM(CASE WHEN has_pot = 0 THEN patient_count ELSE 0 END) as unassigned_pot
+            FROM onboarding_stage_counts 
             WHERE patient_status = 'Active'
         """).fetchone()
         
@@ -69,13 +642,10 @@ def get_onboarding_queue_stats():
             'unassigned_active_patients': patient_stats['unassigned_active_patients'] or 0,
             'new_patients_30_days': patient_stats['new_patients_30_days'] or 0
         }
-    finally:
-        conn.close()
 
 def get_onboarding_tasks_by_role(role_id, user_id=None):
     """Get onboarding tasks for a specific role or user"""
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         if role_id == 36:  # Care Coordinator
             query = """
                 SELECT 
@@ -112,171 +682,117 @@ def get_onboarding_tasks_by_role(role_id, user_id=None):
             tasks = []
         
         return [dict(task) for task in tasks]
-    finally:
-        conn.close()
-
-def get_onboarding_patient_details(onboarding_id):
-    """Get detailed onboarding patient information for stepper display"""
-    conn = get_db_connection()
-    try:
-        patient = conn.execute("""
-            SELECT * FROM onboarding_patients 
-            WHERE onboarding_id = ?
-        """, (onboarding_id,)).fetchone()
-        
-        if patient:
-            return dict(patient)
-        return None
-    finally:
-        conn.close()
-
-def get_onboarding_queue():
-    """Get the current onboarding queue with patient status"""
-    conn = get_db_connection()
-    try:
-        queue = conn.execute("""
-            SELECT 
-                op.onboarding_id,
-                op.first_name || ' ' || op.last_name as patient_name,
-                op.stage1_complete,
-                op.stage2_complete,
-                op.stage3_complete,
-                op.stage4_complete,
-                op.stage5_complete,
-                op.created_date,
-                op.updated_date,
-                CASE 
-                    WHEN NOT op.stage1_complete THEN 'Patient Registration'
-                    WHEN NOT op.stage2_complete THEN 'Eligibility Verification'
-                    WHEN NOT op.stage3_complete THEN 'Chart Creation'
-                    WHEN NOT op.stage4_complete THEN 'Intake Processing'
-                    WHEN NOT op.stage5_complete THEN 'TV Visit Scheduling'
-                    ELSE 'Workflow Complete'
-                END as current_stage,
-                CASE 
-                    WHEN op.created_date > datetime('now', '-1 day') THEN 'High'
-                    WHEN op.created_date > datetime('now', '-3 days') THEN 'Medium'
-                    ELSE 'Normal'
-                END as priority_status,
-                COALESCE(u.full_name, 'Unassigned') as assigned_pot_name
-            FROM onboarding_patients op
-            LEFT JOIN users u ON op.assigned_pot_user_id = u.user_id
-            WHERE op.patient_status = 'Active'
-            ORDER BY op.created_date ASC
-        """).fetchall()
-        
-        return [dict(row) for row in queue]
-    finally:
-        conn.close()
 
+@invalidates('user_roles')
+@retry_on_locked
 def add_user_role(user_id, role_id):
-    conn = get_db_connection()
-    try:
-        conn.execute("INSERT INTO user_roles (user_id, role_id) VALUES (?, ?)", (user_id, role_id))
-        conn.commit()
-    except sqlite3.IntegrityError:
-        # User already has this role
-        pass
-    finally:
-        conn.close()
+    with get_db_connection() as conn:
+        try:
+            conn.execute("INSERT INTO user_roles (user_id, role_id) VALUES (?, ?)", (user_id, role_id))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            # User already has this role
+            pass
 
+@invalidates('user_roles')
+@retry_on_locked
 def remove_user_role(user_id, role_id):
-    conn = get_db_connection()
-    conn.execute("DELETE FROM user_roles WHERE user_id = ? AND role_id = ?", (user_id, role_id))
-    conn.commit()
-    conn.close()
+    with get_db_connection() as conn:
+        conn.execute("DELETE FROM user_roles WHERE user_id = ? AND role_id = ?", (user_id, role_id))
+        conn.commit()
 
+@invalidates('user_roles')
+@retry_on_locked
 def set_primary_role(user_id, role_id):
-    conn = get_db_connection()
-    # First, set all roles for the user to not be primary
-    conn.execute("UPDATE user_roles SET is_primary = 0 WHERE user_id = ?", (user_id,))
-    # Then, set the specified role to be primary
-    conn.execute("UPDATE user_roles SET is_primary = 1 WHERE user_id = ? AND role_id = ?", (user_id, role_id))
-    conn.commit()
-    conn.close()
+    with get_db_connection() as conn:
+        # First, set all roles for the user to not be primary
+        conn.execute("UPDATE user_roles SET is_primary = 0 WHERE user_id = ?", (user_id,))
+        # Then, set the specified role to be primary
+        conn.execute("UPDATE user_roles SET is_primary = 1 WHERE user_id = ? AND role_id = ?", (user_id, role_id))
+        conn.commit()
 
+@cached_query('roles')
 def get_user_roles():
-    conn = get_db_connection()
-    roles = conn.execute('SELECT * FROM roles').fetchall()
-    conn.close()
+    with get_db_connection() as conn:
+        roles = conn.execute('SELECT * FROM roles').fetchall()
     return roles
 
+@cached_query('users')
 def get_users():
-    conn = get_db_connection()
-    users = conn.execute('SELECT * FROM users').fetchall()
-    conn.close()
+    with get_db_connection() as conn:
+        users = conn.execute('SELECT * FROM users').fetchall()
     return users
 
+@cached_query('users')
 def get_user_by_id(user_id):
-    conn = get_db_connection()
-    user = conn.execute('SELECT * FROM users WHERE user_id = ?', (user_id,)).fetchone()
-    conn.close()
+    with get_db_connection() as conn:
+        user = conn.execute('SELECT * FROM users WHERE user_id = ?', (user_id,)).fetchone()
     return user
 
+@cached_query('users', 'user_roles', 'roles')
 def get_users_by_role(role_id):
-    conn = get_db_connection()
-    users = conn.execute("""
-        SELECT u.*, r.role_name FROM users u
-        JOIN user_roles ur ON u.user_id = ur.user_id
-        JOIN roles r ON ur.role_id = r.role_id
-        WHERE r.role_id = ?
-    """, (role_id,)).fetchall()
-    conn.close()
+    with get_db_connection() as conn:
+        users = conn.execute("""
+            SELECT u.*, r.role_name FROM users u
+            JOIN user_roles ur ON u.user_id = ur.user_id
+            JOIN roles r ON ur.role_id = r.role_id
+            WHERE r.role_id = ?
+        """, (role_id,)).fetchall()
     return users
 
 def get_tasks_by_user(user_id):
-    conn = get_db_connection()
-    tasks = conn.execute('SELECT * FROM tasks WHERE user_id = ?', (user_id,)).fetchall()
-    conn.close()
+    with get_db_connection() as conn:
+        tasks = conn.execute('SELECT * FROM tasks WHERE user_id = ?', (user_id,)).fetchall()
     return tasks
 
+@invalidates('users', 'user_roles')
+@retry_on_locked
 def add_user(username, password, first_name, last_name, email, role_name):
-    conn = get_db_connection()
-    try:
-        role = conn.execute('SELECT role_id FROM roles WHERE role_name = ?', (role_name,)).fetchone()
-        if role:
-            role_id = role['role_id']
-            cursor = conn.execute("INSERT INTO users (username, password, first_name, last_name, email, status, hire_date) VALUES (?, ?, ?, ?, ?, 'active', CURRENT_DATE)",
-                                  (username, password, first_name, last_name, email))
-            user_id = cursor.lastrowid
-            conn.execute("INSERT INTO user_roles (user_id, role_id) VALUES (?, ?)",
-                         (user_id, role_id))
-            conn.commit()
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-    finally:
-        conn.close()
+    with get_db_connection() as conn:
+        try:
+            role = conn.execute('SELECT role_id FROM roles WHERE role_name = ?', (role_name,)).fetchone()
+            if role:
+                role_id = role['role_id']
+                cursor = conn.execute("INSERT INTO users (username, password, first_name, last_name, email, status, hire_date) VALUES (?, ?, ?, ?, ?, 'active', CURRENT_DATE)",
+                                      (username, password, first_name, last_name, email))
+                user_id = cursor.lastrowid
+                conn.execute("INSERT INTO user_roles (user_id, role_id) VALUES (?, ?)",
+                             (user_id, role_id))
+                conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            if is_lock_error(e):
+                raise
+            print(f"Database error: {e}")
 
 def get_user_patient_assignments(user_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT
-            upa.patient_id,
-            p.first_name || ' ' || p.last_name AS patient_name,
-            upa.role_id,
-            upa.user_id,
-            p.address_street,
-            p.address_city,
-            p.address_state,
-            p.address_zip,
-            p.phone_primary,
-            p.email,
-            p.status AS patient_status
-        FROM
-            user_patient_assignments upa
-        JOIN
-            patients p ON upa.patient_id = p.patient_id
-        WHERE
-            upa.user_id = ?;
-    """, (user_id,))
-    assignments = cursor.fetchall()
-    conn.close()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT
+                upa.patient_id,
+                p.first_name || ' ' || p.last_name AS patient_name,
+                upa.role_id,
+                upa.user_id,
+                p.address_street,
+                p.address_city,
+                p.address_state,
+                p.address_zip,
+                p.phone_primary,
+                p.email,
+                p.status AS patient_status
+            FROM
+                user_patient_assignments upa
+            JOIN
+                patients p ON upa.patient_id = p.patient_id
+            WHERE
+                upa.user_id = ?;
+        """, (user_id,))
+        assignments = cursor.fetchall()
     return assignments
 
 def get_coordinator_performance_metrics(user_id):
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         query = """
             SELECT
                 u.full_name,
@@ -292,29 +808,26 @@ def get_coordinator_performance_metrics(user_id):
         """
         metrics = conn.execute(query, (user_id,)).fetchall()
         return [dict(row) for row in metrics]
-    finally:
-        conn.close()
 
 def get_care_plan(patient_name):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT plan_details FROM care_plans WHERE patient_name = ?", (patient_name,))
-    result = cursor.fetchone()
-    conn.close()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT plan_details FROM care_plans WHERE patient_name = ?", (patient_name,))
+        result = cursor.fetchone()
     return result[0] if result else ""
 
+@invalidates('care_plans')
+@retry_on_locked
 def update_care_plan(patient_name, plan_details, updated_by):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("INSERT OR REPLACE INTO care_plans (patient_name, plan_details, updated_by, last_updated) VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
-                   (patient_name, plan_details, updated_by))
-    conn.commit()
-    conn.close()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR REPLACE INTO care_plans (patient_name, plan_details, updated_by, last_updated) VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+                       (patient_name, plan_details, updated_by))
+        conn.commit()
 
 
 def get_provider_performance_metrics():
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         # Updated to work with existing tables - using provider_tasks instead of patient_visits
         query = """
             SELECT
@@ -331,21 +844,17 @@ def get_provider_performance_metrics():
         """
         metrics = conn.execute(query).fetchall()
         return [dict(row) for row in metrics]
-    finally:
-        conn.close()
 
+@cached_query('task_billing_codes')
 def get_tasks_billing_codes():
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         codes = conn.execute("SELECT code, description FROM task_billing_codes").fetchall()
         return [dict(row) for row in codes]
-    finally:
-        conn.close()
 
+@cached_query('task_billing_codes')
 def get_tasks_billing_codes_by_service_type(service_type):
     """Get task billing codes filtered by service type"""
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         codes = conn.execute("""
             SELECT code_id, task_description, billing_code, description 
             FROM task_billing_codes 
@@ -353,41 +862,297 @@ def get_tasks_billing_codes_by_service_type(service_type):
             ORDER BY task_description
         """, (service_type,)).fetchall()
         return [dict(row) for row in codes]
-    finally:
-        conn.close()
 
+@cached_query('facilities')
+def get_facility_names():
+    """Get all facility names for pick lists"""
+    with get_db_connection() as conn:
+        facilities = conn.execute("SELECT facility_name FROM facilities ORDER BY facility_name").fetchall()
+        return [row['facility_name'] for row in facilities]
+
+@cached_query('coordinator_task_definitions')
 def get_daily_tasks_for_coordinator():
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         # Get all task descriptions for coordinator tasks from coordinator_task_definitions table
         tasks = conn.execute("SELECT task_description FROM coordinator_task_definitions WHERE task_description IS NOT NULL GROUP BY task_description").fetchall()
         return [dict(row) for row in tasks]
-    finally:
-        conn.close()
 
 
 def get_provider_id_from_user_id(user_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT provider_id FROM providers WHERE user_id = ?", (user_id,))
-    result = cursor.fetchone()
-    conn.close()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT provider_id FROM providers WHERE user_id = ?", (user_id,))
+        result = cursor.fetchone()
     if result:
         return result[0]
     return None
 
 def get_patient_details_by_id(patient_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM patients WHERE patient_id = ?", (patient_id,))
-    result = cursor.fetchone()
-    conn.close()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM patients WHERE patient_id = ?", (patient_id,))
+        result = cursor.fetchone()
     return result
 
+# Sort orders accepted by get_patient_list_page; patient_id keeps pages stable
+PATIENT_LIST_ORDERS = {
+    'name': ('last_name', 'first_name', 'patient_id'),
+    'status': ('status', 'last_name', 'first_name', 'patient_id'),
+    'zip': ('address_zip', 'last_name', 'first_name', 'patient_id'),
+}
+PATIENT_LIST_COLUMNS = (
+    'patient_id', 'first_name', 'last_name', 'status', 'address_street', 'address_city',
+    'address_state', 'address_zip', 'phone_primary', 'email', 'zip_code', 'city', 'state',
+    'region_county', 'region_state', 'outside_provider_region',
+)
+PATIENT_SEARCH_COLUMNS = ('first_name', 'last_name', 'phone_primary', 'email', 'address_city')
+
+def _patient_list_filters(statuses, active_only, county, zip_code, search):
+    """WHERE clause and params for the filtered patient panel"""
+    clauses, params = [], []
+    if statuses:
+        clauses.append(f"TRIM(status) IN ({', '.join('?' * len(statuses))})")
+        params.extend(statuses)
+    elif active_only:
+        clauses.append("LOWER(TRIM(status)) LIKE 'active%'")
+    if county:
+        clauses.append("region_county = ?")
+        params.append(county)
+    if zip_code:
+        clauses.append("address_zip = ?")
+        params.append(zip_code)
+    if search:
+        pattern = f"%{search.strip()}%"
+        clauses.append("(" + " OR ".join(f"{column} LIKE ?" for column in PATIENT_SEARCH_COLUMNS)
+                       + " OR first_name || ' ' || last_name LIKE ?)")
+        params.extend([pattern] * (len(PATIENT_SEARCH_COLUMNS) + 1))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def get_patient_list_page(user_id, provider_id=None, statuses=None, active_only=True, county=None,
+                          zip_code=None, search=None, order_by='name', limit=50, offset=0, after=None):
+    """One page of a user's assigned patients with the total and facet counts.
+
+    Filtering, sorting and paging all run in SQLite in a single statement.
+    statuses overrides active_only; after is the sort key of the last row of
+    the previous page (keyset paging) and takes precedence over offset.
+    Facets count the whole panel so filter dropdowns stay stable.
+    Returns {'rows', 'total', 'facets': {'status', 'county', 'zip'}}.
+    """
+    if order_by not in PATIENT_LIST_ORDERS:
+        raise ValueError(f"Unknown patient list order {order_by!r}")
+    order_columns = PATIENT_LIST_ORDERS[order_by]
+    where, filter_params = _patient_list_filters(statuses, active_only, county, zip_code, search)
+
+    page_where, page_params = where, list(filter_params)
+    if after is not None:
+        if len(after) != len(order_columns):
+            raise ValueError(f"after must have {len(order_columns)} values for order {order_by!r}")
+        keyset = f"({', '.join(order_columns)}) > ({', '.join('?' * len(order_columns))})"
+        page_where = f"{where} AND {keyset}" if where else f" WHERE {keyset}"
+        page_params.extend(after)
+        offset = 0
+
+    # Outside-region flags come from one join against the materialized
+    # provider_county_coverage table (sql/migrations/002)
+    if provider_id is None:
+        outside_region = "0"
+        coverage_join = ""
+        base_params = [user_id]
+    else:
+        outside_region = "CASE WHEN pcc.provider_id IS NULL THEN 1 ELSE 0 END"
+        coverage_join = "LEFT JOIN provider_county_coverage pcc ON pcc.provider_id = ? AND pcc.county = r.county"
+        base_params = [provider_id, user_id]
+
+    row_json = ", ".join(f"'{column}', {column}" for column in PATIENT_LIST_COLUMNS)
+    order_sql = ", ".join(order_columns)
+    sql = f"""
+        WITH panel AS (
+            SELECT DISTINCT
+                p.patient_id,
+                COALESCE(p.first_name, '') AS first_name,
+                COALESCE(p.last_name, '') AS last_name,
+                COALESCE(p.status, '') AS status,
+                p.address_street, p.address_city, p.address_state,
+                COALESCE(p.address_zip, '') AS address_zip,
+                p.phone_primary, p.email,
+                prm.zip_code, prm.city, prm.state,
+                r.county AS region_county, r.state AS region_state,
+                {outside_region} AS outside_provider_region
+            FROM user_patient_assignments upa
+            JOIN patients p ON upa.patient_id = p.patient_id
+            LEFT JOIN patient_region_mapping prm ON p.patient_id = prm.patient_id
+            LEFT JOIN regions r ON prm.region_id = r.region_id
+            {coverage_join}
+            WHERE upa.user_id = ?
+        ),
+        page AS (
+            SELECT * FROM panel{page_where}
+            ORDER BY {order_sql}
+            LIMIT ? OFFSET ?
+        )
+        SELECT
+            (SELECT json_group_array(json_object({row_json})) FROM (SELECT * FROM page ORDER BY {order_sql})) AS rows_json,
+            (SELECT COUNT(*) FROM panel{where}) AS total,
+            (SELECT json_group_array(json_array(status, n)) FROM (
+                SELECT status, COUNT(DISTINCT patient_id) AS n FROM panel
+                WHERE status IS NOT NULL AND status != '' GROUP BY status ORDER BY status)) AS status_facets,
+            (SELECT json_group_array(json_array(region_county, region_state, n)) FROM (
+                SELECT region_county, region_state, COUNT(DISTINCT patient_id) AS n FROM panel
+                WHERE region_county IS NOT NULL AND region_county != ''
+                GROUP BY region_county, region_state ORDER BY region_county)) AS county_facets,
+            (SELECT json_group_array(json_array(address_zip, address_city, address_state, n)) FROM (
+                SELECT address_zip, address_city, address_state, COUNT(DISTINCT patient_id) AS n FROM panel
+                WHERE address_zip IS NOT NULL AND address_zip != ''
+                GROUP BY address_zip, address_city, address_state ORDER BY address_zip)) AS zip_facets
+    """
+    params = base_params + page_params + [limit, offset] + filter_params
+
+    with get_db_connection() as conn:
+        result = conn.execute(sql, params).fetchone()
+
+    return {
+        'rows': json.loads(result['rows_json']),
+        'total': result['total'],
+        'facets': {
+            'status': [tuple(facet) for facet in json.loads(result['status_facets'])],
+            'county': [tuple(facet) for facet in json.loads(result['county_facets'])],
+            'zip': [tuple(facet) for facet in json.loads(result['zip_facets'])],
+        },
+    }
+
+def get_patient_options(user_id, statuses=None, active_only=True):
+    """patient_id/first_name/last_name of every matching assigned patient, for pickers"""
+    where, params = _patient_list_filters(statuses, active_only, None, None, None)
+    with get_db_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT patient_id, first_name, last_name FROM (
+                SELECT DISTINCT p.patient_id,
+                    COALESCE(p.first_name, '') AS first_name,
+                    COALESCE(p.last_name, '') AS last_name,
+                    COALESCE(p.status, '') AS status
+                FROM user_patient_assignments upa
+                JOIN patients p ON upa.patient_id = p.patient_id
+                WHERE upa.user_id = ?
+            ){where}
+            ORDER BY last_name, first_name, patient_id
+        """, [user_id] + params).fetchall()
+    return [dict(row) for row in rows]
+
+def patient_list_sort_key(row, order_by='name'):
+    """Keyset cursor for get_patient_list_page(after=...) from a returned row"""
+    return tuple(row[column] for column in PATIENT_LIST_ORDERS[order_by])
+
+# Full-text patient search over patient_fts (sql/migrations/005). Rowids are
+# patients.rowid * 2 for patients and onboarding_id * 2 + 1 for onboarding patients.
+PATIENT_SEARCH_LIMIT = 20
+PATIENT_SEARCH_RESULT_COLUMNS = (
+    'patient_id', 'first_name', 'last_name', 'date_of_birth', 'gender', 'phone_primary', 'email',
+    'address_city', 'address_state', 'medical_record_number', 'status',
+)
+# Query words at least this long also match indexed terms one edit away;
+# words of the second length tolerate two edits
+PATIENT_SEARCH_TYPO_MIN_LENGTH = 4
+PATIENT_SEARCH_TWO_TYPO_MIN_LENGTH = 8
+# Closest indexed terms a misspelt word is expanded to
+PATIENT_SEARCH_MAX_SIMILAR_TERMS = 10
+
+def _patient_search_words(query):
+    """Lowercased words of a search query, in the patient_fts tokenizer's terms"""
+    return re.findall(r'\w+', (query or '').lower())
+
+def _edit_distance(a, b, max_distance):
+    """Levenshtein distance counting a swap of neighbours as one edit; stops past max_distance"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+def _similar_terms(conn, word):
+    """Closest indexed terms one or two edits from word, sharing its first letter"""
+    # Numbers, MRNs and email names are looked up exactly; a near miss there is another patient
+    if len(word) < PATIENT_SEARCH_TYPO_MIN_LENGTH or any(char.isdigit() for char in word):
+        return []
+    max_distance = 2 if len(word) >= PATIENT_SEARCH_TWO_TYPO_MIN_LENGTH else 1
+    # fts5vocab answers a term range without reading the whole vocabulary
+    terms = conn.execute("""
+        SELECT term FROM patient_fts_vocab
+        WHERE term >= ? AND term < ? AND length(term) BETWEEN ? AND ?
+    """, (word[0], chr(ord(word[0]) + 1), len(word) - max_distance, len(word) + max_distance)).fetchall()
+    distances = sorted(
+        (distance, term) for (term,) in terms
+        if term != word and (distance := _edit_distance(word, term, max_distance)) <= max_distance
+    )
+    return [term for _, term in distances[:PATIENT_SEARCH_MAX_SIMILAR_TERMS]]
+
+def _patient_search_match(conn, query, typos=False):
+    """FTS5 MATCH expression for a search box query, or None if it has no words.
+
+    Every word must match as a prefix of some indexed term; with typos=True a
+    word may instead match a term a typo or two away.
+    """
+    words = _patient_search_words(query)
+    if not words:
+        return None
+    clauses = []
+    for word in words:
+        alternatives = [f'"{word}"*']
+        if typos:
+            alternatives += [f'"{term}"' for term in _similar_terms(conn, word)]
+        clauses.append(alternatives[0] if len(alternatives) == 1 else f"({' OR '.join(alternatives)})")
+    return ' AND '.join(clauses)
+
+@cached_query('patients', 'user_patient_assignments', 'onboarding_patients')
+def search_patients(query, scope_user_id=None, limit=PATIENT_SEARCH_LIMIT):
+    """Patients matching a search box query on name, phone, email, address, MRN or insurance number.
+
+    Words match as prefixes ("jo smi" finds John Smith), best bm25 rank first;
+    if that finds fewer than limit patients the rest are filled with matches
+    that allow a typo per word (two for long words). scope_user_id limits the
+    search to the patients assigned to that user. Returns dicts of
+    PATIENT_SEARCH_RESULT_COLUMNS.
+    """
+    columns = ', '.join(f"p.{column}" for column in PATIENT_SEARCH_RESULT_COLUMNS)
+    scope = ""
+    scope_params = []
+    if scope_user_id is not None:
+        scope = "AND p.patient_id IN (SELECT patient_id FROM user_patient_assignments WHERE user_id = ?)"
+        scope_params.append(scope_user_id)
+
+    results = []
+    found = []
+    with get_db_connection() as conn:
+        for typos in (False, True):
+            match = _patient_search_match(conn, query, typos=typos)
+            if match is None or len(results) >= limit:
+                break
+            rows = conn.execute(f"""
+                SELECT {columns}, patient_fts.rowid AS fts_rowid
+                FROM patient_fts
+                JOIN patients p ON p.rowid = patient_fts.rowid / 2
+                WHERE patient_fts MATCH ? AND patient_fts.rowid % 2 = 0
+                  {scope}
+                  AND patient_fts.rowid NOT IN ({', '.join('?' * len(found))})
+                ORDER BY patient_fts.rank
+                LIMIT ?
+            """, [match, *scope_params, *found, limit - len(results)]).fetchall()
+            for row in rows:
+                patient = dict(row)
+                found.append(patient.pop('fts_rowid'))
+                results.append(patient)
+    return results
+
 def get_provider_counties(provider_id):
     """Get counties for a provider using the new dashboard mapping table"""
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         cursor = conn.execute("""
             SELECT DISTINCT 
                 dpc.county, 
@@ -399,13 +1164,10 @@ def get_provider_counties(provider_id):
         """, (provider_id,))
         counties = cursor.fetchall()
         return [(c[0], f"{c[0]}, {c[1]} [{c[2]}]") for c in counties]
-    finally:
-        conn.close()
 
 def get_provider_zip_codes(provider_id):
     """Get zip codes for a provider using the new dashboard mapping table"""
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         cursor = conn.execute("""
             SELECT DISTINCT 
                 dpz.zip_code, 
@@ -418,13 +1180,10 @@ def get_provider_zip_codes(provider_id):
         """, (provider_id,))
         zip_codes = cursor.fetchall()
         return [(z[0], f"{z[0]} - {z[1]}, {z[2]} [{z[3]}]") for z in zip_codes]
-    finally:
-        conn.close()
 
 def get_patient_counties(patient_id):
     """Get counties for a patient using the new dashboard mapping table"""
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         cursor = conn.execute("""
             SELECT DISTINCT 
                 dpc.county, 
@@ -435,13 +1194,10 @@ def get_patient_counties(patient_id):
         """, (patient_id,))
         counties = cursor.fetchall()
         return [(c[0], f"{c[0]}, {c[1]}") for c in counties]
-    finally:
-        conn.close()
 
 def get_patient_zip_codes(patient_id):
     """Get zip codes for a patient using the new dashboard mapping table"""
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         cursor = conn.execute("""
             SELECT DISTINCT 
                 dpz.zip_code, 
@@ -453,67 +1209,361 @@ def get_patient_zip_codes(patient_id):
         """, (patient_id,))
         zip_codes = cursor.fetchall()
         return [(z[0], f"{z[0]} - {z[1]}, {z[2]}") for z in zip_codes]
-    finally:
-        conn.close()
+
+# Largest IN (...) list sent in one statement when looking up the rows of a task batch
+TASK_LOOKUP_CHUNK_SIZE = 500
+
+# Monthly summaries rebuilt for the months a bulk task save touches, per
+# (provider or coordinator, month). Each statement takes owner_id, month_start,
+# next_month_start, month and year and recomputes its group with the same
+# aggregates as DashboardSummaryUtils and src/sql/populate_provider_monthly_summary.sql,
+# so a later incremental refresh of the same group changes nothing.
+PROVIDER_MONTHLY_SUMMARIES = {
+    'dashboard_provider_monthly_summary': (
+        "DELETE FROM dashboard_provider_monthly_summary WHERE provider_id = :owner_id AND month = :month AND year = :year",
+        """
+        INSERT INTO dashboard_provider_monthly_summary
+            (provider_id, month, year, total_tasks_completed, total_time_spent_minutes,
+             average_task_completion_time_minutes, total_patients_served, patients_assigned)
+        SELECT :owner_id, :month, :year, COUNT(*), SUM(pt.minutes_of_service), AVG(pt.minutes_of_service),
+            COUNT(DISTINCT pt.patient_id), COUNT(DISTINCT pt.patient_id)
+        FROM provider_tasks pt
+        WHERE pt.provider_id = :owner_id AND pt.task_date_iso >= :month_start AND pt.task_date_iso < :next_month_start
+        """,
+    ),
+    'provider_monthly_summary': (
+        "DELETE FROM provider_monthly_summary WHERE provider_id = :owner_id AND month = :month AND year = :year",
+        """
+        INSERT INTO provider_monthly_summary
+            (provider_id, provider_name, month, year, total_tasks_completed, total_time_spent_minutes)
+        SELECT :owner_id, COALESCE(MAX(pt.provider_name), ''), :month, :year, COUNT(*), SUM(pt.minutes_of_service)
+        FROM provider_tasks pt
+        WHERE pt.provider_id = :owner_id AND pt.task_date_iso >= :month_start AND pt.task_date_iso < :next_month_start
+        """,
+    ),
+}
+
+COORDINATOR_MONTHLY_SUMMARIES = {
+    'dashboard_coordinator_monthly_summary': (
+        "DELETE FROM dashboard_coordinator_monthly_summary WHERE coordinator_id = :owner_id AND month = :month AND year = :year",
+        """
+        INSERT INTO dashboard_coordinator_monthly_summary
+            (coordinator_id, month, year, total_minutes, total_minutes_per_patient, total_tasks_completed, average_daily_tasks)
+        SELECT :owner_id, :month, :year, SUM(ct.duration_minutes),
+            SUM(ct.duration_minutes) * 1.0 / COUNT(DISTINCT ct.patient_id), COUNT(*), COUNT(*) * 1.0 / 30.0
+        FROM coordinator_tasks ct
+        WHERE ct.coordinator_id = :owner_id AND ct.task_date_iso >= :month_start AND ct.task_date_iso < :next_month_start
+            AND ct.duration_minutes > 0
+        HAVING COUNT(*) > 0
+        """,
+    ),
+}
+
+# coordinator_monthly_summary is per (coordinator, patient, month) and carries
+# the billing code for the month's total: of the ranges containing it, the one
+# with the highest min_minutes (the same rule as src/utils/coordinator_billing.py).
+# Upserted on the key from sql/migrations/003.
+COORDINATOR_BILLING_SUMMARY_UPSERT = """
+    INSERT INTO coordinator_monthly_summary
+        (coordinator_id, coordinator_name, patient_id, patient_name, year, month,
+         total_minutes, billing_code_id, billing_code, billing_code_description)
+    SELECT t.coordinator_id,
+        COALESCE(u.first_name || ' ' || u.last_name, CAST(t.coordinator_id AS TEXT)),
+        t.patient_id,
+        COALESCE(p.first_name || ' ' || p.last_name, t.patient_id),
+        t.year, t.month, t.total_minutes, b.code_id, b.billing_code, b.description
+    FROM (
+        SELECT CAST(:owner_id AS INTEGER) AS coordinator_id, :patient_id AS patient_id, :year AS year, :month AS month,
+            SUM(ct.duration_minutes) AS total_minutes
+        FROM coordinator_tasks ct
+        WHERE ct.coordinator_id = :owner_id AND ct.patient_id = :patient_id
+            AND ct.task_date_iso >= :month_start AND ct.task_date_iso < :next_month_start
+            AND ct.duration_minutes IS NOT NULL
+    ) t
+    LEFT JOIN coordinator_billing_codes b ON b.code_id = (
+        SELECT code_id FROM coordinator_billing_codes
+        WHERE min_minutes <= t.total_minutes AND t.total_minutes <= max_minutes
+        ORDER BY min_minutes DESC, max_minutes DESC
+        LIMIT 1
+    )
+    LEFT JOIN coordinators c ON c.coordinator_id = t.coordinator_id
+    LEFT JOIN users u ON u.user_id = c.user_id
+    LEFT JOIN patients p ON p.patient_id = t.patient_id
+    WHERE t.total_minutes IS NOT NULL
+    ON CONFLICT (coordinator_id, patient_id, year, month) DO UPDATE SET
+        total_minutes = excluded.total_minutes,
+        billing_code_id = excluded.billing_code_id,
+        billing_code = excluded.billing_code,
+        billing_code_description = excluded.billing_code_description,
+        updated_date = CURRENT_TIMESTAMP
+"""
+
+def _task_date_iso(value):
+    """YYYY-MM-DD for a date/datetime or a YYYY-MM-DD, M/D/YYYY or M/D/YY string"""
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d')
+    text = str(value or '').strip()
+    for fmt, length in (('%Y-%m-%d', 10), ('%m/%d/%Y', None), ('%m/%d/%y', None)):
+        try:
+            return datetime.strptime(text[:length], fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    raise ValueError(f"invalid task date {value!r}")
+
+def _month_bounds(task_date_iso):
+    """(month_start, next_month_start, month, year) of a YYYY-MM-DD date"""
+    year, month = int(task_date_iso[:4]), int(task_date_iso[5:7])
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f"{year}-{month:02d}-01", f"{next_year}-{next_month:02d}-01", month, year
+
+def _rows_by_id(conn, sql, ids):
+    """{str(id): row} for `sql` (with a single {ids} placeholder list) over ids, in chunks"""
+    ids = sorted({str(value) for value in ids})
+    rows = {}
+    for i in range(0, len(ids), TASK_LOOKUP_CHUNK_SIZE):
+        chunk = ids[i:i + TASK_LOOKUP_CHUNK_SIZE]
+        for row in conn.execute(sql.format(ids=', '.join('?' * len(chunk))), chunk):
+            rows[str(row[0])] = row
+    return rows
+
+def _validate_tasks(conn, tasks):
+    """Per-task results plus (index, task, patient row, task_date_iso, minutes) for the valid ones.
+
+    Each task is a dict with patient_id, task_date, task_description,
+    duration_minutes and optional notes.
+    """
+    patients = _rows_by_id(
+        conn, "SELECT patient_id, first_name, last_name FROM patients WHERE patient_id IN ({ids})",
+        [task.get('patient_id') for task in tasks if task.get('patient_id') is not None]
+    )
+    results, valid = [], []
+    for index, task in enumerate(tasks):
+        results.append({'index': index, 'saved': False, 'error': None, 'billing_code': None})
+        try:
+            patient = patients.get(str(task.get('patient_id')))
+            if patient is None:
+                raise ValueError(f"unknown patient {task.get('patient_id')!r}")
+            if not str(task.get('task_description') or '').strip():
+                raise ValueError("missing task description")
+            try:
+                minutes = int(task.get('duration_minutes'))
+            except (TypeError, ValueError):
+                raise ValueError(f"invalid duration {task.get('duration_minutes')!r}")
+            if minutes <= 0:
+                raise ValueError(f"duration must be positive, got {minutes}")
+            valid.append((index, task, patient, _task_date_iso(task.get('task_date')), minutes))
+        except ValueError as e:
+            results[index]['error'] = str(e)
+    return results, valid
+
+def _resolve_task_billing_codes(conn, valid):
+    """task_billing_codes row (or None) for each valid task: the code for its
+    description in effect on the task date whose minute range covers the
+    duration, preferring the highest min_minutes"""
+    descriptions = sorted({task['task_description'] for _, task, _, _, _ in valid})
+    codes = {}
+    for i in range(0, len(descriptions), TASK_LOOKUP_CHUNK_SIZE):
+        chunk = descriptions[i:i + TASK_LOOKUP_CHUNK_SIZE]
+        for row in conn.execute(f"""
+            SELECT code_id, task_description, min_minutes, max_minutes, billing_code, description,
+                effective_date, expiration_date
+            FROM task_billing_codes
+            WHERE task_description IN ({', '.join('?' * len(chunk))})
+            ORDER BY min_minutes DESC
+        """, chunk):
+            codes.setdefault(row['task_description'], []).append(row)
+
+    resolved = []
+    for _, task, _, task_date, minutes in valid:
+        resolved.append(next((
+            code for code in codes.get(task['task_description'], [])
+            if (code['min_minutes'] is None or code['min_minutes'] <= minutes)
+            and (code['max_minutes'] is None or minutes <= code['max_minutes'])
+            and (not code['effective_date'] or code['effective_date'][:10] <= task_date)
+            and (not code['expiration_date'] or task_date <= code['expiration_date'][:10])
+        ), None))
+    return resolved
+
+def _existing_tables(conn, names):
+    return {row[0] for row in conn.execute(
+        f"SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({', '.join('?' * len(names))})", list(names)
+    )}
+
+def _refresh_monthly_summaries(conn, statements, groups):
+    """Rebuild the summary rows of each (owner_id, month) group with executemany, skipping missing tables"""
+    params = [
+        dict(zip(('month_start', 'next_month_start', 'month', 'year'), _month_bounds(task_date)), owner_id=owner_id)
+        for owner_id, task_date in sorted(groups)
+    ]
+    for table in _existing_tables(conn, statements):
+        for sql in statements[table]:
+            conn.executemany(sql, params)
+
+@invalidates('provider_tasks', 'tasks', 'provider_monthly_summary', 'dashboard_provider_monthly_summary')
+@retry_on_locked
+def save_daily_tasks_bulk(provider_id, tasks):
+    """Save a batch of provider tasks in one transaction.
+
+    tasks is a list of dicts with patient_id, task_date, task_description,
+    duration_minutes and optional notes. Valid tasks get their billing code
+    from task_billing_codes and are written to provider_tasks and tasks with
+    executemany; the provider's monthly summary rows for the months touched
+    are rebuilt in the same transaction. Returns one dict per task, in order:
+    index, saved, error (None when saved) and billing_code.
+    """
+    with get_db_connection() as conn:
+        results, valid = _validate_tasks(conn, tasks)
+        provider = conn.execute("""
+            SELECT p.user_id, COALESCE(u.full_name, u.first_name || ' ' || u.last_name, p.first_name || ' ' || p.last_name) AS provider_name
+            FROM providers p LEFT JOIN users u ON u.user_id = p.user_id
+            WHERE p.provider_id = ?
+        """, (provider_id,)).fetchone()
+        if provider is None:
+            for index, *_ in valid:
+                results[index]['error'] = f"unknown provider {provider_id!r}"
+            return results
+        if not valid:
+            return results
+
+        codes = _resolve_task_billing_codes(conn, valid)
+        provider_rows, task_rows = [], []
+        for (index, task, patient, task_date, minutes), code in zip(valid, codes):
+            patient_name = f"{patient['first_name']} {patient['last_name']}"
+            description = task['task_description']
+            notes = task.get('notes') or ''
+            provider_rows.append((
+                provider_id, provider['provider_name'], patient_name, provider['user_id'], patient['patient_id'],
+                task_date, notes, minutes, description,
+                code['code_id'] if code else None,
+                code['billing_code'] if code else None,
+                code['description'] if code else f"{description} - {minutes} minutes",
+                int(task_date[5:7]), int(task_date[:4]),
+            ))
+            # tasks.user_id has always held the provider_id for provider-logged tasks
+            task_rows.append((
+                patient_name, patient['patient_id'], provider_id, provider['provider_name'], "", 33,
+                task_date, description, minutes, code['billing_code'] if code else "", notes, "completed",
+            ))
+        try:
+            # task_date is already ISO here, so task_date_iso (?6) is written directly
+            conn.executemany("""
+                INSERT INTO provider_tasks
+                (provider_id, provider_name, patient_name, user_id, patient_id, task_date, notes, minutes_of_service,
+                 task_description, billing_code_id, billing_code, billing_code_description, month, year, created_date,
+                 task_date_iso)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), ?6)
+            """, provider_rows)
+            # Also insert into tasks table for compatibility
+            conn.executemany("""
+                INSERT INTO tasks
+                (patient_name, patient_id, user_id, full_name, staff_code, role_id, task_date, task_type, duration_minutes, service_code, notes, task_state)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, task_rows)
+            _refresh_monthly_summaries(
+                conn, PROVIDER_MONTHLY_SUMMARIES, {(provider_id, task_date[:7] + '-01') for _, _, _, task_date, _ in valid}
+            )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            if is_lock_error(e):
+                raise
+            print(f"Error saving tasks for provider {provider_id}: {e}")
+            for index, *_ in valid:
+                results[index]['error'] = str(e)
+            return results
+
+        for (index, *_), code in zip(valid, codes):
+            results[index].update(saved=True, billing_code=code['billing_code'] if code else None)
+        print(f"{len(valid)} of {len(tasks)} tasks saved for provider {provider_id}")
+        return results
+
+@invalidates('coordinator_tasks', 'coordinator_monthly_summary', 'dashboard_coordinator_monthly_summary')
+@retry_on_locked
+def save_coordinator_tasks_bulk(coordinator_id, tasks):
+    """Save a batch of coordinator tasks in one transaction.
+
+    tasks is a list of dicts like save_daily_tasks_bulk takes; the task
+    description is stored as coordinator_tasks.task_type. Coordinator billing
+    codes apply to a patient's monthly total, so the affected
+    coordinator_monthly_summary rows are upserted with their codes (and the
+    dashboard monthly summary rebuilt) in the same transaction. Returns one
+    dict per task, in order: index, saved, error and the billing_code now on
+    the task's patient-month.
+    """
+    with get_db_connection() as conn:
+        results, valid = _validate_tasks(conn, tasks)
+        if not conn.execute("SELECT 1 FROM coordinators WHERE coordinator_id = ?", (coordinator_id,)).fetchone():
+            for index, *_ in valid:
+                results[index]['error'] = f"unknown coordinator {coordinator_id!r}"
+            return results
+        if not valid:
+            return results
+
+        patient_months = {(patient['patient_id'], task_date[:7] + '-01') for _, _, patient, task_date, _ in valid}
+        try:
+            # task_date is already ISO here, so task_date_iso (?3) is written directly
+            conn.executemany("""
+                INSERT INTO coordinator_tasks
+                (coordinator_id, patient_id, task_date, duration_minutes, task_type, notes, task_date_iso)
+                VALUES (?, ?, ?, ?, ?, ?, ?3)
+            """, [
+                (coordinator_id, patient['patient_id'], task_date, minutes, task['task_description'], task.get('notes') or '')
+                for _, task, patient, task_date, minutes in valid
+            ])
+            conn.executemany(COORDINATOR_BILLING_SUMMARY_UPSERT, [
+                dict(zip(('month_start', 'next_month_start', 'month', 'year'), _month_bounds(month_start)),
+                     owner_id=coordinator_id, patient_id=patient_id)
+                for patient_id, month_start in sorted(patient_months)
+            ])
+            _refresh_monthly_summaries(
+                conn, COORDINATOR_MONTHLY_SUMMARIES, {(coordinator_id, month_start) for _, month_start in patient_months}
+            )
+            codes = {}
+            for patient_id, month_start in patient_months:
+                _, _, month, year = _month_bounds(month_start)
+                row = conn.execute("""
+                    SELECT billing_code FROM coordinator_monthly_summary
+                    WHERE coordinator_id = ? AND patient_id = ? AND year = ? AND month = ?
+                """, (coordinator_id, patient_id, year, month)).fetchone()
+                codes[(patient_id, month_start)] = row[0] if row else None
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            if is_lock_error(e):
+                raise
+            print(f"Error saving tasks for coordinator {coordinator_id}: {e}")
+            for index, *_ in valid:
+                results[index]['error'] = str(e)
+            return results
+
+        for index, _, patient, task_date, _ in valid:
+            results[index].update(saved=True, billing_code=codes[(patient['patient_id'], task_date[:7] + '-01')])
+        print(f"{len(valid)} of {len(tasks)} tasks saved for coordinator {coordinator_id}")
+        return results
 
 def save_daily_task(provider_id, patient_id, task_date, task_description, duration_minutes, notes):
-    """Save a daily task for a provider to the provider_tasks table"""
-    conn = get_db_connection()
-    try:
-        # Get billing code description from task billing codes table
-        billing_code_description = f"{task_description} - {duration_minutes} minutes"
-        
-        # Insert into provider_tasks table - using correct column names
-        # Let SQLite auto-generate the task_id (it's the second column)
-        conn.execute("""
-            INSERT INTO provider_tasks 
-            (task_id, provider_id, patient_id, task_date, notes, minutes_of_service, task_description, billing_code_description)
-            VALUES (NULL, ?, ?, ?, ?, ?, ?, ?)
-        """, (provider_id, patient_id, task_date, notes, duration_minutes, task_description, billing_code_description))
-        
-        # Also insert into tasks table for compatibility
-        conn.execute("""
-            INSERT INTO tasks 
-            (patient_name, patient_id, user_id, full_name, staff_code, role_id, task_date, task_type, duration_minutes, service_code, notes, task_state)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, ("", patient_id, provider_id, "", "", 33, task_date, task_description, duration_minutes, "", notes, "completed"))
-        
-        conn.commit()
-        print(f"Task saved successfully for provider {provider_id}")
-        return True
-    except Exception as e:
-        print(f"Error saving task: {e}")
-        return False
-    finally:
-        conn.close()
+    """Save a daily task for a provider; a one-row save_daily_tasks_bulk"""
+    result = save_daily_tasks_bulk(provider_id, [{
+        'patient_id': patient_id, 'task_date': task_date, 'task_description': task_description,
+        'duration_minutes': duration_minutes, 'notes': notes,
+    }])[0]
+    if result['error']:
+        print(f"Error saving task: {result['error']}")
+    return result['saved']
 
 def save_coordinator_task(coordinator_id, patient_id, task_date, task_description, duration_minutes, notes):
-    """Save a daily task for a coordinator to the coordinator_tasks table"""
-    conn = get_db_connection()
-    try:
-        # Get billing code description from task billing codes table
-        billing_code_description = f"{task_description} - {duration_minutes} minutes"
-        
-        # Insert into coordinator_tasks table
-        conn.execute("""
-            INSERT INTO coordinator_tasks 
-            (coordinator_task_id, coordinator_id, patient_id, task_date, notes, duration_minutes, task_description, billing_code_description)
-            VALUES (NULL, ?, ?, ?, ?, ?, ?, ?)
-        """, (coordinator_id, patient_id, task_date, notes, duration_minutes, task_description, billing_code_description))
-        
-        conn.commit()
-        print(f"Coordinator task saved successfully for coordinator {coordinator_id}")
-        return True
-    except Exception as e:
-        print(f"Error saving coordinator task: {e}")
-        return False
-    finally:
-        conn.close()
+    """Save a daily task for a coordinator; a one-row save_coordinator_tasks_bulk"""
+    result = save_coordinator_tasks_bulk(coordinator_id, [{
+        'patient_id': patient_id, 'task_date': task_date, 'task_description': task_description,
+        'duration_minutes': duration_minutes, 'notes': notes,
+    }])[0]
+    if result['error']:
+        print(f"Error saving coordinator task: {result['error']}")
+    return result['saved']
 
 def get_all_patients():
     """Get all patients from the database with their status type"""
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         patients = conn.execute("""
             SELECT 
                 p.patient_id,
@@ -555,161 +1605,261 @@ def get_all_patients():
             LEFT JOIN patient_status_types pst ON p.status = pst.status_name
         """).fetchall()
         return [dict(row) for row in patients]
-    finally:
-        conn.close()
 
+@cached_query('patient_status_types')
 def get_all_patient_status_types():
     """Get all available patient status types"""
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         status_types = conn.execute("""
             SELECT status_id, status_name, description 
             FROM patient_status_types 
             ORDER BY status_name
         """).fetchall()
         return [dict(row) for row in status_types]
-    finally:
-        conn.close()
 
+@invalidates('patients')
+@retry_on_locked
 def update_patient_status(patient_id, status):
     """Update the status of a patient"""
-    conn = get_db_connection()
-    try:
-        conn.execute("""
-            UPDATE patients 
-            SET status = ?, updated_date = CURRENT_TIMESTAMP 
-            WHERE patient_id = ?
-        """, (status, patient_id))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error updating patient status: {e}")
-        return False
-    finally:
-        conn.close()
+    with get_db_connection() as conn:
+        try:
+            conn.execute("""
+                UPDATE patients 
+                SET status = ?, updated_date = CURRENT_TIMESTAMP 
+                WHERE patient_id = ?
+            """, (status, patient_id))
+            conn.commit()
+            return True
+        except Exception as e:
+            conn.rollback()
+            if is_lock_error(e):
+                raise
+            print(f"Error updating patient status: {e}")
+            return False
 
 
 # Onboarding Workflow Functions
 
+# Onboarding stage labels by onboarding_patients.current_stage (migration 004)
+ONBOARDING_STAGE_LABELS = {
+    1: 'Stage 1: Patient Registration',
+    2: 'Stage 2: Eligibility Verification',
+    3: 'Stage 3: Chart Creation',
+    4: 'Stage 4: Intake Processing',
+    5: 'Stage 5: TV Scheduling',
+    6: 'Completed - Ready for Handoff',
+}
+ONBOARDING_READY_STAGE = 6
+
+# current_stage from the stage flags: one past the highest completed stage
+ONBOARDING_CURRENT_STAGE_SQL = """
+    CASE
+        WHEN stage5_complete = 1 THEN 6
+        WHEN stage4_complete = 1 THEN 5
+        WHEN stage3_complete = 1 THEN 4
+        WHEN stage2_complete = 1 THEN 3
+        WHEN stage1_complete = 1 THEN 2
+        ELSE 1
+    END
+"""
+
+ONBOARDING_QUEUE_PAGE_SIZE = 50
+
+# Queue order of get_onboarding_queue and its pages: ready for handoff first,
+# then by stage descending and newest first. Every column is in
+# idx_onboarding_patients_queue (onboarding_id as its rowid), so pages are
+# read straight off the index with no sort.
+ONBOARDING_QUEUE_ORDER = ('op.current_stage', 'op.created_date', 'op.onboarding_id')
+
+ONBOARDING_QUEUE_SELECT = """
+    SELECT 
+        op.onboarding_id,
+        op.first_name || ' ' || op.last_name AS patient_name,
+        op.patient_status,
+        op.assigned_pot_user_id,
+        u.full_name AS assigned_pot_name,
+        wi.status AS workflow_status,
+        op.current_stage AS current_stage_number,
+        op.created_date,
+        op.updated_date,
+        op.completed_date
+    FROM onboarding_patients op
+    LEFT JOIN workflow_instances wi ON op.workflow_instance_id = wi.instance_id
+    LEFT JOIN users u ON op.assigned_pot_user_id = u.user_id
+    WHERE op.completed_date IS NULL
+"""
+
+def _onboarding_queue_row(row):
+    patient = dict(row)
+    stage = patient['current_stage_number']
+    patient['current_stage'] = ONBOARDING_STAGE_LABELS.get(stage, ONBOARDING_STAGE_LABELS[1])
+    patient['priority_status'] = 'Ready for Handoff' if stage == ONBOARDING_READY_STAGE else 'In Progress'
+    return patient
+
 def get_onboarding_queue():
-    """Get all active onboarding patients with their current status"""
-    conn = get_db_connection()
-    try:
-        query = """
-        SELECT 
-            op.onboarding_id,
-            op.first_name || ' ' || op.last_name AS patient_name,
-            op.patient_status,
-            op.assigned_pot_user_id,
-            u.full_name AS assigned_pot_name,
-            wi.status AS workflow_status,
-            CASE 
-                WHEN op.stage5_complete = 1 THEN 'Completed - Ready for Handoff'
-                WHEN op.stage4_complete = 1 THEN 'Stage 5: TV Scheduling'
-                WHEN op.stage3_complete = 1 THEN 'Stage 4: Intake Processing'
-                WHEN op.stage2_complete = 1 THEN 'Stage 3: Chart Creation'
-                WHEN op.stage1_complete = 1 THEN 'Stage 2: Eligibility Verification'
-                ELSE 'Stage 1: Patient Registration'
-            END AS current_stage,
-            CASE
-                WHEN op.completed_date IS NOT NULL THEN 'Completed'
-                WHEN op.stage5_complete = 1 THEN 'Ready for Handoff'
-                ELSE 'In Progress'
-            END AS priority_status,
-            op.created_date,
-            op.updated_date,
-            op.completed_date
-        FROM onboarding_patients op
-        LEFT JOIN workflow_instances wi ON op.workflow_instance_id = wi.instance_id
-        LEFT JOIN users u ON op.assigned_pot_user_id = u.user_id
-        WHERE op.completed_date IS NULL
-        ORDER BY 
-            CASE 
-                WHEN op.stage5_complete = 1 THEN 1  -- Ready for handoff (highest priority)
-                WHEN op.stage4_complete = 1 THEN 2  -- Almost done
-                WHEN op.stage3_complete = 1 THEN 3
-                WHEN op.stage2_complete = 1 THEN 4
-                WHEN op.stage1_complete = 1 THEN 5
-                ELSE 6  -- Just started (lowest priority)
-            END,
-            op.created_date DESC
-        """
-        result = conn.execute(query).fetchall()
-        return [dict(row) for row in result]
-    finally:
-        conn.close()
+    """Get all active onboarding patients with their current status, in queue order"""
+    order_sql = ", ".join(f"{column} DESC" for column in ONBOARDING_QUEUE_ORDER)
+    with get_db_connection() as conn:
+        return [_onboarding_queue_row(row) for row in conn.execute(f"{ONBOARDING_QUEUE_SELECT} ORDER BY {order_sql}")]
 
-def create_onboarding_workflow_instance(patient_data, pot_user_id):
-    """Create a new workflow instance and onboarding patient record"""
-    conn = get_db_connection()
-    try:
-        # Create workflow instance
-        conn.execute("""
-            INSERT INTO workflow_instances (template_id, status, created_at)
-            VALUES (14, 'In Progress', datetime('now'))
-        """)
-        
-        workflow_instance_id = conn.lastrowid
-        
-        # Create onboarding patient record
-        conn.execute("""
+def get_onboarding_queue_page(after=None, limit=ONBOARDING_QUEUE_PAGE_SIZE, search=None):
+    """One page of the onboarding queue, in get_onboarding_queue order.
+
+    after is the next_after of the previous page (keyset paging), so each page
+    reads only its own rows from idx_onboarding_patients_queue. search keeps
+    patients matching it in patient_fts, as search_patients matches patients.
+    Returns {'rows', 'next_after', 'total'}; next_after is None on the last
+    page and total (from onboarding_stage_counts) is None when searching.
+    """
+    query = ONBOARDING_QUEUE_SELECT
+    params = []
+    if after is not None:
+        if len(after) != len(ONBOARDING_QUEUE_ORDER):
+            raise ValueError(f"after must have {len(ONBOARDING_QUEUE_ORDER)} values")
+        query += f" AND ({', '.join(ONBOARDING_QUEUE_ORDER)}) < ({', '.join('?' * len(ONBOARDING_QUEUE_ORDER))})"
+        params.extend(after)
+    with get_db_connection() as conn:
+        match = _patient_search_match(conn, search, typos=True)
+        if match is not None:
+            query += " AND op.onboarding_id IN (SELECT rowid / 2 FROM patient_fts WHERE patient_fts MATCH ? AND rowid % 2 = 1)"
+            params.append(match)
+        # One row past the page tells whether another page follows
+        query += f" ORDER BY {', '.join(f'{column} DESC' for column in ONBOARDING_QUEUE_ORDER)} LIMIT ?"
+        params.append(limit + 1)
+        rows = [_onboarding_queue_row(row) for row in conn.execute(query, params)]
+
+    next_after = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_after = (last['current_stage_number'], last['created_date'], last['onboarding_id'])
+    total = None if match is not None else sum(get_onboarding_stage_counts().values())
+    return {'rows': rows, 'next_after': next_after, 'total': total}
+
+def get_onboarding_stage_counts(patient_status=None):
+    """Open onboarding patients per current_stage, from onboarding_stage_counts"""
+    query = """
+        SELECT current_stage, SUM(patient_count) AS patient_count
+        FROM onboarding_stage_counts
+        WHERE is_completed = 0
+    """
+    params = []
+    if patient_status is not None:
+        query += " AND patient_status = ?"
+        params.append(patient_status)
+    query += " GROUP BY current_stage"
+    with get_db_connection() as conn:
+        counts = dict.fromkeys(ONBOARDING_STAGE_LABELS, 0)
+        for row in conn.execute(query, params):
+            counts[row['current_stage']] = row['patient_count']
+        return counts
+
+# Workflow template whose steps become the tasks of every onboarding patient (sql/insert_pot_workflow_steps.sql)
+ONBOARDING_TEMPLATE_ID = 14
+
+# Intake record fields copied to onboarding_patients, in insert order
+ONBOARDING_PATIENT_FIELDS = (
+    'first_name', 'last_name', 'date_of_birth',
+    'phone_primary', 'email', 'gender', 'emergency_contact_name', 'emergency_contact_phone',
+    'address_street', 'address_city', 'address_state', 'address_zip',
+    'insurance_provider', 'policy_number', 'group_number',
+    'referral_source', 'referring_provider', 'referral_date',
+    'patient_status', 'facility_assignment',
+)
+ONBOARDING_REQUIRED_FIELDS = ('first_name', 'last_name', 'date_of_birth')
+
+def _onboarding_task_stage(step_order):
+    # Group steps into stages (3 steps per stage roughly); stage 5 takes every step after 15
+    return 5 if step_order > 15 else ((step_order - 1) // 3) + 1
+
+@cached_query('workflow_steps')
+def get_workflow_step_template(template_id=ONBOARDING_TEMPLATE_ID):
+    """Steps of a workflow template in order, with the onboarding stage of each"""
+    with get_db_connection() as conn:
+        steps = conn.execute("""
+            SELECT step_id, step_order, task_name FROM workflow_steps
+            WHERE template_id = ? ORDER BY step_order
+        """, (template_id,)).fetchall()
+        return [dict(step, task_stage=_onboarding_task_stage(step['step_order'])) for step in steps]
+
+def _reserve_ids(conn, table, column, count):
+    """The next `count` ids of an AUTOINCREMENT table; call inside a write transaction"""
+    last = conn.execute(f"""
+        SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0),
+                   COALESCE((SELECT MAX({column}) FROM {table}), 0))
+    """, (table,)).fetchone()[0]
+    return list(range(last + 1, last + count + 1))
+
+@invalidates('workflow_instances', 'onboarding_patients', 'onboarding_tasks')
+@retry_on_locked
+def create_onboarding_workflow_instances(intake_records, pot_user_id, registration_complete=False):
+    """Start onboarding for a batch of intake records in one transaction.
+
+    Each record is a dict of ONBOARDING_PATIENT_FIELDS (first_name, last_name
+    and date_of_birth required). Every record gets a workflow instance, an
+    onboarding_patients row and one onboarding task per step of the cached
+    template; all rows are written with executemany. registration_complete
+    marks Stage 1 done on every record, as after the intake form. Returns the
+    new onboarding_ids in record order. Raises ValueError, writing nothing, if a
+    record is missing a required field.
+    """
+    missing = [
+        f"record {index}: {', '.join(field for field in ONBOARDING_REQUIRED_FIELDS if not record.get(field))}"
+        for index, record in enumerate(intake_records)
+        if not all(record.get(field) for field in ONBOARDING_REQUIRED_FIELDS)
+    ]
+    if missing:
+        raise ValueError(f"Missing required intake fields: {'; '.join(missing)}")
+    if not intake_records:
+        return []
+
+    steps = get_workflow_step_template(ONBOARDING_TEMPLATE_ID)
+    count = len(intake_records)
+    with get_db_connection() as conn:
+        # Ids are assigned up front so executemany needs no lastrowid; the
+        # write lock taken here keeps them from being claimed concurrently
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        instance_ids = _reserve_ids(conn, 'workflow_instances', 'instance_id', count)
+        onboarding_ids = _reserve_ids(conn, 'onboarding_patients', 'onboarding_id', count)
+
+        conn.executemany("""
+            INSERT INTO workflow_instances (instance_id, template_id, status, created_at)
+            VALUES (?, ?, 'In Progress', datetime('now'))
+        """, [(instance_id, ONBOARDING_TEMPLATE_ID) for instance_id in instance_ids])
+
+        conn.executemany(f"""
             INSERT INTO onboarding_patients (
-                workflow_instance_id, first_name, last_name, date_of_birth,
-                phone_primary, email, gender, emergency_contact_name, emergency_contact_phone,
-                address_street, address_city, address_state, address_zip,
-                insurance_provider, policy_number, group_number,
-                referral_source, referring_provider, referral_date,
-                patient_status, facility_assignment, assigned_pot_user_id,
-                created_date, updated_date
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'))
-        """, (
-            workflow_instance_id,
-            patient_data['first_name'], patient_data['last_name'], patient_data['date_of_birth'],
-            patient_data.get('phone_primary'), patient_data.get('email'), patient_data.get('gender'),
-            patient_data.get('emergency_contact_name'), patient_data.get('emergency_contact_phone'),
-            patient_data.get('address_street'), patient_data.get('address_city'), 
-            patient_data.get('address_state'), patient_data.get('address_zip'),
-            patient_data.get('insurance_provider'), patient_data.get('policy_number'), 
-            patient_data.get('group_number'),
-            patient_data.get('referral_source'), patient_data.get('referring_provider'), 
-            patient_data.get('referral_date'),
-            patient_data.get('patient_status', 'Active'), 
-            patient_data.get('facility_assignment'), pot_user_id
-        ))
-        
-        onboarding_id = conn.lastrowid
-        
+                onboarding_id, workflow_instance_id, {', '.join(ONBOARDING_PATIENT_FIELDS)},
+                assigned_pot_user_id, stage1_complete, current_stage, created_date, updated_date
+            ) VALUES (?, ?, {', '.join('?' * len(ONBOARDING_PATIENT_FIELDS))}, ?, ?, ?, datetime('now'), datetime('now'))
+        """, [
+            (onboarding_id, instance_id,
+             *(record.get(field, 'Active') if field == 'patient_status' else record.get(field) for field in ONBOARDING_PATIENT_FIELDS),
+             pot_user_id, registration_complete, 2 if registration_complete else 1)
+            for onboarding_id, instance_id, record in zip(onboarding_ids, instance_ids, intake_records)
+        ])
+
         # Create initial tasks for all workflow steps
-        workflow_steps = conn.execute("""
-            SELECT step_id, step_order, task_name FROM workflow_steps 
-            WHERE template_id = 14 ORDER BY step_order
-        """).fetchall()
-        
-        for step in workflow_steps:
-            stage = ((step['step_order'] - 1) // 3) + 1  # Group steps into stages (3 steps per stage roughly)
-            if step['step_order'] > 15:  # Handle stage 5 which has more steps
-                stage = 5
-            
-            conn.execute("""
-                INSERT INTO onboarding_tasks (
-                    onboarding_id, workflow_step_id, task_name, task_stage, 
-                    task_order, status, created_date, updated_date
-                ) VALUES (?, ?, ?, ?, ?, 'Pending', datetime('now'), datetime('now'))
-            """, (onboarding_id, step['step_id'], step['task_name'], stage, step['step_order']))
-        
-        conn.commit()
-        return onboarding_id
-        
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
+        conn.executemany("""
+            INSERT INTO onboarding_tasks (
+                onboarding_id, workflow_step_id, task_name, task_stage,
+                task_order, status, created_date, updated_date
+            ) VALUES (?, ?, ?, ?, ?, 'Pending', datetime('now'), datetime('now'))
+        """, [
+            (onboarding_id, step['step_id'], step['task_name'], step['task_stage'], step['step_order'])
+            for onboarding_id in onboarding_ids
+            for step in steps
+        ])
+        return onboarding_ids
+
+def create_onboarding_workflow_instance(patient_data, pot_user_id):
+    """Create a new workflow instance and onboarding patient record"""
+    return create_onboarding_workflow_instances([patient_data], pot_user_id)[0]
 
 def get_onboarding_patient_details(onboarding_id):
     """Get detailed information for a specific onboarding patient"""
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         # Get patient details
         patient = conn.execute("""
             SELECT * FROM onboarding_patients WHERE onboarding_id = ?
@@ -732,27 +1882,30 @@ def get_onboarding_patient_details(onboarding_id):
         patient_dict['tasks'] = [dict(task) for task in tasks]
         return patient_dict
         
-    finally:
-        conn.close()
 
+@invalidates('onboarding_patients')
+@retry_on_locked
 def update_onboarding_stage_completion(onboarding_id, stage_number, completed=True):
-    """Update stage completion status"""
-    conn = get_db_connection()
-    try:
+    """Update stage completion status and the current_stage derived from it"""
+    with get_db_connection() as conn:
         stage_field = f"stage{stage_number}_complete"
         conn.execute(f"""
             UPDATE onboarding_patients 
             SET {stage_field} = ?, updated_date = datetime('now')
             WHERE onboarding_id = ?
         """, (completed, onboarding_id))
+        # Same transaction: the stage count triggers move the patient along with it
+        conn.execute(f"""
+            UPDATE onboarding_patients SET current_stage = {ONBOARDING_CURRENT_STAGE_SQL}
+            WHERE onboarding_id = ?
+        """, (onboarding_id,))
         conn.commit()
-    finally:
-        conn.close()
 
+@invalidates('onboarding_tasks')
+@retry_on_locked
 def update_onboarding_task_status(task_id, status, user_id, checkbox_data=None):
     """Update individual task status and checkbox data"""
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         query = """
             UPDATE onboarding_tasks 
             SET status = ?, completed_by_user_id = ?, updated_date = datetime('now')
@@ -774,26 +1927,24 @@ def update_onboarding_task_status(task_id, status, user_id, checkbox_data=None):
         
         conn.execute(query, params)
         conn.commit()
-    finally:
-        conn.close()
 
+@invalidates('onboarding_patients')
+@retry_on_locked
 def update_onboarding_patient_assignment(onboarding_id, pot_user_id):
     """Assign an onboarding patient to a POT user"""
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         conn.execute("""
             UPDATE onboarding_patients 
             SET assigned_pot_user_id = ?, updated_date = datetime('now')
             WHERE onboarding_id = ?
         """, (pot_user_id, onboarding_id))
         conn.commit()
-    finally:
-        conn.close()
 
+@invalidates('onboarding_patients')
+@retry_on_locked
 def update_onboarding_checkbox_data(onboarding_id, checkbox_data):
     """Update checkbox data for an onboarding patient"""
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         # Build dynamic query based on provided checkbox data
         update_fields = []
         params = []
@@ -814,13 +1965,12 @@ def update_onboarding_checkbox_data(onboarding_id, checkbox_data):
             
             conn.execute(query, params)
             conn.commit()
-    finally:
-        conn.close()
 
+@invalidates('patients', 'onboarding_patients')
+@retry_on_locked
 def transfer_onboarding_to_patient_table(onboarding_id):
     """Transfer completed onboarding data to the main patients table"""
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         # Get onboarding data
         onboarding = conn.execute("""
             SELECT * FROM onboarding_patients WHERE onboarding_id = ?
@@ -905,23 +2055,22 @@ def transfer_onboarding_to_patient_table(onboarding_id):
                 UPDATE onboarding_patients SET patient_id = ? WHERE onboarding_id = ?
             """, (patient_id, onboarding_id))
         
-        # Mark onboarding as complete
-        conn.execute("""
+        # Mark onboarding as complete; the stage count triggers move it out of the open counts
+        conn.execute(f"""
             UPDATE onboarding_patients 
-            SET completed_date = datetime('now'), updated_date = datetime('now')
+            SET completed_date = datetime('now'), updated_date = datetime('now'),
+                current_stage = {ONBOARDING_CURRENT_STAGE_SQL}
             WHERE onboarding_id = ?
         """, (onboarding_id,))
         
         conn.commit()
         return patient_id
         
-    finally:
-        conn.close()
 
+@cached_query('users', 'user_roles', 'roles')
 def get_users_by_role_name(role_name):
     """Get all users with a specific role by role name"""
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         users = conn.execute("""
             SELECT u.user_id, u.username, u.full_name 
             FROM users u
@@ -930,5 +2079,3 @@ def get_users_by_role_name(role_name):
             WHERE r.role_name = ?
         """, (role_name,)).fetchall()
         return [dict(user) for user in users]
-    finally:
-        conn.close()
@@ -1,3 +1,8 @@
+-- Reads task_date_iso: run with `python -m src.utils.run_sql_script src/sql/populate_coordinator_monthly_summary.sql [db_path]`,
+-- which adds the column first on a database the app has not opened.
+-- Full reload. src/utils/coordinator_billing.py assigns billing codes with a sorted
+-- interval lookup and upserts only changed rows; prefer it.
+
 -- Clear existing data
 DELETE FROM coordinator_monthly_summary;
 
@@ -29,17 +34,17 @@ FROM (
     SELECT 
         ct.coordinator_id,
         ct.patient_id,
-        CAST(SUBSTR(ct.task_date, -2) AS INTEGER) + 2000 as year,
-        CAST(SUBSTR(ct.task_date, 1, INSTR(ct.task_date, '/') - 1) AS INTEGER) as month,
+        CAST(strftime('%Y', ct.task_date_iso) AS INTEGER) as year,
+        CAST(strftime('%m', ct.task_date_iso) AS INTEGER) as month,
         SUM(ct.duration_minutes) as total_minutes
     FROM coordinator_tasks ct
-    WHERE ct.task_date IS NOT NULL AND ct.task_date != ''
+    -- task_date_iso is the normalized copy of task_date (see database.migrate_task_date_iso)
+    WHERE ct.task_date_iso IS NOT NULL
         AND ct.coordinator_id IS NOT NULL
         AND ct.patient_id IS NOT NULL
         AND ct.duration_minutes IS NOT NULL
     GROUP BY ct.coordinator_id, ct.patient_id, 
-             CAST(SUBSTR(ct.task_date, -2) AS INTEGER) + 2000,
-             CAST(SUBSTR(ct.task_date, 1, INSTR(ct.task_date, '/') - 1) AS INTEGER)
+             strftime('%Y-%m', ct.task_date_iso)
 ) time_summary
 LEFT JOIN coordinators c ON time_summary.coordinator_id = c.coordinator_id
 LEFT JOIN users u ON c.user_id = u.user_id
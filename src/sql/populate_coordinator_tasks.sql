@@ -1,3 +1,6 @@
+-- Full reload. src/utils/coordinator_tasks_etl.py loads the same data incrementally
+-- (watermarked, unmatched rows routed to unmatched_tasks_analysis); prefer it.
+
 -- Clear existing data
 DELETE FROM coordinator_tasks;
 
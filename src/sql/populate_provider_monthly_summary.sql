@@ -1,3 +1,5 @@
+-- Reads task_date_iso: run with `python -m src.utils.run_sql_script src/sql/populate_provider_monthly_summary.sql [db_path]`,
+-- which adds the column first on a database the app has not opened.
 -- Clear existing data from provider_monthly_summary table
 DELETE FROM provider_monthly_summary;
 -- Insert data into provider_monthly_summary table from provider_tasks
@@ -11,19 +13,14 @@ INSERT INTO provider_monthly_summary (
     )
 SELECT pt.provider_id,
     pt.provider_name,
-    CAST(
-        SUBSTR(pt.task_date, 1, INSTR(pt.task_date, '/') - 1) AS INTEGER
-    ) AS month,
-    CAST('20' || SUBSTR(pt.task_date, -2) AS INTEGER) AS year,
-    COUNT(pt.provider_task_id) AS total_tasks_completed,
+    CAST(strftime('%m', pt.task_date_iso) AS INTEGER) AS month,
+    CAST(strftime('%Y', pt.task_date_iso) AS INTEGER) AS year,
+    COUNT(*) AS total_tasks_completed,
     SUM(pt.minutes_of_service) AS total_time_spent_minutes
 FROM provider_tasks pt
-WHERE pt.task_date IS NOT NULL
-    AND pt.task_date != ''
-    AND LENGTH(pt.task_date) = 8
-    AND SUBSTR(pt.task_date, 3, 1) = '/'
-    AND SUBSTR(pt.task_date, 6, 1) = '/'
-    AND CAST('20' || SUBSTR(pt.task_date, -2) AS INTEGER) >= 2023
+-- task_date_iso is the normalized copy of task_date (see database.migrate_task_date_iso);
+-- a plain range keeps this an index scan
+WHERE pt.task_date_iso >= '2023-01-01'
 GROUP BY pt.provider_id,
     month,
     year;
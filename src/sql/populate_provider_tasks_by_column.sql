@@ -39,15 +39,39 @@ FROM temp_source_key sk
     LEFT JOIN users u ON scm.user_id = u.user_id
     LEFT JOIN users u2 ON p.user_id = u2.user_id;
 -- Create patient_id temp table
+-- Names are resolved ahead of time by `python -m src.utils.patient_identity`, which
+-- fills source_patient_identity keyed on the raw source string. Names it has not
+-- seen yet (the step was not run, or new rows arrived since) fall back to an
+-- exact last_first_dob match.
+CREATE TABLE IF NOT EXISTS source_patient_identity (
+    source_table TEXT NOT NULL,
+    raw_name TEXT NOT NULL,
+    patient_id TEXT,
+    match_method TEXT NOT NULL,
+    match_score REAL,
+    resolved_date TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (source_table, raw_name)
+);
 CREATE TEMPORARY TABLE temp_patient_id AS
 SELECT sk.row_id,
     sk.prov_code,
     sp."Patient Last, First DOB" as patient_name,
-    COALESCE(pat.patient_id, sp."Patient Last, First DOB") as patient_id
+    COALESCE(
+        spi.patient_id,
+        (
+            SELECT pat.patient_id
+            FROM patients pat
+            WHERE spi.raw_name IS NULL
+                AND TRIM(UPPER(sp."Patient Last, First DOB")) = TRIM(UPPER(pat.last_first_dob))
+            LIMIT 1
+        ),
+        sp."Patient Last, First DOB"
+    ) as patient_id
 FROM temp_source_key sk
     JOIN "SOURCE_PROVIDER_TASKS_HISTORY" sp ON sk.row_id = sp."1"
     AND sk.prov_code = sp."Prov"
-    LEFT JOIN patients pat ON TRIM(UPPER(sp."Patient Last, First DOB")) = TRIM(UPPER(pat.last_first_dob));
+    LEFT JOIN source_patient_identity spi ON spi.source_table = 'SOURCE_PROVIDER_TASKS_HISTORY'
+    AND spi.raw_name = sp."Patient Last, First DOB";
 -- Create user_id temp table
 CREATE TEMPORARY TABLE temp_user_id AS
 SELECT sk.row_id,
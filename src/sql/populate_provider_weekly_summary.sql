@@ -1,3 +1,5 @@
+-- Reads task_date_iso: run with `python -m src.utils.run_sql_script src/sql/populate_provider_weekly_summary.sql [db_path]`,
+-- which adds the column first on a database the app has not opened.
 -- This script performs the following tasks:
 -- 1. Clears any existing data from the final summary table.
 -- 2. Creates and populates a temporary table with weekly provider summary data,
@@ -13,51 +15,29 @@ DROP TABLE IF EXISTS temp_weekly_summary;
 CREATE TEMPORARY TABLE temp_weekly_summary AS
 SELECT pt.provider_id,
     pt.provider_name,
+    -- task_date_iso is the normalized copy of task_date (see database.migrate_task_date_iso)
     DATE(
         MIN(
-            julianday(
-                '20' || SUBSTR(pt.task_date, 7, 2) || '-' || SUBSTR(pt.task_date, 1, 2) || '-' || SUBSTR(pt.task_date, 4, 2)
-            ) - (
-                (
-                    julianday(
-                        '20' || SUBSTR(pt.task_date, 7, 2) || '-' || SUBSTR(pt.task_date, 1, 2) || '-' || SUBSTR(pt.task_date, 4, 2)
-                    ) - 3
-                ) % 7
-            )
+            julianday(pt.task_date_iso) - ((julianday(pt.task_date_iso) - 3) % 7)
         )
     ) AS week_start_date,
     DATE(
         MIN(
-            julianday(
-                '20' || SUBSTR(pt.task_date, 7, 2) || '-' || SUBSTR(pt.task_date, 1, 2) || '-' || SUBSTR(pt.task_date, 4, 2)
-            ) - (
-                (
-                    julianday(
-                        '20' || SUBSTR(pt.task_date, 7, 2) || '-' || SUBSTR(pt.task_date, 1, 2) || '-' || SUBSTR(pt.task_date, 4, 2)
-                    ) - 3
-                ) % 7
-            )
+            julianday(pt.task_date_iso) - ((julianday(pt.task_date_iso) - 3) % 7)
         ) + 6
     ) AS week_end_date,
-    CAST('20' || SUBSTR(pt.task_date, -2) AS INTEGER) AS year,
+    CAST(strftime('%Y', pt.task_date_iso) AS INTEGER) AS year,
     CAST(
         (
-            julianday(
-                '20' || SUBSTR(pt.task_date, 7, 2) || '-' || SUBSTR(pt.task_date, 1, 2) || '-' || SUBSTR(pt.task_date, 4, 2)
-            ) - julianday('20' || SUBSTR(pt.task_date, -2) || '-01-01') + 1
+            julianday(pt.task_date_iso) - julianday(strftime('%Y-01-01', pt.task_date_iso)) + 1
         ) / 7 AS INTEGER
     ) + 1 AS week_number,
     COUNT(pt.provider_task_id) AS total_tasks_completed,
     SUM(pt.minutes_of_service) AS total_time_spent_minutes,
-    CAST(SUM(pt.minutes_of_service) AS REAL) / COUNT(DISTINCT pt.task_date) AS average_daily_minutes,
-    COUNT(DISTINCT pt.task_date) AS days_active
+    CAST(SUM(pt.minutes_of_service) AS REAL) / COUNT(DISTINCT pt.task_date_iso) AS average_daily_minutes,
+    COUNT(DISTINCT pt.task_date_iso) AS days_active
 FROM provider_tasks pt
-WHERE pt.task_date IS NOT NULL
-    AND pt.task_date != ''
-    AND LENGTH(pt.task_date) = 8
-    AND SUBSTR(pt.task_date, 3, 1) = '/'
-    AND SUBSTR(pt.task_date, 6, 1) = '/'
-    AND CAST('20' || SUBSTR(pt.task_date, -2) AS INTEGER) >= 2023
+WHERE pt.task_date_iso >= '2023-01-01'
 GROUP BY pt.provider_id,
     year,
     week_number;
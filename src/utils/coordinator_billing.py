@@ -0,0 +1,225 @@
+"""
+Billing code assignment for coordinator monthly minutes.
+
+coordinator_billing_codes defines minute ranges [min_minutes, max_minutes]. The
+ranges are loaded once into arrays sorted by min_minutes, and every
+(coordinator, patient, month) total from coordinator_tasks is tested against
+all of them in one numpy pass: the code is the range containing the total with
+the highest min_minutes. Where ranges overlap, the higher tier therefore wins,
+and a total past a narrow nested range still falls back to the wider one.
+
+Results are staged in a temp table and upserted into coordinator_monthly_summary
+on its (coordinator_id, patient_id, year, month) key (sql/migrations/003). Only
+changed rows are rewritten, and groups that no longer exist are removed.
+check_billing_ranges() reports overlapping, inverted or gapped code ranges.
+The database is prepared with database.initialize_database first, so
+task_date_iso and the summary key exist even if the app has never opened it.
+
+Usage:
+    python -m src.utils.coordinator_billing [db_path] [--check]
+"""
+
+import logging
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+
+from src.database import initialize_database
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'production.db'
+
+SUMMARY_COLUMNS = [
+    'coordinator_id', 'coordinator_name', 'patient_id', 'patient_name', 'year', 'month',
+    'total_minutes', 'billing_code_id', 'billing_code', 'billing_code_description',
+]
+
+
+def load_billing_codes(conn):
+    """coordinator_billing_codes sorted by min_minutes"""
+    return pd.read_sql_query("""
+        SELECT code_id, billing_code, description, min_minutes, max_minutes
+        FROM coordinator_billing_codes
+        ORDER BY min_minutes, max_minutes, code_id
+    """, conn)
+
+
+def check_billing_ranges(codes):
+    """Human-readable problems with the code ranges: missing bounds, inversions, overlaps and gaps"""
+    problems = []
+    incomplete = codes[codes['min_minutes'].isna() | codes['max_minutes'].isna()]
+    for row in incomplete.itertuples():
+        problems.append(f"{row.billing_code}: missing min_minutes or max_minutes, never assigned")
+    ranges = codes.dropna(subset=['min_minutes', 'max_minutes'])
+    for row in ranges[ranges['min_minutes'] > ranges['max_minutes']].itertuples():
+        problems.append(f"{row.billing_code}: min_minutes {row.min_minutes:g} is above max_minutes {row.max_minutes:g}")
+
+    ranges = ranges[ranges['min_minutes'] <= ranges['max_minutes']].sort_values(['min_minutes', 'max_minutes'])
+    previous = None
+    for row in ranges.itertuples():
+        if previous is not None:
+            if row.min_minutes <= previous.max_minutes:
+                problems.append(
+                    f"{previous.billing_code} [{previous.min_minutes:g}-{previous.max_minutes:g}] overlaps "
+                    f"{row.billing_code} [{row.min_minutes:g}-{row.max_minutes:g}]; {row.billing_code} wins where both apply"
+                )
+            elif row.min_minutes > previous.max_minutes + 1:
+                problems.append(
+                    f"gap: totals {previous.max_minutes + 1:g}-{row.min_minutes - 1:g} minutes get no code "
+                    f"(between {previous.billing_code} and {row.billing_code})"
+                )
+        if previous is None or row.max_minutes > previous.max_minutes:
+            previous = row
+    return problems
+
+
+class BillingCodeIntervals:
+    """coordinator_billing_codes ranges sorted by (min_minutes, max_minutes)"""
+
+    def __init__(self, codes):
+        codes = codes.dropna(subset=['min_minutes', 'max_minutes'])
+        codes = codes[codes['min_minutes'] <= codes['max_minutes']].sort_values(['min_minutes', 'max_minutes'])
+        self.codes = codes.reset_index(drop=True)
+        self.starts = self.codes['min_minutes'].to_numpy(dtype=float)
+        self.ends = self.codes['max_minutes'].to_numpy(dtype=float)
+
+    def assign(self, totals):
+        """Row position in self.codes for each total, -1 where no range covers it"""
+        totals = np.asarray(totals, dtype=float)
+        if not len(self.starts):
+            return np.full(len(totals), -1)
+        # Every range is checked: with nested ranges the one starting nearest
+        # below a total need not reach it while a wider one does
+        covered = (self.starts[None, :] <= totals[:, None]) & (totals[:, None] <= self.ends[None, :])
+        # Ranges are sorted by (min_minutes, max_minutes); the last covering one is the highest tier
+        last = len(self.starts) - 1 - covered[:, ::-1].argmax(axis=1)
+        return np.where(covered.any(axis=1), last, -1)
+
+    def code_columns(self, totals):
+        """billing_code_id, billing_code and billing_code_description for each total"""
+        positions = self.assign(totals)
+        picked = self.codes.reindex(positions).reset_index(drop=True)
+        return pd.DataFrame({
+            'billing_code_id': picked['code_id'].astype('Int64'),
+            'billing_code': picked['billing_code'],
+            'billing_code_description': picked['description'],
+        })
+
+
+def monthly_totals(conn):
+    """Minutes per (coordinator, patient, month) from coordinator_tasks, with display names"""
+    return pd.read_sql_query("""
+        SELECT
+            t.coordinator_id,
+            COALESCE(u.first_name || ' ' || u.last_name, CAST(t.coordinator_id AS TEXT)) AS coordinator_name,
+            t.patient_id,
+            COALESCE(p.first_name || ' ' || p.last_name, t.patient_id) AS patient_name,
+            t.year,
+            t.month,
+            t.total_minutes
+        FROM (
+            SELECT
+                CAST(ct.coordinator_id AS INTEGER) AS coordinator_id,
+                ct.patient_id,
+                CAST(strftime('%Y', ct.task_date_iso) AS INTEGER) AS year,
+                CAST(strftime('%m', ct.task_date_iso) AS INTEGER) AS month,
+                SUM(ct.duration_minutes) AS total_minutes
+            FROM coordinator_tasks ct
+            -- task_date_iso is the normalized copy of task_date (see database.migrate_task_date_iso)
+            WHERE ct.task_date_iso IS NOT NULL
+                AND ct.coordinator_id GLOB '[0-9]*'
+                AND ct.patient_id IS NOT NULL
+                AND ct.duration_minutes IS NOT NULL
+            GROUP BY CAST(ct.coordinator_id AS INTEGER), ct.patient_id, strftime('%Y-%m', ct.task_date_iso)
+        ) t
+        LEFT JOIN coordinators c ON t.coordinator_id = c.coordinator_id
+        LEFT JOIN users u ON c.user_id = u.user_id
+        LEFT JOIN patients p ON t.patient_id = p.patient_id
+    """, conn)
+
+
+def build_monthly_summary(conn, intervals=None):
+    """coordinator_monthly_summary rows with billing codes assigned"""
+    intervals = intervals or BillingCodeIntervals(load_billing_codes(conn))
+    totals = monthly_totals(conn)
+    summary = pd.concat([totals.reset_index(drop=True), intervals.code_columns(totals['total_minutes'])], axis=1)
+    return summary[SUMMARY_COLUMNS]
+
+
+def save_monthly_summary(conn, summary):
+    """Upsert summary rows and drop groups that no longer exist, in one transaction"""
+    columns = ', '.join(SUMMARY_COLUMNS)
+    rows = [
+        tuple(None if pd.isna(value) else value for value in row)
+        for row in summary.astype(object).itertuples(index=False, name=None)
+    ]
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS temp.coordinator_monthly_summary_stage")
+        conn.execute(f"CREATE TEMP TABLE coordinator_monthly_summary_stage AS SELECT {columns} FROM coordinator_monthly_summary WHERE 0")
+        conn.executemany(
+            f"INSERT INTO temp.coordinator_monthly_summary_stage ({columns}) VALUES ({', '.join('?' * len(SUMMARY_COLUMNS))})",
+            rows
+        )
+        changed = conn.execute(f"""
+            INSERT INTO coordinator_monthly_summary ({columns})
+            SELECT {columns} FROM temp.coordinator_monthly_summary_stage WHERE true
+            ON CONFLICT (coordinator_id, patient_id, year, month) DO UPDATE SET
+                coordinator_name = excluded.coordinator_name,
+                patient_name = excluded.patient_name,
+                total_minutes = excluded.total_minutes,
+                billing_code_id = excluded.billing_code_id,
+                billing_code = excluded.billing_code,
+                billing_code_description = excluded.billing_code_description,
+                updated_date = CURRENT_TIMESTAMP
+            WHERE coordinator_monthly_summary.total_minutes IS NOT excluded.total_minutes
+                OR coordinator_monthly_summary.billing_code_id IS NOT excluded.billing_code_id
+                OR coordinator_monthly_summary.coordinator_name IS NOT excluded.coordinator_name
+                OR coordinator_monthly_summary.patient_name IS NOT excluded.patient_name
+        """).rowcount
+        removed = conn.execute("""
+            DELETE FROM coordinator_monthly_summary
+            WHERE NOT EXISTS (
+                SELECT 1 FROM temp.coordinator_monthly_summary_stage s
+                WHERE s.coordinator_id = coordinator_monthly_summary.coordinator_id
+                    AND s.patient_id = coordinator_monthly_summary.patient_id
+                    AND s.year = coordinator_monthly_summary.year
+                    AND s.month = coordinator_monthly_summary.month
+            )
+        """).rowcount
+        conn.execute("DROP TABLE temp.coordinator_monthly_summary_stage")
+    return {'rows': len(rows), 'written': changed, 'removed': removed}
+
+
+def populate_coordinator_monthly_summary(db_path=DB_PATH):
+    """Recompute coordinator_monthly_summary with billing codes; returns counts"""
+    initialize_database(db_path, start_checkpointer=False)
+    conn = sqlite3.connect(db_path)
+    try:
+        codes = load_billing_codes(conn)
+        for problem in check_billing_ranges(codes):
+            logger.warning(f"Billing code ranges: {problem}")
+        summary = build_monthly_summary(conn, BillingCodeIntervals(codes))
+        unassigned = int(summary['billing_code_id'].isna().sum())
+        counts = save_monthly_summary(conn, summary)
+        counts['unassigned'] = unassigned
+        logger.info(f"coordinator_monthly_summary: {counts['rows']} groups, {counts['written']} written, "
+                    f"{counts['removed']} removed, {unassigned} without a billing code")
+        return counts
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    db_path = args[0] if args else DB_PATH
+    if '--check' in sys.argv:
+        conn = sqlite3.connect(db_path)
+        problems = check_billing_ranges(load_billing_codes(conn))
+        conn.close()
+        print("\n".join(problems) if problems else "Billing code ranges are contiguous and non-overlapping")
+    else:
+        populate_coordinator_monthly_summary(db_path)
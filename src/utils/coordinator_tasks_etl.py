@@ -0,0 +1,175 @@
+"""
+Incremental ETL from SOURCE_COORDINATOR_TASKS_HISTORY into coordinator_tasks.
+
+Replaces the full reload in src/sql/populate_coordinator_tasks.sql. The source
+table is streamed in rowid order, CHUNK_SIZE rows at a time. Patients are
+resolved in batches through the patient identity index (patient_identity.py)
+and staff codes through staff_code_mapping -> coordinators. Each chunk is written
+with executemany in its own transaction together with the new watermark, so
+an interrupted run resumes where it stopped and reruns only load source rows
+added since the last run. Rows whose patient or staff member cannot be
+resolved go to unmatched_tasks_analysis instead of coordinator_tasks.
+task_date_iso is computed while reading and inserted with the row, and the
+database is prepared with database.initialize_database first, so the column
+and its migrations exist even if the app has never opened the file.
+
+Usage:
+    python -m src.utils.coordinator_tasks_etl [db_path] [--full]
+"""
+
+import sqlite3
+import sys
+import time
+
+from src.database import initialize_database, iso_date_sql
+from src.utils.patient_identity import PatientIdentityResolver, build_identity_index, name_key, parse_name
+
+DB_PATH = 'production.db'
+SOURCE_TABLE = 'SOURCE_COORDINATOR_TASKS_HISTORY'
+PIPELINE_NAME = 'coordinator_tasks'
+
+# Source rows read and written per transaction
+CHUNK_SIZE = 5000
+
+
+def ensure_watermark_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS etl_watermarks (
+            pipeline TEXT PRIMARY KEY,
+            source_table TEXT NOT NULL,
+            last_rowid INTEGER NOT NULL DEFAULT 0,
+            rows_loaded INTEGER NOT NULL DEFAULT 0,
+            rows_unmatched INTEGER NOT NULL DEFAULT 0,
+            updated_date TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+
+
+def get_watermark(conn, pipeline=PIPELINE_NAME):
+    row = conn.execute("SELECT last_rowid FROM etl_watermarks WHERE pipeline = ?", (pipeline,)).fetchone()
+    return row[0] if row else 0
+
+
+def set_watermark(conn, last_rowid, loaded, unmatched, pipeline=PIPELINE_NAME, source_table=SOURCE_TABLE):
+    """Advance the watermark; call inside the transaction that wrote the chunk"""
+    conn.execute("""
+        INSERT INTO etl_watermarks (pipeline, source_table, last_rowid, rows_loaded, rows_unmatched, updated_date)
+        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(pipeline) DO UPDATE SET
+            last_rowid = excluded.last_rowid,
+            rows_loaded = rows_loaded + excluded.rows_loaded,
+            rows_unmatched = rows_unmatched + excluded.rows_unmatched,
+            updated_date = CURRENT_TIMESTAMP
+    """, (pipeline, source_table, last_rowid, loaded, unmatched))
+
+
+def build_staff_index(conn):
+    """staff_code -> coordinator_id"""
+    return {
+        staff_code: coordinator_id
+        for staff_code, coordinator_id in conn.execute("""
+            SELECT scm.staff_code, c.coordinator_id
+            FROM staff_code_mapping scm
+            JOIN coordinators c ON scm.user_id = c.user_id
+        """)
+    }
+
+
+def is_blank(value):
+    return value is None or str(value).strip() == ''
+
+
+def transform_chunk(rows, resolver, staff_index):
+    """Split a chunk of source rows into coordinator_tasks and unmatched_tasks_analysis params"""
+    tasks, unmatched = [], []
+    # Same validity rules as the SQL loader: incomplete rows are not tasks
+    valid = [row for row in rows
+             if not (is_blank(row[2]) or is_blank(row[1]) or is_blank(row[4]) or row[6] is None)]
+    skipped = len(rows) - len(valid)
+    patients = resolver.resolve_many([row[2] for row in valid])
+    for _, staff, pt_name, task_type, task_date, notes, minutes, task_date_iso in valid:
+        patient_id = patients[pt_name][0]
+        coordinator_id = staff_index.get(staff)
+        if patient_id is None or coordinator_id is None:
+            reason = 'missing_patient' if patient_id is None else 'missing_staff'
+            cleaned = name_key(*parse_name(pt_name))
+            unmatched.append((SOURCE_TABLE, pt_name, cleaned, staff, 'coordinator', task_date, task_type, notes, reason))
+            continue
+        tasks.append((patient_id, coordinator_id, task_date, minutes, task_type, notes, task_date_iso))
+    return tasks, unmatched, skipped
+
+
+def stream_source(conn, after_rowid, chunk_size=CHUNK_SIZE):
+    """Yield chunks of source rows with rowid > after_rowid, in rowid order"""
+    while True:
+        rows = conn.execute(f"""
+            SELECT rowid, "Staff", "Pt Name", "Type", "Date Only", "Notes", "Mins B",
+                {iso_date_sql('"Date Only"')}
+            FROM "{SOURCE_TABLE}"
+            WHERE rowid > ?
+            ORDER BY rowid
+            LIMIT ?
+        """, (after_rowid, chunk_size)).fetchall()
+        if not rows:
+            return
+        yield rows
+        after_rowid = rows[-1][0]
+
+
+def reset(conn):
+    """Forget previous loads so the next run reloads all history"""
+    with conn:
+        conn.execute("DELETE FROM coordinator_tasks")
+        conn.execute("DELETE FROM unmatched_tasks_analysis WHERE source_table = ?", (SOURCE_TABLE,))
+        conn.execute("DELETE FROM etl_watermarks WHERE pipeline = ?", (PIPELINE_NAME,))
+
+
+def run_etl(db_path=DB_PATH, full=False, chunk_size=CHUNK_SIZE):
+    """Load new source rows; returns a dict of row counts"""
+    started = time.perf_counter()
+    initialize_database(db_path, start_checkpointer=False)
+    conn = sqlite3.connect(db_path)
+    try:
+        ensure_watermark_table(conn)
+        if full:
+            reset(conn)
+        watermark = get_watermark(conn)
+        build_identity_index(conn)
+        resolver = PatientIdentityResolver(conn)
+        staff_index = build_staff_index(conn)
+        print(f"Resuming after source rowid {watermark}; {len(resolver)} patient keys, {len(staff_index)} staff codes indexed")
+
+        totals = {'read': 0, 'loaded': 0, 'unmatched': 0, 'skipped': 0}
+        for rows in stream_source(conn, watermark, chunk_size):
+            tasks, unmatched, skipped = transform_chunk(rows, resolver, staff_index)
+            with conn:
+                conn.executemany("""
+                    INSERT INTO coordinator_tasks
+                        (patient_id, coordinator_id, task_date, duration_minutes, task_type, notes, task_date_iso)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, tasks)
+                conn.executemany("""
+                    INSERT INTO unmatched_tasks_analysis (
+                        source_table, patient_name_raw, patient_name_cleaned, staff_name, staff_type,
+                        task_date, task_type, notes, reason_unmatched
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, unmatched)
+                set_watermark(conn, rows[-1][0], len(tasks), len(unmatched))
+            totals['read'] += len(rows)
+            totals['loaded'] += len(tasks)
+            totals['unmatched'] += len(unmatched)
+            totals['skipped'] += skipped
+            print(f"  through rowid {rows[-1][0]}: {len(tasks)} loaded, {len(unmatched)} unmatched, {skipped} skipped")
+
+        totals['seconds'] = round(time.perf_counter() - started, 2)
+        print(f"Done: {totals['read']} read, {totals['loaded']} loaded, {totals['unmatched']} unmatched, "
+              f"{totals['skipped']} skipped in {totals['seconds']}s")
+        return totals
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    run_etl(args[0] if args else DB_PATH, full='--full' in sys.argv)
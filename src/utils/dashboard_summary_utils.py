@@ -1,25 +1,74 @@
 """
 Utility scripts for creating and refreshing dashboard summary tables
 in production.db without deleting or overwriting non-dashboard tables.
+
+Monthly rollups group on the task tables' task_date_iso column. connect()
+runs database.initialize_database first, so the column, its triggers and the
+sql/migrations exist even on a file the app has never opened.
 """
 
 import sqlite3
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import logging
 
+from src.database import initialize_database
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Summary tables that support incremental refresh. key_columns identify a
+# summary row; key_exprs compute the same key from a row of the source table
+# (aliased as in the refresh query).
+INCREMENTAL_SOURCES = {
+    "dashboard_provider_monthly_summary": {
+        "table": "provider_tasks",
+        "alias": "pt",
+        "key_columns": ("provider_id", "month", "year"),
+        "key_exprs": (
+            "pt.provider_id",
+            "CAST(strftime('%m', pt.task_date_iso) AS INTEGER)",
+            "CAST(strftime('%Y', pt.task_date_iso) AS INTEGER)",
+        ),
+    },
+    "dashboard_coordinator_monthly_summary": {
+        "table": "coordinator_tasks",
+        "alias": "ct",
+        "key_columns": ("coordinator_id", "month", "year"),
+        "key_exprs": (
+            "CAST(ct.coordinator_id AS INTEGER)",
+            "CAST(strftime('%m', ct.task_date_iso) AS INTEGER)",
+            "CAST(strftime('%Y', ct.task_date_iso) AS INTEGER)",
+        ),
+    },
+}
+
+# Source tables each summary is aggregated from. A summary that reads another
+# dashboard summary is refreshed after that summary has been written.
+SUMMARY_DEPENDENCIES = {
+    "dashboard_provider_monthly_summary": ("provider_tasks",),
+    "dashboard_coordinator_monthly_summary": ("coordinator_tasks",),
+    "dashboard_patient_assignment_summary": ("user_patient_assignments", "patient_assignments", "coordinator_tasks", "patients"),
+    "dashboard_task_summary": ("provider_tasks", "task_definitions"),
+    "dashboard_region_patient_assignment_summary": ("regions", "patient_assignments", "patients", "coordinator_tasks"),
+}
+
+# Aggregates are computed on worker threads; sqlite3 releases the GIL while a query runs
+REFRESH_MAX_WORKERS = os.cpu_count() or 4
+
 class DashboardSummaryUtils:
     def __init__(self, db_path='production.db'):
         self.db_path = db_path
         self.connection = None
+        self.last_refresh_timings = {}
     
     def connect(self):
         """Establish database connection"""
         try:
+            initialize_database(self.db_path, start_checkpointer=False)
             self.connection = sqlite3.connect(self.db_path)
             self.connection.row_factory = sqlite3.Row  # Enable column access by name
             return True
@@ -156,86 +205,307 @@ class DashboardSummaryUtils:
             logger.error(f"Error creating dashboard tables: {e}")
             return False
     
-    def refresh_dashboard_table(self, table_name):
-        """Refresh a specific dashboard table with current data"""
+    def _summary_queries(self):
+        """Map each refreshable summary table to the builder of its aggregate query"""
+        return {
+            "dashboard_provider_monthly_summary": self._provider_monthly_summary_query,
+            "dashboard_coordinator_monthly_summary": self._coordinator_monthly_summary_query,
+            "dashboard_patient_assignment_summary": self._patient_assignment_summary_query,
+            "dashboard_task_summary": self._task_summary_query,
+            "dashboard_region_patient_assignment_summary": self._region_patient_assignment_summary_query
+        }
+    
+    def refresh_dashboard_table(self, table_name, incremental=False):
+        """Refresh a specific dashboard table with current data.
+
+        With incremental=True, tables listed in INCREMENTAL_SOURCES only
+        re-aggregate the groups touched by source rows added since the last
+        refresh (tracked by rowid in summary_refresh_watermarks). Other tables,
+        tables that have never been refreshed, and sources that lost rows at
+        or below the watermark (e.g. an ETL --full reload) get a full rebuild.
+        """
         if not self.connection:
             self.connect()
         
+        if table_name not in self._summary_queries():
+            logger.warning(f"No refresh function defined for table: {table_name}")
+            return False
+        
         try:
-            cursor = self.connection.cursor()
-            
-            # Clear existing data for this table
-            cursor.execute(f"DELETE FROM {table_name}")
-            
-            # Generate and execute appropriate refresh query based on table name
-            refresh_queries = {
-                "dashboard_provider_monthly_summary": self._refresh_provider_monthly_summary,
-                "dashboard_coordinator_monthly_summary": self._refresh_coordinator_monthly_summary,
-                "dashboard_patient_assignment_summary": self._refresh_patient_assignment_summary,
-                "dashboard_task_summary": self._refresh_task_summary,
-                "dashboard_region_patient_assignment_summary": self._refresh_region_patient_assignment_summary
-            }
-            
-            if table_name in refresh_queries:
-                refresh_queries[table_name](cursor)
-                self.connection.commit()
-                logger.info(f"Successfully refreshed {table_name}")
-                return True
-            else:
-                logger.warning(f"No refresh function defined for table: {table_name}")
-                return False
+            result = self._compute_summary(self.connection, table_name, incremental)
+            self._apply_summary(self.connection.cursor(), result)
+            self.connection.commit()
+            logger.info(f"Successfully refreshed {table_name}")
+            return True
                 
         except sqlite3.Error as e:
+            self.connection.rollback()
             logger.error(f"Error refreshing {table_name}: {e}")
             return False
     
-    def refresh_all_dashboard_tables(self):
-        """Refresh all dashboard summary tables"""
+    def _compute_summary(self, conn, table_name, incremental=False):
+        """Run a summary's aggregate query (read-only) and return the rows to write.
+
+        groups is None for a full rebuild, otherwise the summary keys whose
+        rows are replaced.
+        """
+        started = time.perf_counter()
+        source = INCREMENTAL_SOURCES.get(table_name)
+        watermark = None
+        groups = None
+        group_filter = ""
+        params = ()
+        
+        rows_at_mark = None
+        
+        if source:
+            watermark, rows_at_mark = conn.execute(f"SELECT MAX(rowid), COUNT(*) FROM {source['table']}").fetchone()
+            watermark = watermark or 0
+            last_mark, last_rows = self._get_watermark(conn, table_name) if incremental else (None, None)
+            # Groups that only lost rows never show up above the watermark, so
+            # any deletion at or below it forces a full rebuild
+            unchanged_below_mark = False
+            if last_mark is not None and last_rows is not None:
+                rows_below_mark = conn.execute(
+                    f"SELECT COUNT(*) FROM {source['table']} WHERE rowid <= ?", (last_mark,)
+                ).fetchone()[0]
+                unchanged_below_mark = rows_below_mark == last_rows
+            if watermark >= (last_mark or 0) and unchanged_below_mark:
+                alias = source['alias']
+                key_exprs = ", ".join(source['key_exprs'])
+                groups_sql = f"""
+                    SELECT DISTINCT {key_exprs}
+                    FROM {source['table']} {alias}
+                    WHERE {alias}.rowid > ? AND {alias}.rowid <= ?
+                """
+                params = (last_mark, watermark)
+                groups = [tuple(row) for row in conn.execute(groups_sql, params).fetchall()]
+                group_filter = f"AND ({key_exprs}) IN ({groups_sql})"
+        
+        columns, query = self._summary_queries()[table_name](group_filter)
+        if groups == []:
+            rows = []  # nothing new since the last refresh
+        else:
+            rows = [tuple(row) for row in conn.execute(query, params).fetchall()]
+        
+        return {
+            'table': table_name,
+            'columns': columns,
+            'rows': rows,
+            'groups': groups,
+            'watermark': watermark,
+            'rows_at_mark': rows_at_mark,
+            'compute_seconds': time.perf_counter() - started,
+        }
+    
+    def _apply_summary(self, cursor, result):
+        """Write a computed summary using the caller's transaction"""
+        table_name = result['table']
+        
+        if result['groups'] is None:
+            cursor.execute(f"DELETE FROM {table_name}")
+        elif result['groups']:
+            key_columns = INCREMENTAL_SOURCES[table_name]['key_columns']
+            placeholders = ", ".join("?" for _ in key_columns)
+            cursor.executemany(
+                f"DELETE FROM {table_name} WHERE ({', '.join(key_columns)}) = ({placeholders})",
+                result['groups']
+            )
+        
+        if result['rows']:
+            placeholders = ", ".join("?" for _ in result['columns'])
+            cursor.executemany(
+                f"INSERT INTO {table_name} ({', '.join(result['columns'])}) VALUES ({placeholders})",
+                result['rows']
+            )
+        
+        if result['watermark'] is not None:
+            self._ensure_watermark_table(cursor)
+            self._set_watermark(cursor, table_name, INCREMENTAL_SOURCES[table_name]['table'],
+                                result['watermark'], result['rows_at_mark'])
+    
+    def _ensure_watermark_table(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS summary_refresh_watermarks (
+                table_name TEXT PRIMARY KEY,
+                source_table TEXT NOT NULL,
+                last_rowid INTEGER NOT NULL,
+                rows_at_mark INTEGER,
+                updated_date TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(summary_refresh_watermarks)")}
+        if 'rows_at_mark' not in columns:
+            # Watermarks saved before rows_at_mark existed read as unknown, forcing one full rebuild
+            cursor.execute("ALTER TABLE summary_refresh_watermarks ADD COLUMN rows_at_mark INTEGER")
+    
+    def _get_watermark(self, conn, table_name):
+        """(highest source rowid folded into a summary table, source row count at that point), or Nones"""
+        try:
+            row = conn.execute(
+                "SELECT last_rowid, rows_at_mark FROM summary_refresh_watermarks WHERE table_name = ?", (table_name,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None, None  # watermark table not created yet, or from before rows_at_mark
+        return tuple(row) if row else (None, None)
+    
+    def _set_watermark(self, cursor, table_name, source_table, last_rowid, rows_at_mark):
+        cursor.execute("""
+            INSERT INTO summary_refresh_watermarks (table_name, source_table, last_rowid, rows_at_mark, updated_date)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(table_name) DO UPDATE SET
+                source_table = excluded.source_table,
+                last_rowid = excluded.last_rowid,
+                rows_at_mark = excluded.rows_at_mark,
+                updated_date = excluded.updated_date
+        """, (table_name, source_table, last_rowid, rows_at_mark))
+    
+    def refresh_all_dashboard_tables(self, incremental=False, max_workers=None):
+        """Refresh all dashboard summary tables.
+
+        Aggregates are computed concurrently, each on its own read connection,
+        then written through this connection in one transaction per dependency
+        level (a single transaction unless a summary reads another summary).
+        Per-table timings are logged and kept in self.last_refresh_timings.
+        """
         if not self.connection:
             self.connect()
         
         dashboard_tables = self.get_dashboard_tables()
         logger.info(f"Refreshing {len(dashboard_tables)} dashboard tables")
         
-        success_count = 0
+        summary_queries = self._summary_queries()
+        refreshable = [table for table in dashboard_tables if table in summary_queries]
         for table_name in dashboard_tables:
-            if self.refresh_dashboard_table(table_name):
-                success_count += 1
+            if table_name not in summary_queries:
+                logger.warning(f"No refresh function defined for table: {table_name}")
+        
+        self.last_refresh_timings = {}
+        started = time.perf_counter()
+        success_count = 0
+        for level in self._refresh_levels(refreshable):
+            results = self._compute_summaries(level, incremental, max_workers)
+            success_count += self._apply_summaries(results)
         
-        logger.info(f"Successfully refreshed {success_count}/{len(dashboard_tables)} dashboard tables")
+        logger.info(f"Successfully refreshed {success_count}/{len(dashboard_tables)} dashboard tables "
+                    f"in {time.perf_counter() - started:.2f}s")
         return success_count == len(dashboard_tables)
     
-    def _refresh_provider_monthly_summary(self, cursor):
-        """Refresh provider monthly summary table"""
+    def _refresh_levels(self, tables):
+        """Group tables so each one comes after the summaries it reads from"""
+        remaining = list(tables)
+        while remaining:
+            ready = [table for table in remaining
+                     if not any(source in remaining for source in SUMMARY_DEPENDENCIES.get(table, ()))]
+            if not ready:
+                logger.warning(f"Circular summary dependencies among {remaining}; refreshing them together")
+                ready = remaining
+            yield ready
+            remaining = [table for table in remaining if table not in ready]
+    
+    def _compute_summaries(self, tables, incremental=False, max_workers=None):
+        """Compute several summaries concurrently on separate read connections"""
+        def compute(table_name):
+            conn = sqlite3.connect(self.db_path)
+            try:
+                return self._compute_summary(conn, table_name, incremental)
+            finally:
+                conn.close()
+        
+        results = []
+        with ThreadPoolExecutor(max_workers=max_workers or REFRESH_MAX_WORKERS) as executor:
+            futures = {executor.submit(compute, table_name): table_name for table_name in tables}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except sqlite3.Error as e:
+                    logger.error(f"Error computing {futures[future]}: {e}")
+        return results
+    
+    def _apply_summaries(self, results):
+        """Write computed summaries in one transaction; returns how many were applied"""
+        cursor = self.connection.cursor()
+        applied = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for result in results:
+                table_name = result['table']
+                started = time.perf_counter()
+                # A savepoint per table keeps one bad summary from discarding the rest
+                cursor.execute("SAVEPOINT summary_refresh")
+                try:
+                    self._apply_summary(cursor, result)
+                    cursor.execute("RELEASE summary_refresh")
+                except sqlite3.Error as e:
+                    cursor.execute("ROLLBACK TO summary_refresh")
+                    cursor.execute("RELEASE summary_refresh")
+                    logger.error(f"Error refreshing {table_name}: {e}")
+                    continue
+                self.last_refresh_timings[table_name] = {
+                    'rows': len(result['rows']),
+                    'compute_seconds': result['compute_seconds'],
+                    'apply_seconds': time.perf_counter() - started,
+                }
+                applied.append(table_name)
+            self.connection.commit()
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            for table_name in applied:
+                self.last_refresh_timings.pop(table_name, None)
+            logger.error(f"Error writing dashboard summaries: {e}")
+            return 0
+        
+        for table_name in applied:
+            timing = self.last_refresh_timings[table_name]
+            logger.info(f"Refreshed {table_name}: {timing['rows']} rows, computed in "
+                        f"{timing['compute_seconds']:.2f}s, written in {timing['apply_seconds']:.2f}s")
+        return len(applied)
+    
+    def _provider_monthly_summary_query(self, group_filter=""):
+        """Aggregate query for the provider monthly summary table"""
+        columns = (
+            'provider_id',
+            'month',
+            'year',
+            'total_tasks_completed',
+            'total_time_spent_minutes',
+            'average_task_completion_time_minutes',
+            'total_patients_served',
+            'patients_assigned',
+        )
         query = """
-        INSERT INTO dashboard_provider_monthly_summary 
-        (provider_id, month, year, total_tasks_completed, total_time_spent_minutes, 
-         average_task_completion_time_minutes, total_patients_served, patients_assigned)
         SELECT 
             pt.provider_id,
-            strftime('%m', pt.task_date) as month,
-            strftime('%Y', pt.task_date) as year,
+            CAST(strftime('%m', pt.task_date_iso) AS INTEGER) as month,
+            CAST(strftime('%Y', pt.task_date_iso) AS INTEGER) as year,
             COUNT(*) as total_tasks_completed,
             SUM(pt.minutes_of_service) as total_time_spent_minutes,
             AVG(pt.minutes_of_service) as average_task_completion_time_minutes,
             COUNT(DISTINCT pt.patient_id) as total_patients_served,
             COUNT(DISTINCT pt.patient_id) as patients_assigned
         FROM provider_tasks pt
-        WHERE pt.task_date IS NOT NULL AND pt.task_date != ''
-        GROUP BY pt.provider_id, strftime('%m', pt.task_date), strftime('%Y', pt.task_date)
-        """
-        cursor.execute(query)
+        WHERE pt.task_date_iso IS NOT NULL
+        {group_filter}
+        GROUP BY pt.provider_id, strftime('%Y-%m', pt.task_date_iso)
+        """.format(group_filter=group_filter)
+        return columns, query
     
-    def _refresh_coordinator_monthly_summary(self, cursor):
-        """Refresh coordinator monthly summary table"""
+    def _coordinator_monthly_summary_query(self, group_filter=""):
+        """Aggregate query for the coordinator monthly summary table"""
+        columns = (
+            'coordinator_id',
+            'month',
+            'year',
+            'total_minutes',
+            'total_minutes_per_patient',
+            'total_tasks_completed',
+            'average_daily_tasks',
+        )
         query = """
-        INSERT INTO dashboard_coordinator_monthly_summary 
-        (coordinator_id, month, year, total_minutes, total_minutes_per_patient, 
-         total_tasks_completed, average_daily_tasks)
         SELECT 
             CAST(ct.coordinator_id AS INTEGER) as coordinator_id,
-            CAST(SUBSTR(ct.task_date, 1, INSTR(ct.task_date, '/') - 1) AS INTEGER) as month,
-            CAST('20' || SUBSTR(ct.task_date, -2) AS INTEGER) as year,
+            CAST(strftime('%m', ct.task_date_iso) AS INTEGER) as month,
+            CAST(strftime('%Y', ct.task_date_iso) AS INTEGER) as year,
             SUM(ct.duration_minutes) as total_minutes,
             CASE 
                 WHEN COUNT(DISTINCT ct.patient_id) > 0 
@@ -245,23 +515,32 @@ class DashboardSummaryUtils:
             COUNT(*) as total_tasks_completed,
             COUNT(*) * 1.0 / 30.0 as average_daily_tasks
         FROM coordinator_tasks ct
-        WHERE ct.task_date IS NOT NULL AND ct.task_date != ''
+        WHERE ct.task_date_iso IS NOT NULL
         AND ct.coordinator_id IS NOT NULL AND ct.coordinator_id != ''
         AND ct.coordinator_id GLOB '[0-9]*'
         AND ct.duration_minutes IS NOT NULL AND ct.duration_minutes > 0
+        {group_filter}
         GROUP BY 
             CAST(ct.coordinator_id AS INTEGER),
-            CAST(SUBSTR(ct.task_date, 1, INSTR(ct.task_date, '/') - 1) AS INTEGER),
-            CAST('20' || SUBSTR(ct.task_date, -2) AS INTEGER)
+            strftime('%Y-%m', ct.task_date_iso)
         HAVING coordinator_id IS NOT NULL AND coordinator_id > 0
-        """
+        """.format(group_filter=group_filter)
+        return columns, query
     
-    def _refresh_patient_assignment_summary(self, cursor):
-        """Refresh patient assignment summary table"""
+    def _patient_assignment_summary_query(self, group_filter=""):
+        """Aggregate query for the patient assignment summary table"""
+        columns = (
+            'user_id',
+            'patient_id',
+            'patient_name',
+            'year',
+            'month',
+            'total_minutes',
+            'billing_code_id',
+            'billing_code',
+            'billing_code_description',
+        )
         query = """
-        INSERT INTO dashboard_patient_assignment_summary 
-        (user_id, patient_id, patient_name, year, month, total_minutes, 
-         billing_code_id, billing_code, billing_code_description)
         SELECT 
             upa.user_id,
             upa.patient_id,
@@ -280,32 +559,44 @@ class DashboardSummaryUtils:
         GROUP BY upa.user_id, upa.patient_id, p.first_name, p.last_name, 
                  strftime('%Y', pa.assignment_date), strftime('%m', pa.assignment_date)
         """
-        cursor.execute(query)
+        return columns, query
     
-    def _refresh_task_summary(self, cursor):
-        """Refresh task summary table"""
+    def _task_summary_query(self, group_filter=""):
+        """Aggregate query for the task summary table"""
+        columns = (
+            'task_category',
+            'total_tasks',
+            'total_minutes',
+            'average_minutes_per_task',
+            'year',
+            'month',
+        )
         query = """
-        INSERT INTO dashboard_task_summary 
-        (task_category, total_tasks, total_minutes, average_minutes_per_task, year, month)
         SELECT 
             td.task_category,
             COUNT(*) as total_tasks,
             SUM(pt.minutes_of_service) as total_minutes,
             AVG(pt.minutes_of_service) as average_minutes_per_task,
-            strftime('%Y', pt.task_date) as year,
-            strftime('%m', pt.task_date) as month
+            CAST(strftime('%Y', pt.task_date_iso) AS INTEGER) as year,
+            CAST(strftime('%m', pt.task_date_iso) AS INTEGER) as month
         FROM provider_tasks pt
         JOIN task_definitions td ON pt.task_definition_id = td.task_definition_id
-        WHERE pt.task_date IS NOT NULL AND pt.task_date != ''
-        GROUP BY td.task_category, strftime('%Y', pt.task_date), strftime('%m', pt.task_date)
+        WHERE pt.task_date_iso IS NOT NULL
+        GROUP BY td.task_category, strftime('%Y-%m', pt.task_date_iso)
         """
-        cursor.execute(query)
+        return columns, query
     
-    def _refresh_region_patient_assignment_summary(self, cursor):
-        """Refresh region patient assignment summary table"""
+    def _region_patient_assignment_summary_query(self, group_filter=""):
+        """Aggregate query for the region patient assignment summary table"""
+        columns = (
+            'region_id',
+            'patient_id',
+            'patient_name',
+            'year',
+            'month',
+            'total_minutes',
+        )
         query = """
-        INSERT INTO dashboard_region_patient_assignment_summary 
-        (region_id, patient_id, patient_name, year, month, total_minutes)
         SELECT 
             r.region_id,
             p.patient_id,
@@ -321,7 +612,7 @@ class DashboardSummaryUtils:
         GROUP BY r.region_id, p.patient_id, p.first_name, p.last_name, 
                  strftime('%Y', pa.assignment_date), strftime('%m', pa.assignment_date)
         """
-        cursor.execute(query)
+        return columns, query
     
     def get_table_info(self, table_name):
         """Get information about a specific table"""
@@ -0,0 +1,219 @@
+"""
+Index advisor for the dashboard query set.
+
+Replays every SQL statement embedded in src/database.py, src/utils and
+src/dashboards under EXPLAIN QUERY PLAN, reports full table scans and temp
+B-trees, and can write the indexes that would remove the scans as the next
+versioned migration in sql/migrations (applied by database.initialize_database).
+
+Usage:
+    python src/utils/index_advisor.py [db_path] [--write-migration]
+"""
+
+import ast
+import glob
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime
+
+DB_PATH = 'production.db'
+SOURCE_GLOBS = ('src/database.py', 'src/utils/*.py', 'src/dashboards/*.py')
+MIGRATIONS_DIR = os.path.join('sql', 'migrations')
+
+# Most columns worth putting in one suggested index
+MAX_INDEX_COLUMNS = 3
+
+SQL_START = re.compile(r'^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+TABLE_REF = re.compile(
+    r'\b(?:FROM|JOIN)\s+"?(\w+)"?'
+    r'(?:\s+(?:AS\s+)?(?!(?:ON|WHERE|JOIN|LEFT|INNER|CROSS|GROUP|ORDER|LIMIT|USING|SET|VALUES)\b)(\w+))?',
+    re.IGNORECASE
+)
+SQL_KEYWORDS = {'select', 'from', 'where', 'and', 'or', 'not', 'null', 'is', 'in', 'on', 'as', 'case', 'when', 'then', 'else', 'end'}
+
+
+def extract_statements(patterns=SOURCE_GLOBS):
+    """Collect SQL string literals from the app's Python sources"""
+    statements = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            if os.path.abspath(path) == os.path.abspath(__file__):
+                continue
+            with open(path, encoding='utf-8') as f:
+                try:
+                    tree = ast.parse(f.read(), filename=path)
+                except SyntaxError as e:
+                    print(f"Skipping {path}: {e}")
+                    continue
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Constant) and isinstance(node.value, str) and SQL_START.match(node.value):
+                    # str.format() templates: drop optional fragments such as {group_filter}
+                    sql = re.sub(r'\{\w+\}', '', node.value)
+                    statements.append({'file': path, 'line': node.lineno, 'sql': sql.strip()})
+    return statements
+
+
+def explain(conn, sql):
+    """Return EXPLAIN QUERY PLAN rows for a statement, binding NULL to every parameter"""
+    named = re.findall(r':(\w+)', sql)
+    params = {name: None for name in named} if named else [None] * sql.count('?')
+    return conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+
+
+def analyze_plan(plan):
+    """Flag full scans, temp B-trees and automatic indexes in a query plan"""
+    findings = []
+    for row in plan:
+        detail = row[3]
+        if detail.startswith('SCAN ') and 'INDEX' not in detail:
+            findings.append(('full scan', detail[len('SCAN '):].split()[0]))
+        elif 'AUTOMATIC' in detail and 'INDEX' in detail:
+            findings.append(('automatic index', detail.split()[1]))
+        elif detail.startswith('USE TEMP B-TREE'):
+            findings.append(('temp b-tree', detail[len('USE TEMP B-TREE FOR '):]))
+    return findings
+
+
+def table_columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+
+
+def leading_index_columns(conn, table):
+    """First column of every index already on a table"""
+    leading = set()
+    for index in conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+        columns = conn.execute(f'PRAGMA index_info("{index[1]}")').fetchall()
+        if columns:
+            leading.add(columns[0][2])
+    return leading
+
+
+def suggest_index(conn, sql, name):
+    """Guess an index for a scanned table from the predicates that touch it.
+
+    Equality and IN predicates come first, range predicates last. Returns
+    (table, columns) or None when the scan has nothing to seek on.
+    """
+    aliases = {}
+    for table, alias in TABLE_REF.findall(sql):
+        aliases[table] = table
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    table = aliases.get(name, name)
+    if table.startswith('sqlite_'):
+        return None
+    existing = table_columns(conn, table)
+    if not existing:
+        return None
+
+    # Only WHERE/ON predicates count, not select lists, CASE expressions or UPDATE assignments
+    predicates = re.sub(r'\bCASE\b.*?\bEND\b', ' ', sql, flags=re.IGNORECASE | re.DOTALL)
+    predicates = re.sub(r'\bSELECT\b.*?\bFROM\b', 'FROM', predicates, flags=re.IGNORECASE | re.DOTALL)
+    predicates = re.sub(r'\bSET\b.*?\bWHERE\b', 'WHERE', predicates, flags=re.IGNORECASE | re.DOTALL)
+
+    qualified = len(aliases) > 1 or name != table
+    prefix = rf'\b{re.escape(name)}\.' if qualified else r'(?<![.\w])'
+    equality = re.findall(prefix + r'(\w+)\s*(?:=|\bIN\b)', predicates, re.IGNORECASE)
+    equality += re.findall(r'=\s*' + prefix + r'(\w+)', predicates, re.IGNORECASE)
+    ranges = re.findall(prefix + r'(\w+)\s*(?:>=|<=|>|<|\bBETWEEN\b|\bLIKE\b)', predicates, re.IGNORECASE)
+
+    columns = []
+    for column in equality + ranges:
+        if column in existing and column not in columns:
+            columns.append(column)
+    columns = columns[:MAX_INDEX_COLUMNS]
+    if not columns or columns[0] in leading_index_columns(conn, table):
+        return None
+    return table, tuple(columns)
+
+
+def merge_prefixes(suggestions):
+    """Drop suggestions that are a leading prefix of a longer one on the same table"""
+    merged = {}
+    for (table, columns), locations in sorted(suggestions.items(), key=lambda item: -len(item[0][1])):
+        for (other_table, other_columns), other_locations in merged.items():
+            if other_table == table and other_columns[:len(columns)] == columns:
+                other_locations.extend(locations)
+                break
+        else:
+            merged[(table, columns)] = list(locations)
+    return merged
+
+
+def advise(db_path=DB_PATH, patterns=SOURCE_GLOBS):
+    """Explain every statement and print findings; returns {(table, columns): [call sites]}"""
+    conn = sqlite3.connect(db_path)
+    suggestions = {}
+    flagged = skipped = 0
+    statements = extract_statements(patterns)
+    try:
+        for statement in statements:
+            location = f"{statement['file']}:{statement['line']}"
+            try:
+                plan = explain(conn, statement['sql'])
+            except sqlite3.Error as e:
+                skipped += 1
+                print(f"SKIP  {location}: {e}")
+                continue
+            findings = analyze_plan(plan)
+            if not findings:
+                continue
+            flagged += 1
+            for kind, target in findings:
+                print(f"{kind.upper():<16} {location}: {target}")
+                if kind in ('full scan', 'automatic index'):
+                    suggestion = suggest_index(conn, statement['sql'], target)
+                    if suggestion:
+                        suggestions.setdefault(suggestion, []).append(location)
+    finally:
+        conn.close()
+
+    suggestions = merge_prefixes(suggestions)
+    print(f"\n{len(statements)} statements, {flagged} flagged, {skipped} could not be explained")
+    for (table, columns), locations in sorted(suggestions.items()):
+        print(f"  {table}({', '.join(columns)})  <- {len(locations)} statement(s)")
+    return suggestions
+
+
+def next_migration_version(directory=MIGRATIONS_DIR):
+    versions = [int(name.split('_', 1)[0]) for name in os.listdir(directory)
+                if name.endswith('.sql') and name.split('_', 1)[0].isdigit()] if os.path.isdir(directory) else []
+    return max(versions, default=0) + 1
+
+
+def write_migration(suggestions, directory=MIGRATIONS_DIR, name='dashboard_query_indexes'):
+    """Write the suggested indexes plus ANALYZE as the next numbered migration"""
+    os.makedirs(directory, exist_ok=True)
+    version = next_migration_version(directory)
+    path = os.path.join(directory, f"{version:03d}_{name}.sql")
+
+    lines = [
+        f"-- Migration {version:03d}: indexes suggested by src/utils/index_advisor.py",
+        f"-- Generated {datetime.now().strftime('%Y-%m-%d')}",
+        "",
+    ]
+    for (table, columns), locations in sorted(suggestions.items()):
+        index_name = f"idx_{table}_{'_'.join(columns)}"
+        files = sorted({location.rsplit(':', 1)[0] for location in locations})
+        lines.append(f"-- Used by {', '.join(files)}")
+        lines.append(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table}({', '.join(columns)});")
+        lines.append("")
+    lines.append("-- Refresh planner statistics for the new indexes")
+    lines.append("ANALYZE;")
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    db_path = args[0] if args else DB_PATH
+    suggestions = advise(db_path)
+    if '--write-migration' in sys.argv:
+        if suggestions:
+            print(f"\nWrote {write_migration(suggestions)}")
+        else:
+            print("\nNo missing indexes found; no migration written")
@@ -0,0 +1,320 @@
+"""
+Normalized patient identity index for matching free-text patient names.
+
+Source spreadsheets identify patients by strings such as "Smith, John 01/02/1950"
+(SOURCE_COORDINATOR_TASKS_HISTORY."Pt Name",
+SOURCE_PROVIDER_TASKS_HISTORY."Patient Last, First DOB", patients.last_first_dob,
+unmatched_patient_names.patient_name). Matching them with TRIM(UPPER(...)) in SQL
+defeats every index and misses trivial variations.
+
+patient_identity_keys holds one canonical row per patient spelling: normalized
+last name, first name, ISO date of birth, the combined name_key and a Soundex
+phonetic_key, all indexed. PatientIdentityResolver loads it once and resolves
+names in batches: exact name_key lookup first, then a bounded fuzzy match among
+patients with the same date of birth (or, without a DOB, the same phonetic key).
+
+source_patient_identity caches the resolution of every distinct raw name in the
+SOURCE_* tables so SQL loaders can join on the raw string with an index.
+
+Usage:
+    python -m src.utils.patient_identity [db_path] [--report]
+"""
+
+import re
+import sqlite3
+import sys
+from datetime import datetime
+from difflib import SequenceMatcher
+
+DB_PATH = 'production.db'
+
+# Fuzzy matching: minimum similarity of "LAST FIRST", the largest block of
+# candidates a name is compared against (bigger blocks are left ambiguous), and
+# the lead the best match needs over the next
+FUZZY_THRESHOLD = 0.88
+MAX_FUZZY_CANDIDATES = 50
+FUZZY_MARGIN = 0.03
+
+# Source columns holding "Last, First DOB" patient names
+SOURCE_NAME_COLUMNS = {
+    'SOURCE_COORDINATOR_TASKS_HISTORY': 'Pt Name',
+    'SOURCE_PROVIDER_TASKS_HISTORY': 'Patient Last, First DOB',
+}
+
+DATE_TOKEN = re.compile(r'(\d{1,2}/\d{1,2}/\d{2,4}|\d{4}-\d{1,2}-\d{1,2})\s*$')
+NON_NAME_CHARS = re.compile(r"[^A-Z ,'-]")
+DATE_FORMATS = ('%m/%d/%Y', '%m/%d/%y', '%Y-%m-%d')
+
+SOUNDEX_CODES = {
+    **dict.fromkeys('BFPV', '1'), **dict.fromkeys('CGJKQSXZ', '2'),
+    **dict.fromkeys('DT', '3'), 'L': '4', **dict.fromkeys('MN', '5'), 'R': '6',
+}
+
+
+def normalize_dob(value):
+    """ISO date for M/D/YY, M/D/YYYY or YYYY-MM-DD strings, else ''"""
+    if not value:
+        return ''
+    value = str(value).strip().split(' ')[0]
+    for fmt in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        # Two-digit years are birth dates, never in the future; a four-digit
+        # year is taken as written
+        if fmt == '%m/%d/%y' and parsed.year > datetime.now().year:
+            parsed = parsed.replace(year=parsed.year - 100)
+        return parsed.strftime('%Y-%m-%d')
+    return ''
+
+
+def normalize_part(value):
+    """Upper-case a name part and drop punctuation, digits and extra spaces"""
+    if not value:
+        return ''
+    return ' '.join(NON_NAME_CHARS.sub(' ', str(value).upper()).replace(',', ' ').split())
+
+
+def parse_name(raw):
+    """Split "Last, First DOB" into normalized (last, first, dob_iso)"""
+    if raw is None:
+        return '', '', ''
+    text = ' '.join(str(raw).split())
+    dob = ''
+    match = DATE_TOKEN.search(text)
+    if match:
+        dob = normalize_dob(match.group(1))
+        text = text[:match.start()]
+    if ',' in text:
+        last, first = text.split(',', 1)
+    else:
+        last, _, first = text.partition(' ')
+    return normalize_part(last), normalize_part(first), dob
+
+
+def soundex(value):
+    """Classic four-character Soundex of the first word of value"""
+    letters = [c for c in (value.split() or [''])[0] if c.isalpha()]
+    if not letters:
+        return ''
+    code, last = letters[0], SOUNDEX_CODES.get(letters[0], '')
+    for c in letters[1:]:
+        digit = SOUNDEX_CODES.get(c, '')
+        if digit and digit != last:
+            code += digit
+        if c not in 'HW':
+            last = digit
+    return (code + '000')[:4]
+
+
+def name_key(last, first, dob):
+    return f"{last}|{first}|{dob}"
+
+
+def phonetic_key(last, first):
+    return f"{soundex(last)}|{soundex(first)}"
+
+
+def identity_row(patient_id, last, first, dob, source):
+    return (patient_id, name_key(last, first, dob), last, first, dob, phonetic_key(last, first), source)
+
+
+def ensure_identity_tables(conn):
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS patient_identity_keys (
+            patient_id TEXT NOT NULL,
+            name_key TEXT NOT NULL,
+            last_name_norm TEXT NOT NULL,
+            first_name_norm TEXT NOT NULL,
+            dob_iso TEXT NOT NULL,
+            phonetic_key TEXT NOT NULL,
+            source TEXT NOT NULL,
+            PRIMARY KEY (name_key, patient_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_patient_identity_keys_dob_phonetic
+            ON patient_identity_keys(dob_iso, phonetic_key);
+        CREATE INDEX IF NOT EXISTS idx_patient_identity_keys_phonetic
+            ON patient_identity_keys(phonetic_key);
+        CREATE INDEX IF NOT EXISTS idx_patient_identity_keys_patient
+            ON patient_identity_keys(patient_id);
+
+        CREATE TABLE IF NOT EXISTS source_patient_identity (
+            source_table TEXT NOT NULL,
+            raw_name TEXT NOT NULL,
+            patient_id TEXT,
+            match_method TEXT NOT NULL,
+            match_score REAL,
+            resolved_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (source_table, raw_name)
+        );
+    """)
+
+
+def build_identity_index(conn):
+    """Rebuild patient_identity_keys from patients; returns the number of keys"""
+    ensure_identity_tables(conn)
+    rows = set()
+    for patient_id, last_first_dob, last_name, first_name, date_of_birth in conn.execute(
+        "SELECT patient_id, last_first_dob, last_name, first_name, date_of_birth FROM patients WHERE patient_id IS NOT NULL"
+    ):
+        # Both spellings of a patient get a key: the imported "Last, First DOB"
+        # string and the separate name/DOB columns
+        if last_first_dob:
+            last, first, dob = parse_name(last_first_dob)
+            if last:
+                rows.add(identity_row(str(patient_id), last, first, dob, 'last_first_dob'))
+        if last_name:
+            last, first, dob = normalize_part(last_name), normalize_part(first_name), normalize_dob(date_of_birth)
+            rows.add(identity_row(str(patient_id), last, first, dob, 'patients'))
+
+    with conn:
+        conn.execute("DELETE FROM patient_identity_keys")
+        conn.executemany("""
+            INSERT OR IGNORE INTO patient_identity_keys
+                (patient_id, name_key, last_name_norm, first_name_norm, dob_iso, phonetic_key, source)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, sorted(rows))
+    return conn.execute("SELECT COUNT(*) FROM patient_identity_keys").fetchone()[0]
+
+
+class PatientIdentityResolver:
+    """In-memory view of patient_identity_keys for batch name resolution"""
+
+    def __init__(self, conn, threshold=FUZZY_THRESHOLD, max_candidates=MAX_FUZZY_CANDIDATES):
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.exact = {}
+        self.by_dob = {}
+        self.by_phonetic = {}
+        self._resolved = {}
+        for patient_id, key, last, first, dob, phonetic in conn.execute("""
+            SELECT patient_id, name_key, last_name_norm, first_name_norm, dob_iso, phonetic_key
+            FROM patient_identity_keys
+            ORDER BY rowid
+        """):
+            candidates = self.exact.setdefault(key, set())
+            candidates.add(patient_id)
+            entry = (f"{last} {first}", patient_id)
+            if dob:
+                self.by_dob.setdefault(dob, []).append(entry)
+            self.by_phonetic.setdefault(phonetic, []).append(entry)
+
+    def __len__(self):
+        return len(self.exact)
+
+    def resolve(self, raw):
+        """(patient_id, method, score) for one name; patient_id is None when unresolved.
+
+        method is 'exact', 'fuzzy', 'ambiguous' (several equally good patients,
+        or more fuzzy candidates than max_candidates) or 'unmatched'.
+        """
+        last, first, dob = parse_name(raw)
+        if not last:
+            return None, 'unmatched', 0.0
+        exact = self.exact.get(name_key(last, first, dob))
+        if exact:
+            if len(exact) == 1:
+                return next(iter(exact)), 'exact', 1.0
+            return None, 'ambiguous', 1.0
+
+        # A DOB is a much stronger block than a phonetic key; without one only
+        # names that sound alike are compared
+        candidates = self.by_dob.get(dob) if dob else self.by_phonetic.get(phonetic_key(last, first))
+        if not candidates:
+            return None, 'unmatched', 0.0
+        # Scoring only part of a crowded block could pick the wrong patient
+        if len(candidates) > self.max_candidates:
+            return None, 'ambiguous', 0.0
+        target = f"{last} {first}"
+        scores = {}
+        for text, patient_id in candidates:
+            score = SequenceMatcher(None, target, text).ratio()
+            if score > scores.get(patient_id, 0.0):
+                scores[patient_id] = score
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        best_id, best = ranked[0]
+        if best < self.threshold:
+            return None, 'unmatched', round(best, 3)
+        if len(ranked) > 1 and best - ranked[1][1] < FUZZY_MARGIN:
+            return None, 'ambiguous', round(best, 3)
+        return best_id, 'fuzzy', round(best, 3)
+
+    def resolve_many(self, names):
+        """Resolve a batch of names; returns {raw_name: (patient_id, method, score)}.
+
+        Results are memoized, so repeated names across batches cost a dict lookup.
+        """
+        results = {}
+        for raw in names:
+            if raw not in results:
+                if raw not in self._resolved:
+                    self._resolved[raw] = self.resolve(raw)
+                results[raw] = self._resolved[raw]
+        return results
+
+
+def resolve_source_names(conn, resolver=None, sources=SOURCE_NAME_COLUMNS):
+    """Resolve every distinct raw name in the SOURCE_* tables into source_patient_identity"""
+    ensure_identity_tables(conn)
+    resolver = resolver or PatientIdentityResolver(conn)
+    summary = {}
+    for source_table, column in sources.items():
+        try:
+            names = [row[0] for row in conn.execute(
+                f'SELECT DISTINCT "{column}" FROM "{source_table}" WHERE "{column}" IS NOT NULL AND "{column}" != \'\''
+            )]
+        except sqlite3.OperationalError as e:
+            print(f"Skipping {source_table}: {e}")
+            continue
+        resolved = resolver.resolve_many(names)
+        with conn:
+            conn.execute("DELETE FROM source_patient_identity WHERE source_table = ?", (source_table,))
+            conn.executemany("""
+                INSERT INTO source_patient_identity (source_table, raw_name, patient_id, match_method, match_score)
+                VALUES (?, ?, ?, ?, ?)
+            """, [(source_table, raw, patient_id, method, score) for raw, (patient_id, method, score) in resolved.items()])
+        counts = {}
+        for _, method, _ in resolved.values():
+            counts[method] = counts.get(method, 0) + 1
+        summary[source_table] = counts
+    return summary
+
+
+def unmatched_name_report(conn, resolver=None):
+    """Candidate matches for unmatched_patient_names; returns a list of dicts"""
+    resolver = resolver or PatientIdentityResolver(conn)
+    rows = conn.execute("""
+        SELECT source_table, patient_name, occurrence_count
+        FROM unmatched_patient_names
+        ORDER BY occurrence_count DESC, patient_name
+    """).fetchall()
+    resolved = resolver.resolve_many([row[1] for row in rows])
+    report = []
+    for source_table, patient_name, occurrences in rows:
+        patient_id, method, score = resolved[patient_name]
+        report.append({
+            'source_table': source_table,
+            'patient_name': patient_name,
+            'occurrences': occurrences,
+            'patient_id': patient_id,
+            'match_method': method,
+            'match_score': score,
+        })
+    return report
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    conn = sqlite3.connect(args[0] if args else DB_PATH)
+    try:
+        print(f"Indexed {build_identity_index(conn)} patient identity keys")
+        resolver = PatientIdentityResolver(conn)
+        for source_table, counts in resolve_source_names(conn, resolver).items():
+            print(f"{source_table}: " + ", ".join(f"{count} {method}" for method, count in sorted(counts.items())))
+        if '--report' in sys.argv:
+            for row in unmatched_name_report(conn, resolver):
+                match = f"-> {row['patient_id']} ({row['match_method']} {row['match_score']})" if row['patient_id'] else f"({row['match_method']})"
+                print(f"{row['source_table']:<36} {row['patient_name']:<40} x{row['occurrences']:<5} {match}")
+    finally:
+        conn.close()
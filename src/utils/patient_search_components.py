@@ -0,0 +1,35 @@
+import streamlit as st
+from src import database
+
+SEARCH_PLACEHOLDER = "Name, phone, email, address, MRN or policy number"
+
+def patient_label(patient):
+    return f"{patient['first_name']} {patient['last_name']}"
+
+def patient_picker(label, key, scope_user_id=None, patients=(), allowed_ids=None,
+                   empty_label="No patients found", format_patient=patient_label):
+    """Search box and a selectbox of the patients it finds; returns the chosen patient dict or None.
+
+    Typed text goes to database.search_patients within scope_user_id's
+    patients; with nothing typed the selectbox offers patients. allowed_ids
+    drops matches outside it, e.g. inactive patients from an active-only list.
+    """
+    search = st.text_input(f"Find {label}", key=f"{key}_search", placeholder=SEARCH_PLACEHOLDER)
+    if search.strip():
+        options = database.search_patients(search, scope_user_id)
+        if allowed_ids is not None:
+            options = [patient for patient in options if patient['patient_id'] in allowed_ids]
+    else:
+        options = list(patients)
+
+    patients_by_id = {patient['patient_id']: patient for patient in options}
+    # A choice the new search no longer offers falls back to the first match
+    if patients_by_id and st.session_state.get(key) not in patients_by_id:
+        st.session_state.pop(key, None)
+    selected_id = st.selectbox(
+        label,
+        list(patients_by_id) or [None],
+        format_func=lambda patient_id: format_patient(patients_by_id[patient_id]) if patient_id in patients_by_id else empty_label,
+        key=key
+    )
+    return patients_by_id.get(selected_id)
@@ -0,0 +1,286 @@
+"""
+Bulk referral intake from CSV or Excel spreadsheets.
+
+Referral partners send spreadsheets of patients to onboard. The file is read
+in chunks of REFERRAL_CHUNK_ROWS (pandas' chunked CSV reader, or openpyxl's
+read-only row iterator for .xlsx), and every chunk is validated with vectorized
+pandas checks:
+
+  - the required fields of the intake form are present,
+  - date_of_birth (and referral_date, when given) parse as dates, with the
+    birth date in the past,
+  - address_zip (ZIP+4 allowed) is a zip listed in zip-codes.csv,
+  - the patient is not already in patients or onboarding_patients, or earlier
+    in the same file, by the normalized "LAST|FIRST|DOB" key of
+    src.utils.patient_identity.
+
+Valid rows of each chunk start onboarding in one transaction through
+database.create_onboarding_workflow_instances (Stage 1 complete, as after the
+intake form). Rejected rows keep their original values plus the spreadsheet
+row number and the reasons, ready to be handed back as a CSV.
+
+Usage:
+    python -m src.utils.referral_intake <referrals.csv|xlsx> <pot_user_id> [db_path] [--dry-run]
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+from src import database
+from src.utils.patient_identity import NON_NAME_CHARS
+from src.utils.zip_region_resolver import ZIP_CODES_CSV, load_zip_reference
+
+DB_PATH = 'production.db'
+
+# Spreadsheet rows validated and inserted per transaction
+REFERRAL_CHUNK_ROWS = 500
+
+# Required like the starred fields of the intake form
+REQUIRED_FIELDS = (
+    'first_name', 'last_name', 'date_of_birth', 'phone_primary',
+    'address_street', 'address_city', 'address_zip',
+)
+
+# Header spellings seen in partner spreadsheets, after lower-casing and
+# turning spaces into underscores, mapped to onboarding_patients columns
+COLUMN_ALIASES = {
+    'first': 'first_name', 'firstname': 'first_name', 'patient_first_name': 'first_name',
+    'last': 'last_name', 'lastname': 'last_name', 'patient_last_name': 'last_name',
+    'dob': 'date_of_birth', 'birth_date': 'date_of_birth', 'birthdate': 'date_of_birth',
+    'phone': 'phone_primary', 'phone_number': 'phone_primary', 'primary_phone': 'phone_primary',
+    'street': 'address_street', 'address': 'address_street', 'street_address': 'address_street',
+    'city': 'address_city', 'state': 'address_state',
+    'zip': 'address_zip', 'zip_code': 'address_zip', 'zipcode': 'address_zip', 'postal_code': 'address_zip',
+    'insurance': 'insurance_provider', 'primary_insurance': 'insurance_provider', 'policy': 'policy_number',
+    'group': 'group_number', 'facility': 'facility_assignment', 'referring_facility': 'facility_assignment',
+    'status': 'patient_status', 'emergency_contact': 'emergency_contact_name', 'emergency_phone': 'emergency_contact_phone',
+}
+
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y')
+REJECT_COLUMNS = ['row', 'reject_reason']
+
+
+def normalize_columns(frame):
+    """Rename spreadsheet headers to onboarding_patients columns"""
+    columns = [str(column).strip().lower().replace(' ', '_').replace('-', '_') for column in frame.columns]
+    return frame.set_axis([COLUMN_ALIASES.get(column, column) for column in columns], axis=1)
+
+
+def parse_dates(values, birth_dates=False):
+    """Timestamps for a Series of YYYY-MM-DD, M/D/YYYY or M/D/YY strings; NaT where unparseable.
+
+    With birth_dates, two-digit years that would land in the future are moved
+    back a century, like patient_identity.normalize_dob.
+    """
+    text = values.astype(str).str.strip().str.split(' ').str[0]
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    for fmt in DATE_FORMATS:
+        current = pd.to_datetime(text, format=fmt, errors='coerce')
+        if birth_dates and fmt.endswith('%y'):
+            current = current.where(~(current.dt.year > pd.Timestamp.now().year), current - pd.DateOffset(years=100))
+        parsed = parsed.fillna(current)
+    return parsed
+
+
+def normalize_names(values):
+    """Vectorized patient_identity.normalize_part"""
+    return (values.fillna('').astype(str).str.upper()
+            .str.replace(NON_NAME_CHARS.pattern, ' ', regex=True)
+            .str.replace(',', ' ').str.split().str.join(' '))
+
+
+def identity_keys(first_names, last_names, dobs_iso):
+    """patient_identity.name_key for Series of first names, last names and ISO birth dates"""
+    return normalize_names(last_names).str.cat([normalize_names(first_names), dobs_iso.fillna('')], sep='|')
+
+
+def load_known_keys(conn):
+    """Identity keys of everyone already in patients or onboarding_patients"""
+    rows = conn.execute("""
+        SELECT first_name, last_name, date_of_birth FROM patients
+        UNION ALL
+        SELECT first_name, last_name, date_of_birth FROM onboarding_patients
+    """).fetchall()
+    people = pd.DataFrame([tuple(row) for row in rows], columns=['first_name', 'last_name', 'date_of_birth'], dtype=object)
+    dobs = parse_dates(people['date_of_birth'].fillna(''), birth_dates=True).dt.strftime('%Y-%m-%d')
+    return set(identity_keys(people['first_name'], people['last_name'], dobs))
+
+
+def load_valid_zips(path=ZIP_CODES_CSV):
+    return set(load_zip_reference(path).index)
+
+
+def _is_excel(filename):
+    return os.path.splitext(filename)[1].lower() in ('.xlsx', '.xlsm')
+
+
+def _open_workbook(source):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError("Reading .xlsx referral files needs openpyxl (pip install openpyxl); upload a CSV instead")
+    return load_workbook(source, read_only=True, data_only=True)
+
+
+def _excel_rows(source):
+    workbook = _open_workbook(source)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def count_rows(source, filename):
+    """Data rows in a referral file, for progress reporting (an estimate for .xlsx)"""
+    if _is_excel(filename):
+        workbook = _open_workbook(source)
+        total = max((workbook.active.max_row or 1) - 1, 0)
+        workbook.close()
+    else:
+        total = max(sum(chunk.count(b'\n') for chunk in iter(lambda: source.read(1 << 20), b'')) - 1, 0)
+    source.seek(0)
+    return total
+
+
+def iter_referral_chunks(source, filename, chunk_rows=REFERRAL_CHUNK_ROWS):
+    """DataFrames of up to chunk_rows rows (all text, '' for blanks) with normalized headers and a 'row' column"""
+    if _is_excel(filename):
+        rows = _excel_rows(source)
+        header = [str(value) if value is not None else '' for value in next(rows, [])]
+        chunks = _excel_chunks(rows, header, chunk_rows)
+    else:
+        chunks = pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=chunk_rows, skipinitialspace=True)
+
+    first_row = 2  # row 1 is the header
+    for chunk in chunks:
+        chunk = normalize_columns(chunk).fillna('')
+        # Duplicate headers after renaming keep their first column
+        chunk = chunk.loc[:, ~chunk.columns.duplicated()]
+        if 'row' not in chunk.columns:
+            chunk.insert(0, 'row', range(first_row, first_row + len(chunk)))
+        first_row += len(chunk)
+        yield chunk.reset_index(drop=True)
+
+
+def _excel_chunks(rows, header, chunk_rows):
+    # Blank rows are skipped, so each row carries its sheet row number
+    columns = ['row'] + header
+    batch = []
+    for row_number, values in enumerate(rows, start=2):
+        if values is None or all(value is None or str(value).strip() == '' for value in values):
+            continue
+        batch.append([row_number] + ['' if value is None else value.strftime('%Y-%m-%d') if hasattr(value, 'strftime') else str(value)
+                                     for value in values[:len(header)]])
+        if len(batch) == chunk_rows:
+            yield pd.DataFrame(batch, columns=columns)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch, columns=columns)
+
+
+def validate_referrals(chunk, valid_zips, known_keys, today=None):
+    """Split a chunk into (records to onboard, rejected rows with reasons).
+
+    Records are dicts of database.ONBOARDING_PATIENT_FIELDS with ISO dates
+    and five-digit zips. Keys of accepted rows are added to known_keys, so a
+    patient repeated later in the file is rejected as a duplicate.
+    """
+    today = pd.Timestamp(today or pd.Timestamp.now().normalize())
+    frame = chunk.copy()
+    for field in database.ONBOARDING_PATIENT_FIELDS:
+        if field not in frame.columns:
+            frame[field] = ''
+        frame[field] = frame[field].astype(str).str.strip()
+
+    reasons = pd.DataFrame(index=frame.index)
+    for field in REQUIRED_FIELDS:
+        reasons[f"missing {field}"] = frame[field] == ''
+
+    dob = parse_dates(frame['date_of_birth'], birth_dates=True)
+    reasons['invalid date_of_birth'] = (frame['date_of_birth'] != '') & dob.isna()
+    reasons['date_of_birth in the future'] = dob > today
+    referral_date = parse_dates(frame['referral_date'])
+    reasons['invalid referral_date'] = (frame['referral_date'] != '') & referral_date.isna()
+
+    zips = frame['address_zip'].str.extract(r'^(\d{5})(?:-?\d{4})?$', expand=False)
+    reasons['unknown address_zip'] = (frame['address_zip'] != '') & ~zips.isin(valid_zips)
+
+    dob_iso = dob.dt.strftime('%Y-%m-%d')
+    keys = identity_keys(frame['first_name'], frame['last_name'], dob_iso)
+    # Rows without a full name and birth date are already rejected above
+    identifiable = (frame['first_name'] != '') & (frame['last_name'] != '') & dob.notna()
+    reasons['already a patient or in onboarding'] = identifiable & keys.isin(known_keys)
+    reasons['duplicate row in file'] = identifiable & keys.duplicated() & ~reasons['already a patient or in onboarding']
+
+    rejected = reasons.any(axis=1)
+    reason_text = pd.Series('', index=frame.index)
+    for reason in reasons.columns:
+        reason_text = reason_text.where(~reasons[reason], reason_text + reason + '; ')
+    rejects = chunk[rejected].copy()
+    rejects['reject_reason'] = reason_text[rejected].str.rstrip('; ')
+
+    accepted = frame[~rejected].copy()
+    accepted['date_of_birth'] = dob_iso[~rejected]
+    accepted['address_zip'] = zips[~rejected]
+    accepted['referral_date'] = referral_date[~rejected].dt.strftime('%Y-%m-%d')
+    accepted['patient_status'] = accepted['patient_status'].replace('', 'Active')
+    known_keys.update(keys[~rejected])
+
+    records = [
+        {field: (None if value == '' or pd.isna(value) else value) for field, value in record.items()}
+        for record in accepted[list(database.ONBOARDING_PATIENT_FIELDS)].to_dict('records')
+    ]
+    return records, rejects
+
+
+def import_referrals(source, filename, pot_user_id, progress=None, dry_run=False, chunk_rows=REFERRAL_CHUNK_ROWS):
+    """Validate a referral file chunk by chunk and start onboarding for its valid rows.
+
+    progress(fraction, text) is called after every chunk. Returns a dict with
+    the new onboarding_ids, the rejected rows as a DataFrame and the row
+    counts. With dry_run nothing is written.
+    """
+    total = count_rows(source, filename)
+    valid_zips = load_valid_zips()
+    with database.get_db_connection() as conn:
+        known_keys = load_known_keys(conn)
+
+    onboarding_ids, rejects, processed = [], [], 0
+    for chunk in iter_referral_chunks(source, filename, chunk_rows):
+        records, rejected = validate_referrals(chunk, valid_zips, known_keys)
+        if records and not dry_run:
+            onboarding_ids.extend(database.create_onboarding_workflow_instances(records, pot_user_id, registration_complete=True))
+        if len(rejected):
+            rejects.append(rejected)
+        processed += len(chunk)
+        if progress:
+            progress(min(processed / total, 1.0) if total else 1.0,
+                     f"{processed} of {total} rows checked, {processed - sum(len(r) for r in rejects)} accepted")
+
+    rejects = pd.concat(rejects, ignore_index=True) if rejects else pd.DataFrame(columns=REJECT_COLUMNS)
+    columns = REJECT_COLUMNS[:1] + [c for c in rejects.columns if c not in REJECT_COLUMNS] + REJECT_COLUMNS[1:]
+    return {
+        'onboarding_ids': onboarding_ids,
+        'rejects': rejects[columns],
+        'rows': processed,
+        'accepted': processed - len(rejects),
+    }
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if len(args) < 2:
+        print(__doc__.strip().splitlines()[-1].strip())
+        sys.exit(1)
+    path, pot_user_id = args[0], int(args[1])
+    database.DB_PATH = args[2] if len(args) > 2 else DB_PATH
+    with open(path, 'rb') as f:
+        result = import_referrals(f, path, pot_user_id, dry_run='--dry-run' in sys.argv,
+                                  progress=lambda fraction, text: print(f"{fraction:6.1%}  {text}"))
+    print(f"{result['accepted']} of {result['rows']} rows accepted, {len(result['onboarding_ids'])} onboarding workflows started")
+    if len(result['rejects']):
+        reject_path = os.path.splitext(path)[0] + '_rejects.csv'
+        result['rejects'].to_csv(reject_path, index=False)
+        print(f"Rejected rows written to {reject_path}")
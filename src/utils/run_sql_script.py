@@ -0,0 +1,43 @@
+"""
+Run one of the src/sql scripts against a database.
+
+The rollup scripts read task_date_iso, which database.initialize_database
+adds to the task tables along with the sql/migrations. The database is
+prepared that way first, so the scripts also work on a file the app has never
+opened; plain sqlite3 runs need that to have happened already.
+
+Usage:
+    python -m src.utils.run_sql_script src/sql/<script>.sql [db_path]
+"""
+
+import sqlite3
+import sys
+import time
+
+from src.database import initialize_database
+
+DB_PATH = 'production.db'
+
+
+def run_sql_script(script_path, db_path=DB_PATH):
+    """Prepare db_path and execute the script in it; returns the elapsed seconds"""
+    with open(script_path, encoding='utf-8') as f:
+        script = f.read()
+    initialize_database(db_path, start_checkpointer=False)
+    conn = sqlite3.connect(db_path)
+    try:
+        started = time.perf_counter()
+        conn.executescript(script)
+        conn.commit()
+        return time.perf_counter() - started
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not args:
+        print(__doc__.strip().splitlines()[-1].strip())
+        sys.exit(1)
+    seconds = run_sql_script(args[0], args[1] if len(args) > 1 else DB_PATH)
+    print(f"Ran {args[0]} in {seconds:.2f}s")
@@ -0,0 +1,209 @@
+"""
+Opt-in SQL tracing for the pooled database connections.
+
+When tracing is on, every statement run through a connection from
+database.get_db_connection() is timed and aggregated by normalized statement
+text (literals replaced by ?) and call site, the innermost module:function in
+this repo that issued it. Per aggregate it keeps the call count, total
+duration, slowest execute, rows fetched and lock wait. Duration covers executing the
+statement and fetching its rows. Lock wait is the time spent in statements
+that failed with "database is locked" plus the backoff sleeps of
+database.retry_on_locked; waits that SQLite's busy_timeout resolves inside a
+successful statement are part of that statement's duration.
+
+Tracing is off by default. Set SQL_TRACE=1 in the environment to start the app
+with it on, or toggle it from the admin dashboard's Performance tab (shown when
+tracing is on or the page is opened with ?perf=1). Aggregates can be exported
+as CSV or as folded stacks ("app:main;src.database:get_users;SELECT ... 1234",
+values in microseconds) for flamegraph.pl or speedscope.
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+SQL_TRACE_ENV = 'SQL_TRACE'
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+THIS_FILE = os.path.abspath(__file__)
+
+# Connection and cursor methods that run SQL
+TRACED_METHODS = ('execute', 'executemany', 'executescript', 'cursor')
+
+# Repo frames kept per flamegraph stack, innermost last
+MAX_STACK_DEPTH = 12
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_statement(sql):
+    """Statement text with literals replaced by ? and whitespace collapsed"""
+    text = STRING_LITERAL.sub('?', sql)
+    text = NUMBER_LITERAL.sub('?', text)
+    # IN lists of any length share one entry
+    text = IN_LIST.sub('IN (?, ...)', text)
+    return WHITESPACE.sub(' ', text).strip()
+
+
+def _module_name(path):
+    relative = os.path.relpath(path, REPO_ROOT)
+    return os.path.splitext(relative)[0].replace(os.sep, '.')
+
+
+def repo_stack(depth=MAX_STACK_DEPTH):
+    """module:function of the repo frames on the current stack, outermost first"""
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < depth:
+        path = os.path.abspath(frame.f_code.co_filename)
+        if path != THIS_FILE and path.startswith(REPO_ROOT + os.sep) and 'site-packages' not in path:
+            frames.append(f"{_module_name(path)}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return tuple(reversed(frames))
+
+
+class SqlTracer:
+    """Thread-safe per-statement aggregates for traced connections"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time.time()
+        self._stats = {}   # (statement, call_site) -> dict of totals
+        self._stacks = {}  # stack tuple + statement -> seconds
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._stacks.clear()
+            self.started = time.time()
+
+    def begin(self, sql):
+        """Aggregate key for a statement about to run from the current call stack"""
+        stack = repo_stack()
+        statement = normalize_statement(sql)
+        call_site = stack[-1] if stack else '<unknown>'
+        return statement, call_site, stack
+
+    def record(self, key, seconds=0.0, rows=0, calls=0, lock_wait=0.0):
+        statement, call_site, stack = key
+        with self._lock:
+            stats = self._stats.get((statement, call_site))
+            if stats is None:
+                stats = self._stats[(statement, call_site)] = {
+                    'calls': 0, 'total_seconds': 0.0, 'max_seconds': 0.0, 'rows': 0, 'lock_wait_seconds': 0.0,
+                }
+            stats['calls'] += calls
+            stats['total_seconds'] += seconds
+            if calls:
+                stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            stats['rows'] += rows
+            stats['lock_wait_seconds'] += lock_wait
+            folded = stack + (statement,)
+            self._stacks[folded] = self._stacks.get(folded, 0.0) + seconds
+
+    def record_lock_wait(self, seconds, call_site):
+        """Backoff spent waiting on a locked database, charged to call_site (module:function)"""
+        if self.enabled:
+            stack = repo_stack()[:-1] + (call_site,)
+            self.record(('<lock wait>', call_site, stack), seconds, lock_wait=seconds)
+
+    def wrap(self, name, method):
+        """Traced version of a connection method from TRACED_METHODS"""
+        if name == 'cursor':
+            return lambda *args, **kwargs: TracedCursor(self, method(*args, **kwargs))
+        return lambda sql, *args, **kwargs: self.run(method, sql, *args, **kwargs)
+
+    def run(self, method, sql, *args, **kwargs):
+        """Run one execute-style call, returning a traced cursor over its result"""
+        key = self.begin(sql)
+        started = time.perf_counter()
+        try:
+            cursor = method(sql, *args, **kwargs)
+        except sqlite3.OperationalError as e:
+            elapsed = time.perf_counter() - started
+            locked = 'locked' in str(e).lower() or 'busy' in str(e).lower()
+            self.record(key, elapsed, calls=1, lock_wait=elapsed if locked else 0.0)
+            raise
+        self.record(key, time.perf_counter() - started, calls=1)
+        return TracedCursor(self, cursor, key)
+
+    def stats(self):
+        """Aggregates as a list of dicts, slowest total first"""
+        with self._lock:
+            rows = [
+                {'statement': statement, 'call_site': call_site, **stats,
+                 'avg_ms': stats['total_seconds'] * 1000 / stats['calls'] if stats['calls'] else 0.0}
+                for (statement, call_site), stats in self._stats.items()
+            ]
+        return sorted(rows, key=lambda row: row['total_seconds'], reverse=True)
+
+    def folded_stacks(self):
+        """Aggregates in folded-stack format, one "frame;frame;statement microseconds" line each"""
+        with self._lock:
+            stacks = list(self._stacks.items())
+        lines = []
+        for frames, seconds in sorted(stacks, key=lambda item: item[1], reverse=True):
+            # ';' separates frames, so it cannot appear inside one
+            names = [frame.replace(';', ',') for frame in frames]
+            lines.append(f"{';'.join(names)} {max(int(seconds * 1_000_000), 1)}")
+        return '\n'.join(lines) + ('\n' if lines else '')
+
+
+class TracedCursor:
+    """sqlite3.Cursor proxy that charges fetch time and rows to the statement that produced them"""
+
+    def __init__(self, tracer, cursor, key=None):
+        self._tracer = tracer
+        self._cursor = cursor
+        self._key = key
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def _fetch(self, method, single, *args):
+        started = time.perf_counter()
+        result = method(*args)
+        if self._key is not None:
+            rows = int(result is not None) if single else len(result)
+            self._tracer.record(self._key, time.perf_counter() - started, rows=rows)
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone, True)
+
+    def fetchmany(self, *args):
+        return self._fetch(self._cursor.fetchmany, False, *args)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall, False)
+
+    def _run(self, method, sql, *args, **kwargs):
+        traced = self._tracer.run(method, sql, *args, **kwargs)
+        self._key = traced._key
+        return self
+
+    def execute(self, sql, *args, **kwargs):
+        return self._run(self._cursor.execute, sql, *args, **kwargs)
+
+    def executemany(self, sql, *args, **kwargs):
+        return self._run(self._cursor.executemany, sql, *args, **kwargs)
+
+    def executescript(self, sql, *args, **kwargs):
+        return self._run(self._cursor.executescript, sql, *args, **kwargs)
+
+
+tracer = SqlTracer(enabled=os.environ.get(SQL_TRACE_ENV, '').lower() in ('1', 'true', 'yes', 'on'))
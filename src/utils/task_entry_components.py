@@ -0,0 +1,198 @@
+import streamlit as st
+import pandas as pd
+from src.utils.patient_search_components import patient_label, patient_picker
+
+# Task entry rows shown before "Add Task Entry" is used
+DEFAULT_TASK_ENTRIES = 5
+DEFAULT_DURATION_MINUTES = 30
+
+def format_minutes(total_minutes):
+    """Minutes as the "Xh Ym" text of the Time Served tiles"""
+    total_minutes = total_minutes or 0
+    return f"{total_minutes // 60}h {total_minutes % 60}m"
+
+def _elapsed_seconds(timer_key):
+    start_time = st.session_state.get(f"{timer_key}_start_time")
+    return int((pd.Timestamp.now() - start_time).total_seconds()) if start_time is not None else 0
+
+def _toggle_timer(i):
+    timer_key = f"timer_{i}"
+    if not st.session_state[f"{timer_key}_running"]:
+        st.session_state[f"{timer_key}_running"] = True
+        st.session_state[f"{timer_key}_start_time"] = pd.Timestamp.now()
+    else:
+        st.session_state[f"{timer_key}_running"] = False
+        # When timer stops, update the duration field
+        elapsed_seconds = _elapsed_seconds(timer_key)
+        st.session_state[timer_key] = elapsed_seconds
+        st.session_state[f"duration_{i}"] = elapsed_seconds // 60 + 1  # Convert to minutes, add 1 to avoid 0
+
+@st.fragment(run_every=1)
+def _running_timer(timer_key):
+    """Ticking timer text; the only part of the page that reruns every second"""
+    elapsed_seconds = _elapsed_seconds(timer_key)
+    st.write(f"Timer: {elapsed_seconds // 60:02d}:{elapsed_seconds % 60:02d}")
+
+@st.fragment
+def _task_timer(i):
+    """Timer text, start/stop button and duration input of one task entry.
+
+    Starting or stopping the timer reruns only this fragment; while it runs
+    only the nested _running_timer ticks, and it is dropped (ending its
+    auto-rerun) as soon as the timer stops.
+    """
+    timer_key = f"timer_{i}"
+    duration_key = f"duration_{i}"
+
+    # Initialize timer state
+    if timer_key not in st.session_state:
+        st.session_state[timer_key] = 0
+        st.session_state[f"{timer_key}_running"] = False
+        st.session_state[f"{timer_key}_start_time"] = None
+    if duration_key not in st.session_state:
+        st.session_state[duration_key] = DEFAULT_DURATION_MINUTES
+
+    # Display everything on same line: timer text, button, duration
+    col_timer_text, col_timer_btn, col_duration = st.columns([1, 1, 1])
+
+    with col_timer_text:
+        if st.session_state[f"{timer_key}_running"]:
+            _running_timer(timer_key)
+        else:
+            st.write(f"Timer: {st.session_state[timer_key] // 60:02d}:{st.session_state[timer_key] % 60:02d}")
+
+    with col_timer_btn:
+        st.button("▶/⏹", key=f"timer_btn_{i}", on_click=_toggle_timer, args=(i,), use_container_width=True, help="Start/Stop Timer")
+
+    with col_duration:
+        # Manual duration input (compact) - placed next to timer button
+        st.number_input("Duration (min)", min_value=1, key=duration_key, label_visibility="collapsed")
+
+def _entry_task(i, selected_patient):
+    """Task dict of entry i for a save_tasks batch, or None if a field is missing"""
+    task_type = st.session_state.get(f"task_type_{i}")
+    duration = st.session_state.get(f"duration_{i}")
+    if not (selected_patient and task_type and duration):
+        return None
+    return {
+        'patient_id': selected_patient['patient_id'],
+        'task_date': st.session_state.get(f"date_{i}"),
+        'task_description': task_type,
+        'duration_minutes': duration,
+        'notes': st.session_state.get(f"notes_{i}", ''),
+    }
+
+def _save_entries(save_tasks, entries):
+    """Save (i, selected_patient) entries in one save_tasks call and record each entry's result"""
+    batch = []
+    for i, selected_patient in entries:
+        task = _entry_task(i, selected_patient)
+        if task is None:
+            st.session_state[f"log_result_{i}"] = ('warning', "Please fill in all fields for the task entry.")
+        else:
+            batch.append((i, selected_patient, task))
+    if not batch:
+        return
+
+    try:
+        results = save_tasks([task for _, _, task in batch])
+    except Exception as e:
+        for i, _, _ in batch:
+            st.session_state[f"log_result_{i}"] = ('error', f"Error saving task to database: {e}")
+        return
+
+    for (i, selected_patient, task), result in zip(batch, results):
+        if not result['saved']:
+            st.session_state[f"log_result_{i}"] = ('error', f"Error saving task to database: {result['error']}")
+            continue
+        st.session_state[f"log_result_{i}"] = (
+            'success', f"Task '{task['task_description']}' logged for {patient_label(selected_patient)} "
+                       f"on {task['task_date']} with duration {task['duration_minutes']} minutes."
+        )
+        # Clear the notes, duration, timer and Log All tick of the saved entry
+        for key in (f"notes_{i}", f"duration_{i}", f"timer_{i}", f"timer_{i}_running", f"timer_{i}_start_time",
+                    f"include_{i}"):
+            st.session_state.pop(key, None)
+
+def _log_task(i, save_tasks, selected_patient):
+    """Save entry i and clear it, before the entry widgets are drawn again"""
+    _save_entries(save_tasks, [(i, selected_patient)])
+
+def _log_all_tasks(save_tasks, selected_patients):
+    """Save every entry ticked for Log All in one transaction"""
+    entries = [(i, patient) for i, patient in selected_patients.items() if st.session_state.get(f"include_{i}")]
+    if entries:
+        _save_entries(save_tasks, entries)
+    else:
+        st.session_state["log_all_result"] = ('warning', "Tick \"Include in Log All\" on the entries to log.")
+
+@st.fragment
+def show_daily_task_entries(save_tasks, patients, task_options, minutes_tile, load_minutes,
+                            no_patients_label="No patients available", scope_user_id=None):
+    """Daily task entry grid, rerun on its own when a row is added or a task is logged.
+
+    Each entry picks its patient from patients, or by searching
+    scope_user_id's patients (still limited to patients). save_tasks takes a
+    list of task dicts (patient_id, task_date, task_description,
+    duration_minutes, notes) and returns a result dict with saved and error
+    per task, like database.save_daily_tasks_bulk. "Log Task" saves one entry;
+    "Log All Entries" saves every ticked entry in a single call. After tasks
+    are saved, load_minutes() is asked for the new monthly total and only the
+    Time Served tile (an st.empty drawn by the dashboard) is redrawn.
+    """
+    # Initialize session state for tasks if not already present
+    if 'daily_tasks_data' not in st.session_state:
+        st.session_state.daily_tasks_data = [{} for _ in range(DEFAULT_TASK_ENTRIES)]
+
+    # Add a button to add more task entries dynamically
+    if st.button("Add Task Entry"):
+        st.session_state.daily_tasks_data.append({})
+
+    patients = [p for p in patients if 'first_name' in p and 'last_name' in p]
+    allowed_ids = {p['patient_id'] for p in patients}
+    task_logged = False
+    selected_patients = {}
+
+    # Create task entries
+    for i, _ in enumerate(st.session_state.daily_tasks_data):
+        st.markdown(f"#### Task Entry {i+1}")
+        # Create a compact row layout for date, patient, task type, and duration
+        col1, col2, col3, col4 = st.columns([1, 2, 2, 1])
+
+        with col1:
+            st.date_input(f"Date {i+1}", value=pd.to_datetime('today'), key=f"date_{i}")
+        with col2:
+            selected_patient = patient_picker(f"Patient {i+1}", f"patient_{i}", scope_user_id, patients,
+                                              allowed_ids=allowed_ids, empty_label=no_patients_label)
+            selected_patients[i] = selected_patient
+        with col3:
+            st.selectbox(f"Task Type {i+1}", task_options, key=f"task_type_{i}", index=0 if task_options else None)
+        with col4:
+            _task_timer(i)
+
+        st.text_area(f"Notes {i+1}", key=f"notes_{i}")
+
+        col_log, col_include = st.columns([1, 1])
+        with col_log:
+            st.button(f"Log Task {i+1}", key=f"log_task_{i}", on_click=_log_task, args=(i, save_tasks, selected_patient))
+        with col_include:
+            st.checkbox("Include in Log All", key=f"include_{i}")
+        result = st.session_state.pop(f"log_result_{i}", None)
+        if result:
+            level, message = result
+            getattr(st, level)(message)
+            task_logged = task_logged or level == 'success'
+        st.markdown("---")
+
+    st.button("Log All Entries", key="log_all_tasks", type="primary", on_click=_log_all_tasks,
+              args=(save_tasks, selected_patients), help="Save every entry ticked \"Include in Log All\" at once")
+    result = st.session_state.pop("log_all_result", None)
+    if result:
+        level, message = result
+        getattr(st, level)(message)
+
+    if task_logged:
+        try:
+            minutes_tile.metric("Time Served This Month", format_minutes(load_minutes()))
+        except Exception as e:
+            print(f"Error calculating time served: {e}")
@@ -0,0 +1,227 @@
+"""
+Vectorized zip code -> region resolver.
+
+Replaces the per-patient UPDATE loops in the old region assignment scripts
+(populate_region_ids_from_zip.py, add_missing_zip_codes.py), which fell back to
+a prefix scan over every region on an exact miss.
+
+regions.zip_code holds single zips ("94102"), ranges ("94102–94134") and short
+prefixes ("941"). Each becomes an integer interval. Exact zips are resolved with
+one hash join, and ranges/prefixes by testing each distinct zip against every
+range interval in numpy blocks; ranges and prefixes can nest or overlap, so the
+narrowest interval containing the zip wins. Patient zips are treated the same
+way: ZIP+4 is cut to five digits and a short zip matches any region inside its
+prefix. Results are written back through a temp table and a single
+UPDATE ... FROM join.
+
+Zips with no region can optionally be added to regions first, taking city and
+county from zip-codes.csv.
+
+Usage:
+    python -m src.utils.zip_region_resolver [db_path] [--add-missing] [--dry-run]
+"""
+
+import re
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+
+DB_PATH = 'production.db'
+ZIP_CODES_CSV = 'zip-codes.csv'
+ZIP_DIGITS = 5
+# Distinct zips tested against the range intervals per numpy block
+RESOLVE_BLOCK_SIZE = 1024
+
+RANGE_SEPARATOR = re.compile(r'\s*[–—-]\s*')
+
+
+def zip_interval(value):
+    """(low, high) integer interval covered by a zip, zip range or zip prefix; None if unparseable"""
+    if value is None:
+        return None
+    text = str(value).strip()
+    parts = RANGE_SEPARATOR.split(text) if RANGE_SEPARATOR.search(text) else [text]
+    # ZIP+4 ("94102-1234") is a single zip, not a range
+    if len(parts) == 2 and len(parts[0]) == ZIP_DIGITS and len(parts[1]) == 4:
+        parts = [parts[0]]
+    if len(parts) == 1:
+        digits = parts[0][:ZIP_DIGITS]
+        if not digits.isdigit():
+            return None
+        scale = 10 ** (ZIP_DIGITS - len(digits))
+        return int(digits) * scale, int(digits) * scale + scale - 1
+    if len(parts) == 2 and all(p[:ZIP_DIGITS].isdigit() and len(p) >= ZIP_DIGITS for p in parts):
+        low, high = int(parts[0][:ZIP_DIGITS]), int(parts[1][:ZIP_DIGITS])
+        return (low, high) if low <= high else (high, low)
+    return None
+
+
+def intervals_frame(values):
+    """DataFrame of low/high for a Series of zip strings; unparseable rows get NaN"""
+    parsed = values.map(zip_interval)
+    return pd.DataFrame({
+        'low': parsed.map(lambda iv: iv[0] if iv else np.nan),
+        'high': parsed.map(lambda iv: iv[1] if iv else np.nan),
+    }, index=values.index)
+
+
+def load_regions(conn):
+    """Active regions with their zip intervals"""
+    regions = pd.read_sql_query("""
+        SELECT region_id, zip_code, city, state, county
+        FROM regions
+        WHERE zip_code IS NOT NULL AND TRIM(zip_code) != '' AND LOWER(status) = 'active'
+        ORDER BY region_id
+    """, conn)
+    regions = regions.join(intervals_frame(regions['zip_code'])).dropna(subset=['low'])
+    regions[['low', 'high']] = regions[['low', 'high']].astype(np.int64)
+    return regions
+
+
+class ZipRegionResolver:
+    """Sorted interval index over regions.zip_code"""
+
+    def __init__(self, regions):
+        exact = regions[regions['low'] == regions['high']]
+        # Lowest region_id wins when a zip is listed twice, as in the old scripts' dict
+        self.exact = exact.drop_duplicates('low').set_index('low')['region_id']
+        # Narrowest first, so the first containing range is the most specific one
+        ranges = regions[regions['low'] != regions['high']].assign(width=lambda r: r['high'] - r['low'])
+        ranges = ranges.sort_values(['width', 'region_id'])
+        self.range_low = ranges['low'].to_numpy()
+        self.range_high = ranges['high'].to_numpy()
+        self.range_region = ranges['region_id'].to_numpy()
+
+    @classmethod
+    def from_db(cls, conn):
+        return cls(load_regions(conn))
+
+    def resolve(self, zips):
+        """region_id for every zip in a Series (NaN where none), in one vectorized pass"""
+        zips = pd.Series(zips)
+        bounds = intervals_frame(zips)
+        result = pd.Series(np.nan, index=zips.index)
+
+        # Five-digit zips: exact region first
+        point = bounds['low'] == bounds['high']
+        result[point] = bounds.loc[point, 'low'].map(self.exact)
+
+        # Everything else (ranges, prefixes, short patient zips): narrowest
+        # range overlapping the zip, checked against every range
+        pending = result.isna() & bounds['low'].notna()
+        if pending.any() and len(self.range_high):
+            wanted = bounds.loc[pending, ['low', 'high']].astype(np.int64)
+            distinct = wanted.drop_duplicates()
+            regions = pd.Series(self._overlapping_regions(distinct['low'].to_numpy(), distinct['high'].to_numpy()),
+                                index=pd.MultiIndex.from_frame(distinct))
+            result[pending] = regions.reindex(pd.MultiIndex.from_frame(wanted)).to_numpy()
+
+        # Short patient zips can also fall on exact regions within their prefix
+        pending = result.isna() & bounds['low'].notna() & (bounds['low'] != bounds['high'])
+        if pending.any() and len(self.exact):
+            points = self.exact.index.to_numpy()
+            order = np.argsort(points)
+            points, regions = points[order], self.exact.to_numpy()[order]
+            low = bounds.loc[pending, 'low'].to_numpy(dtype=np.int64)
+            high = bounds.loc[pending, 'high'].to_numpy(dtype=np.int64)
+            idx = np.searchsorted(points, low, side='left')
+            safe = np.minimum(idx, len(points) - 1)
+            found = (idx < len(points)) & (points[safe] <= high)
+            result[pending] = np.where(found, regions[safe], np.nan)
+        return result
+
+    def _overlapping_regions(self, low, high):
+        """region_id of the narrowest range overlapping each [low, high] interval (NaN where none)"""
+        regions = np.full(len(low), np.nan)
+        for start in range(0, len(low), RESOLVE_BLOCK_SIZE):
+            block = slice(start, start + RESOLVE_BLOCK_SIZE)
+            overlaps = ((self.range_low[None, :] <= high[block, None])
+                        & (self.range_high[None, :] >= low[block, None]))
+            first = overlaps.argmax(axis=1)
+            regions[block] = np.where(overlaps.any(axis=1), self.range_region[first], np.nan)
+        return regions
+
+
+def load_zip_reference(path=ZIP_CODES_CSV):
+    """zip-codes.csv as a DataFrame indexed by five-digit zip"""
+    reference = pd.read_csv(path, dtype=str)
+    reference['zip'] = reference['zip'].str.strip().str.zfill(ZIP_DIGITS)
+    return reference.drop_duplicates('zip').set_index('zip')
+
+
+def add_missing_regions(conn, zips, reference, state='CA'):
+    """Insert a region for each unresolved five-digit zip, using zip-codes.csv for city/county"""
+    missing = sorted({str(z).strip()[:ZIP_DIGITS] for z in zips if str(z).strip()[:ZIP_DIGITS].isdigit()
+                      and len(str(z).strip()[:ZIP_DIGITS]) == ZIP_DIGITS})
+    if not missing:
+        return 0
+    known = reference.reindex(missing)
+    rows = [(zip_code, row.city if isinstance(row.city, str) else '', state,
+             row.county if isinstance(row.county, str) else '')
+            for zip_code, row in known.iterrows()]
+    with conn:
+        cursor = conn.executemany("""
+            INSERT INTO regions (zip_code, city, state, county, status)
+            SELECT ?, ?, ?, ?, 'active'
+            WHERE NOT EXISTS (SELECT 1 FROM regions WHERE zip_code = ?1)
+        """, rows)
+    return cursor.rowcount
+
+
+def assign_patient_regions(conn, add_missing=False, dry_run=False, csv_path=ZIP_CODES_CSV):
+    """Resolve every patient zip and update patients.region_id in one statement; returns counts"""
+    patients = pd.read_sql_query("""
+        SELECT rowid AS patient_rowid, region_id, address_zip
+        FROM patients
+        WHERE address_zip IS NOT NULL AND TRIM(address_zip) != ''
+    """, conn)
+    resolver = ZipRegionResolver.from_db(conn)
+    patients['new_region_id'] = resolver.resolve(patients['address_zip'])
+
+    added = 0
+    if add_missing and not dry_run:
+        unresolved = patients.loc[patients['new_region_id'].isna(), 'address_zip']
+        added = add_missing_regions(conn, unresolved, load_zip_reference(csv_path))
+        if added:
+            resolver = ZipRegionResolver.from_db(conn)
+            patients['new_region_id'] = resolver.resolve(patients['address_zip'])
+
+    resolved = patients.dropna(subset=['new_region_id'])
+    changed = resolved[resolved['new_region_id'] != resolved['region_id']]
+    counts = {
+        'patients': len(patients),
+        'resolved': len(resolved),
+        'unresolved': len(patients) - len(resolved),
+        'changed': len(changed),
+        'regions_added': added,
+    }
+    if dry_run or changed.empty:
+        return counts
+
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS temp.zip_region_assignments")
+        conn.execute("CREATE TEMP TABLE zip_region_assignments (patient_rowid INTEGER PRIMARY KEY, region_id INTEGER NOT NULL)")
+        conn.executemany(
+            "INSERT INTO temp.zip_region_assignments (patient_rowid, region_id) VALUES (?, ?)",
+            zip(changed['patient_rowid'].astype(int).tolist(), changed['new_region_id'].astype(int).tolist())
+        )
+        conn.execute("""
+            UPDATE patients
+            SET region_id = zra.region_id
+            FROM temp.zip_region_assignments zra
+            WHERE patients.rowid = zra.patient_rowid
+        """)
+        conn.execute("DROP TABLE temp.zip_region_assignments")
+    return counts
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    conn = sqlite3.connect(args[0] if args else DB_PATH)
+    try:
+        counts = assign_patient_regions(conn, add_missing='--add-missing' in sys.argv, dry_run='--dry-run' in sys.argv)
+        print(", ".join(f"{value} {key.replace('_', ' ')}" for key, value in counts.items()))
+    finally:
+        conn.close()
@@ -0,0 +1,32 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from src.utils.zip_region_resolver import ZipRegionResolver, add_missing_regions, intervals_frame
+
+
+def make_resolver(zip_codes):
+    regions = pd.DataFrame({'region_id': list(zip_codes), 'zip_code': list(zip_codes.values())})
+    regions = regions.join(intervals_frame(regions['zip_code']))
+    regions[['low', 'high']] = regions[['low', 'high']].astype(np.int64)
+    return ZipRegionResolver(regions)
+
+
+def test_zip_inside_wider_range_around_a_prefix():
+    resolver = make_resolver({1: '94000-94999', 2: '941'})
+    assert resolver.resolve(['94050', '94950']).tolist() == [1, 1]
+
+
+def test_nested_ranges_resolve_to_the_narrowest():
+    resolver = make_resolver({1: '94000-94999', 2: '941', 3: '94120–94130', 4: '94125'})
+    assert resolver.resolve(['94150', '94121', '94125']).tolist() == [2, 3, 4]
+    assert resolver.resolve(['95000']).isna().all()
+
+
+def test_add_missing_regions_keeps_state_without_county():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE regions (region_id INTEGER PRIMARY KEY, zip_code TEXT, city TEXT, state TEXT, county TEXT, status TEXT)")
+    reference = pd.DataFrame({'city': ['Oakland', None], 'county': [None, 'Alameda']}, index=['94601', '94602'])
+    assert add_missing_regions(conn, ['94601', '94602', '94603'], reference) == 3
+    assert [row[0] for row in conn.execute("SELECT state FROM regions ORDER BY zip_code")] == ['CA', 'CA', 'CA']